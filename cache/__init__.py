@@ -0,0 +1,6 @@
+# cache/__init__.py
+
+from .compile_cache import CompileCache, CacheEntry, compiler_version
+from .binary_cache import BinaryCache, gcc_version
+
+__all__ = ['CompileCache', 'CacheEntry', 'compiler_version', 'BinaryCache', 'gcc_version']
@@ -0,0 +1,74 @@
+# cache/binary_cache.py
+import os
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from functools import lru_cache
+
+from cache.compile_cache import CompileCache, DEFAULT_CACHE_DIR
+
+DEFAULT_BINARY_MAX_SIZE = 128 * 1024 * 1024
+
+@lru_cache(maxsize=None)
+def gcc_version():
+    """First line of gcc --version, or '' without gcc"""
+    try:
+        result = subprocess.run(['gcc', '--version'], capture_output=True, text=True)
+    except OSError:
+        return ''
+    return result.stdout.split('\n', 1)[0]
+
+class BinaryCache(CompileCache):
+    """Content-addressed on-disk cache of binaries built from generated C
+
+    Binaries are keyed by a hash of the C source, the compiler flags and
+    the gcc version, and evicted least recently used first like compile
+    cache entries, in a directory of their own.
+    """
+    entry_suffix = '.out'
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_BINARY_MAX_SIZE):
+        cache_dir = cache_dir or os.environ.get('WIZUALL_CACHE_DIR', DEFAULT_CACHE_DIR)
+        super().__init__(os.path.join(cache_dir, 'binaries'), max_size)
+
+    def key(self, source_code, flags):
+        """Return the cache key of building source_code with flags"""
+        digest = hashlib.sha256()
+        for part in (gcc_version(), *flags):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(source_code.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the path of the binary stored under key, or None on a miss"""
+        path = self.path(key)
+        try:
+            # Mark as recently used
+            os.utime(path)
+        except OSError:
+            path = None
+        self.record('hits' if path is not None else 'misses')
+        return path
+
+    def put(self, key, binary_path):
+        """Store a copy of a binary under key, then evict binaries beyond
+        max_size; returns the stored copy's path, or None if it could not
+        be stored"""
+        try:
+            if os.path.getsize(binary_path) > self.max_size:
+                return None
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Copy then rename, so readers never run a partial binary
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f, open(binary_path, 'rb') as binary:
+                shutil.copyfileobj(binary, f)
+            os.chmod(temp_path, 0o755)
+            os.replace(temp_path, self.path(key))
+        except OSError:
+            return None
+
+        self.record('stores')
+        self.evict()
+        return self.path(key) if os.path.exists(self.path(key)) else None
@@ -0,0 +1,202 @@
+# cache/compile_cache.py
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+from functools import lru_cache
+
+# Packages whose source determines what the compiler produces: the
+# templates inlined into C and R, and the runtime generated Python calls,
+# included
+COMPILER_PACKAGES = ('scanner', 'parser', 'semantics', 'optimizer', 'visual_primitives', 'wizuall_runtime')
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'wizuall')
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+ENTRY_SUFFIX = '.pickle'
+STATS_FILE = 'stats.json'
+
+@lru_cache(maxsize=None)
+def compiler_version():
+    """Fingerprint of the compiler: a hash of its own source files
+
+    Any change to the scanner, parser, semantics, optimizer,
+    visual_primitives or wizuall_runtime packages yields a new version,
+    so entries written by an older compiler are never reused.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for package in COMPILER_PACKAGES:
+        package_dir = os.path.join(root, package)
+        for name in sorted(os.listdir(package_dir)):
+            if name.endswith('.py'):
+                digest.update(f"{package}/{name}\0".encode('utf-8'))
+                with open(os.path.join(package_dir, name), 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+class CacheEntry:
+    """What a compilation produced: AST, semantic results and target code"""
+    def __init__(self, ast, symbols, errors, target_code):
+        self.ast = ast
+        self.symbols = symbols
+        self.errors = errors
+        self.target_code = target_code
+
+class CompileCache:
+    """Content-addressed on-disk cache of compiled programs
+
+    Entries are keyed by a hash of the source text, the target language,
+    any other options affecting the output and the compiler version. The
+    cache directory is kept under max_size bytes by evicting the least
+    recently used entries, using file modification times as access times.
+    A cache that cannot be read or written behaves as a miss, never as an
+    error.
+    """
+    entry_suffix = ENTRY_SUFFIX
+    stats_file = STATS_FILE
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir or os.environ.get('WIZUALL_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_size = max_size
+        # Statistics of this session; totals across runs are kept on disk
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def key(self, source_code, target, *options):
+        """Return the cache key of compiling source_code for target"""
+        digest = hashlib.sha256()
+        for part in (compiler_version(), target) + tuple(map(str, options)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(source_code.encode('utf-8'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + self.entry_suffix)
+
+    def get(self, key):
+        """Return the CacheEntry stored under key, or None on a miss"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            # Mark as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            entry = None
+        except Exception:
+            # Unreadable or truncated entry: drop it
+            self.remove(path)
+            entry = None
+
+        self.record('hits' if entry is not None else 'misses')
+        return entry
+
+    def put(self, key, entry):
+        """Store entry under key, then evict entries beyond max_size
+
+        Returns False if the entry could not be stored, for instance when
+        its AST is too deep to pickle.
+        """
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError, TypeError):
+            return False
+        if len(data) > self.max_size:
+            return False
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename, so readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self.path(key))
+        except OSError:
+            return False
+
+        self.record('stores')
+        self.evict()
+        return True
+
+    def evict(self):
+        """Remove least recently used entries until within max_size"""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(self.entry_suffix):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, path, info.st_size))
+            total += info.st_size
+
+        entries.sort()
+        for _, path, size in entries:
+            if total <= self.max_size:
+                break
+            if self.remove(path):
+                total -= size
+                self.record('evictions')
+
+    def clear(self):
+        """Remove every entry and the statistics"""
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(self.entry_suffix) or name == self.stats_file:
+                self.remove(os.path.join(self.cache_dir, name))
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def size(self):
+        """Return the total size in bytes of the stored entries"""
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return 0
+        for name in names:
+            if name.endswith(self.entry_suffix):
+                try:
+                    total += os.path.getsize(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        return total
+
+    def record(self, event):
+        """Count an event in this session and in the on-disk totals"""
+        self.stats[event] += 1
+        totals = self.total_stats()
+        totals[event] = totals.get(event, 0) + 1
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(totals, f)
+            os.replace(temp_path, os.path.join(self.cache_dir, self.stats_file))
+        except OSError:
+            pass
+
+    def total_stats(self):
+        """Return the statistics accumulated over all runs"""
+        try:
+            with open(os.path.join(self.cache_dir, self.stats_file)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
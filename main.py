@@ -6,11 +6,117 @@ import logging
 
 from preprocessor.pdf_extractor import PDFExtractor
 from preprocessor.data_formatter import DataFormatter
-from scanner.lexer import Lexer
+from scanner.token_buffer import TokenBuffer
+from scanner.stream_lexer import StreamingLexer
 from parser.parser import Parser
 from semantics.semantic_analyzer import SemanticAnalyzer
 from semantics.code_generator import CodeGenerator
-from runtime.executor import RuntimeExecutor
+from semantics.shape_analyzer import ShapeAnalyzer
+from semantics.parallel_compiler import ParallelCompiler
+from optimizer.optimizer import Optimizer
+from runtime.executor import RuntimeExecutor, C_PROFILES, DEFAULT_C_PROFILE
+from cache.compile_cache import CompileCache, CacheEntry, DEFAULT_MAX_SIZE
+from cache.binary_cache import BinaryCache, DEFAULT_BINARY_MAX_SIZE
+
+# Sources larger than this (in bytes) are compiled statement by statement
+# straight from the file instead of being read into memory first
+STREAMING_THRESHOLD = 16 * 1024 * 1024
+
+def analyzer_class(args):
+    """The semantic analyzer selected by the command line"""
+    return ShapeAnalyzer if args.symbolic else SemanticAnalyzer
+
+def native_flags(args):
+    """gcc flags native kernels are built with, or None without them"""
+    return C_PROFILES[args.profile] if args.native and args.target == 'python' else None
+
+def compile_source(args, source_code, logger):
+    """Lex, parse, analyze and generate code for a whole source
+
+    Returns a CacheEntry, or None if semantic analysis failed.
+    """
+    if args.jobs > 1:
+        logger.info(f"Compiling top-level statements on {args.jobs} worker processes...")
+        compiler = ParallelCompiler(args.target, args.jobs, analyzer_class(args), args.optimize,
+                                    args.schedule, args.workers, native_flags(args))
+        ast, semantic_analyzer, target_code = compiler.compile(source_code)
+        logger.debug(f"Compiled in {compiler.chunks} chunks")
+        if compiler.optimizer is not None:
+            log_optimizer(compiler.optimizer, logger)
+        return CacheEntry(ast, semantic_analyzer.symbol_table.symbols,
+                          semantic_analyzer.errors, target_code)
+    
+    # Lexical analysis
+    logger.info("Performing lexical analysis...")
+    tokens = TokenBuffer.from_source(source_code, pack_vectors=True)
+    logger.debug(f"Generated {len(tokens)} tokens")
+    
+    # Syntax analysis
+    logger.info("Parsing source code...")
+    parser = Parser(tokens)
+    ast = parser.parse()
+    logger.info("Parsing completed successfully")
+    
+    # Semantic analysis
+    logger.info("Performing semantic analysis...")
+    semantic_analyzer = analyzer_class(args)(ast)
+    valid, errors = semantic_analyzer.analyze()
+    
+    if not valid:
+        for error in errors:
+            logger.error(f"Semantic error: {error}")
+        return None
+    
+    logger.info("Semantic analysis completed successfully")
+    
+    # Optimization
+    optimized = ast
+    if args.optimize > 0:
+        logger.info(f"Optimizing at level {args.optimize}...")
+        optimizer = Optimizer(args.optimize)
+        optimized = optimizer.optimize(ast)
+        log_optimizer(optimizer, logger)
+    
+    # Code generation
+    logger.info(f"Generating {args.target} code...")
+    code_generator = CodeGenerator(optimized, args.target, fuse=args.optimize > 0, reuse=args.optimize >= 2,
+                                   release=args.optimize >= 2, schedule=args.schedule, workers=args.workers,
+                                   native=native_flags(args))
+    target_code = code_generator.generate()
+    return CacheEntry(ast, semantic_analyzer.symbol_table.symbols, errors, target_code)
+
+def log_optimizer(optimizer, logger):
+    stats = ', '.join(f"{count} {name}" for name, count in optimizer.stats.items())
+    logger.debug(f"Optimizer: {stats}")
+
+def compile_stream(args, output_file, logger):
+    """Compile the source file one top-level statement at a time
+
+    Tokens are lexed lazily from the file, and each statement is parsed,
+    analyzed against the running symbol table and its code written to
+    output_file before the next one is read, so memory grows with the
+    largest statement rather than with the program.
+    """
+    logger.info(f"Streaming WizuAll source file: {args.source_file}")
+    logger.info(f"Compiling statement by statement to {args.target}...")
+    try:
+        with open(args.source_file, 'r') as source, open(output_file, 'w') as output:
+            parser = Parser(StreamingLexer(source, pack_vectors=True).tokens())
+            semantic_analyzer = analyzer_class(args)(None)
+            code_generator = CodeGenerator(None, args.target, fuse=args.optimize > 0, reuse=args.optimize >= 2)
+            optimizer = Optimizer(args.optimize)
+            statements = semantic_analyzer.analyze_stream(parser.iter_statements())
+            code_generator.generate_stream(optimizer.optimize_stream(statements), output)
+    except BaseException:
+        # Do not leave truncated code behind
+        os.remove(output_file)
+        raise
+    logger.debug(f"Consumed {parser.pos + 1} tokens")
+    if args.optimize > 0:
+        log_optimizer(optimizer, logger)
+    
+    for error in semantic_analyzer.errors:
+        logger.error(f"Semantic error: {error}")
 
 def main():
     # Configure logging
@@ -25,7 +131,41 @@ def main():
                         default='python', help='Target language (default: python)')
     parser.add_argument('--output', help='Output file path')
     parser.add_argument('--execute', action='store_true', help='Execute the generated code')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Execute generated Python in the compiler\'s interpreter instead of a new one')
+    parser.add_argument('--timeout', type=float,
+                        help='Kill the executed program after this many seconds')
+    parser.add_argument('--max-memory', type=int,
+                        help='Kill the executed program once its resident memory exceeds this many MiB')
+    parser.add_argument('--profile', choices=sorted(C_PROFILES), default=DEFAULT_C_PROFILE,
+                        help='Optimization profile C and native kernels are built with: O2 (-O2), native '
+                             '(-O3 -march=native) or openmp (-O3 -march=native -fopenmp) (default: %(default)s)')
+    parser.add_argument('--native', action='store_true',
+                        help='Run loops over numbers and vectors as C kernels built with the --profile flags, '
+                             'on the NumPy arrays in place, in the generated Python code')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
+    parser.add_argument('--stream', action='store_true',
+                        help='Compile statement by statement in constant memory (default for sources over 16 MB)')
+    parser.add_argument('-O', dest='optimize', type=int, choices=[0, 1, 2], default=0,
+                        help='Optimization level: -O1 folds and propagates constants and fuses compound '
+                             'vector expressions, -O2 also evaluates primitives on constant data, removes '
+                             'dead code, moves loop invariants, updates vectors in place and releases them '
+                             'after their last use (default: 0)')
+    parser.add_argument('--symbolic', action='store_true',
+                        help='Check vector shapes only, without computing their values, during semantic analysis')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Compile top-level statements on N worker processes (default: 1)')
+    parser.add_argument('--schedule', choices=['thread', 'process'],
+                        help='Run independent groups of top-level statements concurrently on a pool of threads '
+                             'or processes in the generated Python code')
+    parser.add_argument('--workers', type=int,
+                        help='Size of the pool scheduled code runs on (default: one per CPU)')
+    parser.add_argument('--no-cache', action='store_true', help='Always recompile, bypassing the compile cache')
+    parser.add_argument('--cache-dir', help='Compile cache directory (default: $WIZUALL_CACHE_DIR or ~/.cache/wizuall)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_SIZE // (1024 * 1024),
+                        help='Maximum compile cache size in MiB (default: %(default)s)')
+    parser.add_argument('--binary-cache-size', type=int, default=DEFAULT_BINARY_MAX_SIZE // (1024 * 1024),
+                        help='Maximum size in MiB of the cache of binaries built from C (default: %(default)s)')
     
     args = parser.parse_args()
     
@@ -39,10 +179,13 @@ def main():
             logger.error(f"Source file not found: {args.source_file}")
             return 1
         
-        # Read source code
-        logger.info(f"Reading WizuAll source file: {args.source_file}")
-        with open(args.source_file, 'r') as f:
-            source_code = f.read()
+        # Read source code, unless it is to be streamed
+        streaming = args.stream or os.path.getsize(args.source_file) > STREAMING_THRESHOLD
+        source_code = None
+        if not streaming:
+            logger.info(f"Reading WizuAll source file: {args.source_file}")
+            with open(args.source_file, 'r') as f:
+                source_code = f.read()
         
         # Process data file if provided
         if args.data:
@@ -66,46 +209,56 @@ def main():
             # For now, we'll just log it
             logger.debug(f"Data stream:\n{data_stream[:100]}...")
         
-        # Lexical analysis
-        logger.info("Performing lexical analysis...")
-        lexer = Lexer(source_code)
-        tokens = lexer.tokenize()
-        logger.debug(f"Generated {len(tokens)} tokens")
-        
-        # Syntax analysis
-        logger.info("Parsing source code...")
-        parser = Parser(tokens)
-        ast = parser.parse()
-        logger.info("Parsing completed successfully")
-        
-        # Semantic analysis
-        logger.info("Performing semantic analysis...")
-        semantic_analyzer = SemanticAnalyzer(ast)
-        valid, errors = semantic_analyzer.analyze()
-        
-        if not valid:
-            for error in errors:
-                logger.error(f"Semantic error: {error}")
-            return 1
-        
-        logger.info("Semantic analysis completed successfully")
-        
-        # Code generation
-        logger.info(f"Generating {args.target} code...")
-        code_generator = CodeGenerator(ast, args.target)
-        target_code = code_generator.generate()
-        
-        # Output the generated code
-        if args.output:
-            with open(args.output, 'w') as f:
-                f.write(target_code)
-            logger.info(f"Generated code saved to: {args.output}")
-        else:
-            # Default output filename based on input and target language
+        # Default output filename based on input and target language
+        output_file = args.output
+        if not output_file:
             base_name = os.path.splitext(args.source_file)[0]
             extensions = {'python': '.py', 'c': '.c', 'r': '.R'}
             output_file = f"{base_name}{extensions.get(args.target, '.txt')}"
+        
+        if streaming:
+            if args.schedule:
+                logger.warning("Statements are not scheduled when compiling a stream")
+            if args.native:
+                logger.warning("Loops are not compiled to native kernels when compiling a stream")
+            compile_stream(args, output_file, logger)
+            logger.info(f"Generated code saved to: {output_file}")
+            if args.execute:
+                with open(output_file, 'r') as f:
+                    target_code = f.read()
+        else:
+            # Reuse the output of an earlier compilation of the same source
+            cache = None
+            entry = None
+            if not args.no_cache:
+                cache = CompileCache(args.cache_dir, args.cache_size * 1024 * 1024)
+                options = [f"O{args.optimize}", *(['symbolic'] if args.symbolic else [])]
+                if args.schedule:
+                    options.append(f"schedule={args.schedule}:{args.workers}")
+                if native_flags(args):
+                    options.append(f"native={args.profile}")
+                key = cache.key(source_code, args.target, *options)
+                entry = cache.get(key)
+                logger.info(f"Compile cache {'hit' if entry is not None else 'miss'}: {key[:16]}")
+            
+            if entry is None:
+                entry = compile_source(args, source_code, logger)
+                if entry is None:
+                    return 1
+                if cache is not None and not cache.put(key, entry):
+                    logger.debug("Compilation result could not be cached")
+            target_code = entry.target_code
+            
+            if cache is not None:
+                stats = cache.stats
+                totals = cache.total_stats()
+                logger.info(f"Compile cache: {stats['hits']} hits, {stats['misses']} misses, "
+                            f"{stats['evictions']} evictions")
+                logger.debug(f"Compile cache totals: {totals.get('hits', 0)} hits, "
+                             f"{totals.get('misses', 0)} misses, {totals.get('evictions', 0)} evictions, "
+                             f"{cache.size() / 2**20:.2f} MiB in {cache.cache_dir}")
             
+            # Output the generated code
             with open(output_file, 'w') as f:
                 f.write(target_code)
             logger.info(f"Generated code saved to: {output_file}")
@@ -113,16 +266,41 @@ def main():
         # Execute the generated code if requested
         if args.execute:
             logger.info(f"Executing generated {args.target} code...")
-            executor = RuntimeExecutor(target_code, args.target)
+            if args.in_process and args.target != 'python':
+                logger.warning("Only Python is executed in process")
+            # A binary built from the same C with the same profile is reused
+            binary_cache = None
+            if args.target == 'c' and not args.no_cache:
+                binary_cache = BinaryCache(args.cache_dir, args.binary_cache_size * 1024 * 1024)
+            executor = RuntimeExecutor(target_code, args.target, in_process=args.in_process,
+                                       profile=args.profile, binary_cache=binary_cache)
             
             try:
-                output = executor.execute()
-                logger.info("Execution completed successfully")
-                logger.info("Output:")
-                print(output)
+                if executor.in_process:
+                    if args.timeout is not None or args.max_memory is not None:
+                        logger.warning("Limits are not enforced on programs executed in process")
+                    output = executor.execute()
+                    logger.info("Execution completed successfully")
+                    logger.info("Output:")
+                    print(output)
+                else:
+                    # Lines are printed as the program prints them
+                    logger.info("Output:")
+                    max_memory = args.max_memory * 1024 * 1024 if args.max_memory is not None else None
+                    for line in executor.stream(args.timeout, max_memory):
+                        print(line, end='', flush=True)
+                    logger.info("Execution completed successfully")
+                if binary_cache is not None:
+                    logger.info(f"Binary cache {'hit' if binary_cache.stats['hits'] else 'miss'}")
             except Exception as e:
                 logger.error(f"Execution error: {str(e)}")
                 return 1
+            finally:
+                if executor.metrics is not None:
+                    metrics = executor.metrics
+                    peak_rss = 'unknown' if metrics.peak_rss is None else f"{metrics.peak_rss / 2**20:.1f} MiB"
+                    logger.info(f"Wall time {metrics.wall_time:.3f}s, CPU time {metrics.cpu_time:.3f}s, "
+                                f"peak RSS {peak_rss}")
         
         logger.info("WizuAll compilation completed successfully")
         return 0
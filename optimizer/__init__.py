@@ -0,0 +1,7 @@
+# optimizer/__init__.py
+
+from .optimizer import Optimizer
+from .loops import LoopOptimizer
+from .buffers import BufferReuse
+
+__all__ = ['Optimizer', 'LoopOptimizer', 'BufferReuse']
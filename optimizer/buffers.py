@@ -0,0 +1,231 @@
+# optimizer/buffers.py
+from parser.parser import *
+from optimizer.dataflow import PRIMITIVE_RESULTS, walk, reads
+from optimizer.loops import is_computation
+
+# Calls that keep no reference to their arguments once they return
+NON_RETAINING = {'print', 'vec_average', 'vec_max', 'vec_min'}
+
+# The buffer of a variable known to hold a number: there is none to reuse
+SCALAR = ('scalar',)
+
+# Loops whose buffer state has not settled after this many passes over
+# their body are given up on
+MAX_PASSES = 10
+
+def elementwise(node):
+    """Whether node is arithmetic on variables and numbers only"""
+    if not is_computation(node):
+        return False
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinaryOpNode) and is_computation(node):
+            stack.extend((node.left, node.right))
+        elif isinstance(node, UnaryOpNode) and is_computation(node):
+            stack.append(node.expr)
+        elif not isinstance(node, (IdentifierNode, NumberNode)):
+            return False
+    return True
+
+def last_reads(statements):
+    """Index of the last statement reading each variable"""
+    last = {}
+    for index, statement in enumerate(statements):
+        for name in reads(statement):
+            last[name] = index
+    return last
+
+class BufferReuse:
+    """Alias analysis finding the assignments that may overwrite the vector
+    their variable holds instead of allocating a new one
+
+    Each variable is mapped to the buffer it holds: a key naming the
+    assignment that allocated it, SCALAR for numbers, or None when it may
+    be shared with something the analysis cannot see, such as the
+    arguments of a call that may keep them. Copies such as w = v share a buffer. An
+    assignment of arithmetic on variables and numbers to v is reusable if
+    no other variable still live afterwards holds v's buffer: writing the
+    result into it changes nothing else the program reads.
+
+    Variables updated in a loop whose buffer is shared on entry, as in
+    s = signal followed by a loop updating s, are copied once before the
+    loop, so the loop can update them in place from its first iteration.
+    """
+
+    def __init__(self):
+        # Ids of the reusable assignments
+        self.reusable = set()
+        # Variables to copy before each while loop, by id of its node
+        self.owned = {}
+        self.state = {}
+        self.recording = True
+
+    def analyze(self, ast):
+        """Analyze a whole program; nothing is live after it"""
+        self.block(ast.statements, lambda name: False)
+        return self
+
+    def analyze_statement(self, node):
+        """Analyze the next top-level statement of a streamed program;
+        anything may be read after it"""
+        self.block([node], lambda name: True)
+        return self
+
+    def block(self, statements, live_after):
+        last = last_reads(statements)
+        for index, statement in enumerate(statements):
+            def live(name, index=index):
+                return last.get(name, -1) > index or live_after(name)
+            self.statement(statement, live)
+
+    def statement(self, node, live):
+        """Update the state for one statement; live tells whether a
+        variable may be read after it"""
+        if isinstance(node, AssignmentNode):
+            name = node.identifier.name
+            expr = node.expr
+            self.calls(expr)
+            if self.recording and elementwise(expr) and self.unique(self.state, name, live):
+                self.reusable.add(id(node))
+            if isinstance(expr, IdentifierNode):
+                buffer = self.state.get(expr.name)
+            elif isinstance(expr, FunctionCallNode):
+                buffer = None
+            elif self.scalar(expr):
+                buffer = SCALAR
+            else:
+                buffer = ('assignment', id(node))
+            self.state[name] = buffer
+            return
+
+        inner = node.statement
+        if isinstance(inner, IfNode):
+            self.calls(inner.condition)
+            before = dict(self.state)
+            self.block(inner.if_body.statements, live)
+            after_if = self.state
+            self.state = before
+            if inner.else_body:
+                self.state = dict(before)
+                self.block(inner.else_body.statements, live)
+            self.state = self.join(after_if, self.state, ('if', id(inner)))
+        elif isinstance(inner, WhileNode):
+            self.loop(inner, live)
+        else:
+            self.calls(inner)
+
+    def loop(self, node, live):
+        loop_reads = reads(node)
+        def loop_live(name):
+            return name in loop_reads or live(name)
+
+        # Variables the loop may update in place that hold a shared
+        # buffer on entry
+        updated = {child.identifier.name for child in walk(node.body)
+                   if isinstance(child, AssignmentNode) and elementwise(child.expr)}
+        shared = [name for name in sorted(updated)
+                  if self.state.get(name, SCALAR) != SCALAR and not self.unique(self.state, name, loop_live)]
+        entry = self.state
+        if shared:
+            # Keep the copies only for the variables that are then updated
+            # in place
+            saved = self.reusable, self.owned, self.recording
+            self.reusable, self.owned, self.recording = set(), {}, True
+            try:
+                self.iterate(node, dict(entry), shared, loop_live)
+                updates = {child.identifier.name for child in walk(node.body)
+                           if id(child) in self.reusable and isinstance(child, AssignmentNode)}
+            finally:
+                self.reusable, self.owned, self.recording = saved
+            shared = [name for name in shared if name in updates]
+        self.iterate(node, entry, shared, loop_live)
+        if shared and self.recording:
+            self.owned[id(node)] = shared
+
+    def iterate(self, node, entry, owned, live):
+        """Find the state at the head of the loop, copying the owned
+        variables first, then analyze the body from it"""
+        state = dict(entry)
+        for name in owned:
+            state[name] = ('copy', id(node), name)
+        recording, self.recording = self.recording, False
+        try:
+            for _ in range(MAX_PASSES):
+                self.state = dict(state)
+                self.calls(node.condition)
+                self.block(node.body.statements, live)
+                joined = self.join(state, self.state, ('loop', id(node)))
+                if joined == state:
+                    break
+                state = joined
+            else:
+                state = {name: None for name in state}
+        finally:
+            self.recording = recording
+        self.state = dict(state)
+        self.calls(node.condition)
+        self.block(node.body.statements, live)
+        # The loop exits from its head
+        self.state = state
+
+    def calls(self, node):
+        """Account for the calls in node: their vector arguments may be
+        kept, and primitives assign their results to globals"""
+        for child in walk(node):
+            if not isinstance(child, FunctionCallNode):
+                continue
+            if child.identifier not in NON_RETAINING:
+                for arg in child.args:
+                    if isinstance(arg, IdentifierNode):
+                        self.escape(arg.name)
+            for name in PRIMITIVE_RESULTS.get(child.identifier, ()):
+                self.state[name] = None
+
+    def scalar(self, node):
+        """Whether node is arithmetic on numbers and variables known to
+        hold numbers"""
+        if isinstance(node, NumberNode):
+            return True
+        return elementwise(node) and all(self.state.get(child.name) == SCALAR for child in walk(node)
+                                         if isinstance(child, IdentifierNode))
+
+    def escape(self, name):
+        """Forget the buffer of name and of every variable sharing it"""
+        buffer = self.state.get(name)
+        if buffer == SCALAR:
+            return
+        if buffer is not None:
+            for other, held in self.state.items():
+                if held == buffer:
+                    self.state[other] = None
+        self.state[name] = None
+
+    def unique(self, state, name, live):
+        """Whether no live variable other than name holds name's buffer"""
+        buffer = state.get(name)
+        if buffer is None or buffer == SCALAR:
+            return False
+        return not any(held == buffer and other != name and live(other)
+                       for other, held in state.items())
+
+    def join(self, first, second, site):
+        """State after either of two paths; variables assigned on only one
+        of them are left out"""
+        always = lambda name: True
+        joined = {}
+        for name in first.keys() & second.keys():
+            buffer = first[name]
+            if buffer == SCALAR == second[name]:
+                joined[name] = SCALAR
+            elif buffer is not None and buffer == second[name] and \
+                    self.holders(first, buffer) == self.holders(second, buffer):
+                joined[name] = buffer
+            elif self.unique(first, name, always) and self.unique(second, name, always):
+                joined[name] = (*site, name)
+            else:
+                joined[name] = None
+        return joined
+
+    def holders(self, state, buffer):
+        return {name for name, held in state.items() if held == buffer}
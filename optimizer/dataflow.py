@@ -0,0 +1,74 @@
+# optimizer/dataflow.py
+from parser.parser import *
+
+# Globals generated code assigns the result of each primitive to, besides
+# the variable the call is assigned to, so programs can read them later
+PRIMITIVE_RESULTS = {
+    'vec_average': ('result',),
+    'vec_max': ('result',),
+    'vec_min': ('result',),
+    'vec_reverse': ('result',),
+    'vec_product': ('result',),
+    'vec_compare': ('result',),
+    'clustering': ('labels', 'centers'),
+    'classification': ('y_pred', 'clf')
+}
+
+def walk(node):
+    """Yield node and every node below it"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, ASTNode):
+            yield node
+            stack.extend(getattr(node, slot) for slot in type(node).__slots__)
+
+def reads(node):
+    """Names of the variables read anywhere in node"""
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, IdentifierNode):
+            names.add(node.name)
+        elif isinstance(node, AssignmentNode):
+            # The assigned identifier is not read
+            stack.append(node.expr)
+        elif isinstance(node, ASTNode):
+            stack.extend(getattr(node, slot) for slot in type(node).__slots__)
+    return names
+
+def has_call(node):
+    return any(isinstance(child, FunctionCallNode) for child in walk(node))
+
+def assignments(node):
+    """How many times statements assign each variable, primitive results included"""
+    counts = {}
+    for child in walk(node):
+        if isinstance(child, AssignmentNode):
+            names = (child.identifier.name,)
+        elif isinstance(child, FunctionCallNode):
+            names = PRIMITIVE_RESULTS.get(child.identifier, ())
+        else:
+            continue
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+def assigned(node):
+    """Names of the variables statements may assign, primitive results included"""
+    return set(assignments(node))
+
+def kills(statement):
+    """Variables a top-level statement assigns whenever it runs"""
+    if isinstance(statement, StatementNode) and isinstance(statement.statement, (IfNode, WhileNode)):
+        return set()
+    return assigned(statement)
+
+def identifiers(node):
+    """Names of the variables read or assigned anywhere in node"""
+    return {child.name for child in walk(node) if isinstance(child, IdentifierNode)}
@@ -0,0 +1,88 @@
+# optimizer/dependencies.py
+from parser.parser import *
+from optimizer.dataflow import walk, reads, assigned, kills
+
+# Primitives drawing with pyplot
+PLOTTING = {'plot', 'histogram', 'heatmap', 'scatter', 'bar', 'line', 'clustering'}
+
+# Stands for pyplot's global state, read and written by every statement
+# drawing with it when statements share it
+PYPLOT = 'plt'
+
+class DependencyGraph:
+    """Def-use dependencies between the top-level statements of a program
+
+    A statement depends on the last earlier statement assigning each
+    variable it reads or assigns, and on the statements reading a variable
+    it assigns since that variable was last assigned. Running statements
+    as soon as those they depend on have finished gives every statement
+    the values it reads in program order. An if or while counts as one
+    statement reading and assigning whatever its bodies may.
+
+    Statements are grouped into contiguous runs, a new group starting at
+    each statement that depends on nothing in the current one; groups are
+    the units of work of scheduled code.
+    """
+
+    def __init__(self, statements, shared_plots=False):
+        self.statements = statements
+        self.reads = [reads(statement) for statement in statements]
+        self.writes = [assigned(statement) for statement in statements]
+        if shared_plots:
+            for index, statement in enumerate(statements):
+                if any(isinstance(node, FunctionCallNode) and node.identifier in PLOTTING
+                       for node in walk(statement)):
+                    self.reads[index].add(PYPLOT)
+                    self.writes[index].add(PYPLOT)
+
+        # Indices of the earlier statements each statement depends on
+        self.dependencies = []
+        last_write = {}
+        readers = {}
+        for index in range(len(statements)):
+            depends = {last_write[name] for name in self.reads[index] | self.writes[index]
+                       if name in last_write}
+            for name in self.writes[index]:
+                depends.update(readers.pop(name, ()))
+            for name in self.reads[index]:
+                readers.setdefault(name, set()).add(index)
+            for name in self.writes[index]:
+                last_write[name] = index
+            depends.discard(index)
+            self.dependencies.append(depends)
+
+    def groups(self):
+        """The (start, stop) index ranges of the groups, in program order"""
+        groups = []
+        start = 0
+        for index in range(1, len(self.statements)):
+            if not any(dependency >= start for dependency in self.dependencies[index]):
+                groups.append((start, index))
+                start = index
+        if self.statements:
+            groups.append((start, len(self.statements)))
+        return groups
+
+    def group_dependencies(self, groups):
+        """Indices of the earlier groups each group depends on"""
+        owner = {}
+        for number, (start, stop) in enumerate(groups):
+            for index in range(start, stop):
+                owner[index] = number
+        return [sorted({owner[dependency] for index in range(start, stop)
+                        for dependency in self.dependencies[index]} - {number})
+                for number, (start, stop) in enumerate(groups)]
+
+    def inputs(self, start, stop):
+        """Variables the statements of a group may read before assigning"""
+        names = set()
+        killed = set()
+        for index in range(start, stop):
+            names |= self.reads[index] - killed
+            killed |= kills(self.statements[index])
+        names.discard(PYPLOT)
+        return names
+
+    def outputs(self, start, stop):
+        """Variables the statements of a group may assign"""
+        return assigned(self.statements[start:stop])
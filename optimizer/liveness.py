@@ -0,0 +1,61 @@
+# optimizer/liveness.py
+from parser.parser import *
+from optimizer.dataflow import walk, reads, assigned, kills
+
+class Liveness:
+    """Last uses of the variables of a program, after which their values
+    can be released
+
+    The analysis works on top-level statements, an if or while statement
+    counting as one statement reading and assigning whatever its bodies
+    may. A variable is released after the last statement using it unless
+    a later statement may read it before assigning it again, so values
+    used in a loop are kept until the loop ends. Variables the program
+    has definitely assigned at that point are deleted; those assigned
+    only by ifs and loops that may not have run are cleared instead.
+    Nothing is released after the last statement.
+
+    Given the BufferReuse analysis of the program, an assignment updating
+    its variable's vector in place, and the copy a loop makes of a vector
+    it updates, read the variable too, so it is not released before them.
+    """
+
+    def __init__(self):
+        # Variables to delete and to clear after each top-level
+        # statement, by id
+        self.deleted = {}
+        self.cleared = {}
+
+    def analyze(self, statements, buffers=None):
+        names = assigned(statements)
+        def read(statement):
+            return reads(statement) | self.updated(statement, buffers)
+
+        # Backwards from the end, where nothing is read any more
+        live = set()
+        released = []
+        for statement in reversed(statements):
+            released.append((read(statement) | assigned(statement)) & names - live)
+            live = live - kills(statement) | read(statement)
+        released.reverse()
+
+        bound = set()
+        # Releases after the last statement would change nothing
+        for statement, names in zip(statements[:-1], released):
+            bound |= kills(statement)
+            if names:
+                self.deleted[id(statement)] = sorted(names & bound)
+                self.cleared[id(statement)] = sorted(names - bound)
+                bound -= names
+        return self
+
+    def updated(self, statement, buffers):
+        """Variables whose vectors statement may update in place"""
+        if buffers is None:
+            return set()
+        names = set()
+        for node in walk(statement):
+            if isinstance(node, AssignmentNode) and id(node) in buffers.reusable:
+                names.add(node.identifier.name)
+            names.update(buffers.owned.get(id(node), ()))
+        return names
@@ -0,0 +1,289 @@
+# optimizer/loops.py
+from array import array
+
+from scanner.lexer import Token, TokenType
+from parser.parser import *
+from optimizer.dataflow import reads, has_call, assigned, assignments, identifiers
+
+# Operators of the expressions worth computing once: vector arithmetic
+# allocates a new array for every operation
+ARITHMETIC_OPS = (TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY, TokenType.DIVIDE)
+
+def is_computation(node):
+    return ((isinstance(node, BinaryOpNode) and node.op.token_type in ARITHMETIC_OPS) or
+            (isinstance(node, UnaryOpNode) and node.op.token_type == TokenType.MINUS))
+
+def rebuild(node, children):
+    """A copy of an arithmetic node with new operands, or node itself if
+    they are unchanged"""
+    op = Token(node.op.token_type, node.op.value, node.line, node.column)
+    if isinstance(node, BinaryOpNode):
+        left, right = children
+        if left is node.left and right is node.right:
+            return node
+        return BinaryOpNode(left, op, right)
+    expr, = children
+    return node if expr is node.expr else UnaryOpNode(op, expr)
+
+def operands(node):
+    return (node.left, node.right) if isinstance(node, BinaryOpNode) else (node.expr,)
+
+class Block:
+    """Expressions available at a point of a block during common
+    subexpression elimination
+
+    Each expression seen is numbered in order of its first occurrence, and
+    stays available until a variable it reads, or the variable holding it,
+    is assigned.
+    """
+
+    def __init__(self):
+        self.available = {}
+        self.seen = 0
+        # Names read by each numbered expression, and the variable its
+        # first occurrence was assigned to, if any
+        self.reads = {}
+        self.assigned_to = {}
+        # Variable each expression used more than once is kept in
+        self.holders = {}
+
+    def kill(self, names, keep=None):
+        """Forget the expressions reading or held by names"""
+        for key, number in list(self.available.items()):
+            if number != keep and (self.reads[number] & names or self.assigned_to.get(number) in names):
+                del self.available[key]
+
+class LoopOptimizer:
+    """Loop-invariant code motion and common subexpression elimination
+    for the bodies of if and while statements
+
+    Within a body, an arithmetic expression computed again while the
+    variables it reads keep their values reuses the earlier result: from
+    the variable it was assigned to, or from a temporary assigned before
+    its first use. In a while loop, assignments whose expression reads
+    nothing the loop assigns, and invariant subexpressions of the other
+    assignments, are computed once before the loop. Hoisted code sits
+    behind an if with the loop's condition, so it only runs if the loop
+    does; an error it raises is raised before the first iteration rather
+    than during it.
+
+    Expressions calling functions are left in place, as are call
+    arguments, which the R templates use as parameter names.
+    """
+
+    def __init__(self, names=(), stats=None):
+        # Names used by the program, which temporaries must avoid
+        self.names = set(names)
+        self.temporaries = 0
+        self.keys = {}
+        self.stats = stats if stats is not None else {}
+        self.stats.setdefault('hoisted', 0)
+        self.stats.setdefault('reused', 0)
+
+    def optimize(self, statements):
+        """Optimize the if and while statements among statements"""
+        return [optimized for statement in statements for optimized in self.statement(statement)]
+
+    def statement(self, node):
+        """Optimize one statement, returning the statements it becomes"""
+        self.names |= identifiers(node)
+        if isinstance(node, StatementNode):
+            inner = node.statement
+            if isinstance(inner, IfNode):
+                else_body = self.body(inner.else_body) if inner.else_body else None
+                return [StatementNode(IfNode(inner.condition, self.body(inner.if_body), else_body))]
+            if isinstance(inner, WhileNode):
+                return self.loop(inner)
+        return [node]
+
+    def body(self, node):
+        return StatementsNode(self.common(self.optimize(node.statements)))
+
+    # Loop-invariant code motion
+
+    def loop(self, node):
+        body = self.body(node.body)
+        if has_call(node.condition):
+            return [StatementNode(WhileNode(node.condition, body))]
+
+        hoisted = []
+        statements = body.statements
+        # Hoisting an assignment can make the expressions reading its
+        # variable invariant in turn
+        while True:
+            count = len(hoisted)
+            statements = self.hoist_statements(node.condition, statements, hoisted)
+            if len(hoisted) == count:
+                break
+
+        loop = StatementNode(WhileNode(node.condition, StatementsNode(statements)))
+        if not hoisted:
+            return [loop]
+        return [StatementNode(IfNode(node.condition, StatementsNode(hoisted + [loop]), None))]
+
+    def hoist_statements(self, condition, statements, hoisted):
+        """Move the invariant computations of a loop body to hoisted,
+        returning the statements left in the body"""
+        counts = assignments(statements)
+        variant = set(counts)
+        # Variables read so far in an iteration: assigning them before
+        # the loop would change what the first iteration reads
+        read = reads(condition)
+        kept = []
+        for statement in statements:
+            if isinstance(statement, AssignmentNode) and not has_call(statement.expr):
+                name = statement.identifier.name
+                expr = statement.expr
+                if not reads(expr) & variant and counts[name] == 1 and name not in read:
+                    hoisted.append(statement)
+                    self.stats['hoisted'] += 1
+                    continue
+                expr = self.hoist(expr, variant, hoisted)
+                if expr is not statement.expr:
+                    statement = AssignmentNode(statement.identifier, expr)
+            kept.append(statement)
+            read |= reads(statement)
+        return kept
+
+    def hoist(self, node, variant, hoisted):
+        """Move the largest invariant computations in node, vector literals
+        included, to temporaries assigned in hoisted"""
+        if isinstance(node, (PackedVectorNode, VectorNode)) and not has_call(node):
+            if reads(node) & variant:
+                return node
+            temporary = self.temporary(node)
+            hoisted.append(AssignmentNode(temporary, node))
+            self.stats['hoisted'] += 1
+            return self.reference(temporary, node)
+        if not is_computation(node):
+            return node
+        if not reads(node) & variant:
+            temporary = self.temporary(node)
+            hoisted.append(AssignmentNode(temporary, node))
+            self.stats['hoisted'] += 1
+            return self.reference(temporary, node)
+        return rebuild(node, [self.hoist(operand, variant, hoisted) for operand in operands(node)])
+
+    # Common subexpressions
+
+    def common(self, statements):
+        """Reuse the arithmetic expressions a block computes more than once
+
+        A first pass counts how often each expression is used while
+        available; a second one, seeing the same expressions in the same
+        order, rewrites the uses of those used more than once.
+        """
+        uses = []
+        self.keys = {}
+        self.scan(statements, uses, None)
+        if all(count < 2 for count in uses):
+            return statements
+        output = []
+        self.scan(statements, uses, output)
+        self.keys = {}
+        return output
+
+    def scan(self, statements, uses, output):
+        block = Block()
+        for statement in statements:
+            if isinstance(statement, AssignmentNode):
+                name = statement.identifier.name
+                numbered = block.seen
+                expr = self.expression(statement.expr, block, uses, output, name)
+                if output is not None:
+                    if expr is not statement.expr:
+                        statement = AssignmentNode(statement.identifier, expr)
+                # The expression just assigned stays available in name
+                # unless it reads name itself
+                keep = numbered if block.assigned_to.get(numbered) == name else None
+                block.kill({name}, keep)
+            else:
+                inner = statement.statement
+                if isinstance(inner, IfNode) and isinstance(inner.condition, BinaryOpNode):
+                    # Comparisons are not reused, but their operands may be
+                    condition = rebuild(inner.condition, [self.expression(operand, block, uses, output, None)
+                                                          for operand in operands(inner.condition)])
+                    if output is not None and condition is not inner.condition:
+                        statement = StatementNode(IfNode(condition, inner.if_body, inner.else_body))
+                block.kill(assigned(statement))
+            if output is not None:
+                output.append(statement)
+
+    def expression(self, node, block, uses, output, target):
+        """Count or rewrite the computations in node, largest first
+
+        target is the variable node is assigned to, if node is a whole
+        assigned expression.
+        """
+        if not is_computation(node):
+            return node
+        key = self.key(node)
+        if key is None:
+            return rebuild(node, [self.expression(operand, block, uses, output, None)
+                                  for operand in operands(node)])
+        number = block.available.get(key)
+        if number is not None:
+            if output is None:
+                uses[number] += 1
+                return node
+            self.stats['reused'] += 1
+            return self.reference(block.holders[number], node)
+
+        number = block.seen
+        block.seen += 1
+        block.available[key] = number
+        block.reads[number] = names = reads(node)
+        if target is not None and target not in names:
+            block.assigned_to[number] = target
+        if output is None:
+            uses.append(1)
+        node = rebuild(node, [self.expression(operand, block, uses, output, None)
+                              for operand in operands(node)])
+        if output is None or uses[number] < 2:
+            return node
+        if number in block.assigned_to:
+            block.holders[number] = block.assigned_to[number]
+            return node
+        temporary = self.temporary(node)
+        block.holders[number] = temporary.name
+        output.append(AssignmentNode(temporary, node))
+        return self.reference(temporary, node)
+
+    def key(self, node):
+        """A hashable value equal for expressions computing the same value,
+        or None for expressions such as strings that are not compared"""
+        cached = self.keys.get(id(node))
+        if cached is not None or id(node) in self.keys:
+            return cached
+        if isinstance(node, IdentifierNode):
+            key = node.name
+        elif isinstance(node, NumberNode):
+            key = node.value
+        elif isinstance(node, PackedVectorNode):
+            key = ('vector', node.values.tobytes())
+        elif isinstance(node, VectorNode) and all(type(element) is NumberNode for element in node.elements):
+            key = ('vector', array('d', [element.value for element in node.elements]).tobytes())
+        elif is_computation(node):
+            children = [self.key(operand) for operand in operands(node)]
+            key = None if None in children else (node.op.token_type, *children)
+        else:
+            key = None
+        self.keys[id(node)] = key
+        return key
+
+    # Temporaries
+
+    def temporary(self, node):
+        """A new variable name no other variable of the program uses"""
+        while True:
+            name = f"_t{self.temporaries}"
+            self.temporaries += 1
+            if name not in self.names:
+                self.names.add(name)
+                return self.reference(name, node)
+
+    def reference(self, name, node):
+        """An identifier at node's position; vectors carry none"""
+        if isinstance(name, IdentifierNode):
+            name = name.name
+        return IdentifierNode(Token(TokenType.IDENTIFIER, name, getattr(node, 'line', 0), getattr(node, 'column', 0)))
@@ -0,0 +1,430 @@
+# optimizer/optimizer.py
+import math
+import operator
+from array import array
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from scanner.lexer import Token, TokenType
+from parser.parser import *
+from optimizer.dataflow import PRIMITIVE_RESULTS, walk, reads, has_call, assigned, identifiers
+from optimizer.loops import LoopOptimizer
+
+# Folded vectors longer than this are left to be computed at run time: a
+# literal that size costs more to compile and load than the arithmetic
+FOLD_LIMIT = 1024
+
+ARITHMETIC = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.MULTIPLY: operator.mul,
+    TokenType.DIVIDE: operator.truediv
+}
+
+COMPARISONS = {
+    TokenType.GREATER: operator.gt,
+    TokenType.LESS: operator.lt
+}
+
+# Where pure primitives leave their result, which they print
+RESULT_NAME = 'result'
+
+def windowed(reduce):
+    """Evaluate a reduction the way the runtime does: over the whole
+    vector, or as a moving reduction when given a window"""
+    def evaluate(data, window=None):
+        if window:
+            window = int(window)
+            windows = sliding_window_view(np.pad(data, (window - 1, 0), 'edge'), window)
+            return reduce(windows, axis=1)
+        return reduce(data)
+    return evaluate
+
+# Primitives without side effects other than printing their result, with
+# the number of arguments they use
+PURE_PRIMITIVES = {
+    'vec_average': (windowed(np.mean), 2),
+    'vec_max': (windowed(np.max), 2),
+    'vec_min': (windowed(np.min), 2),
+    'vec_reverse': (np.flip, 1)
+}
+
+class Optimizer:
+    """AST to AST optimizations between semantic analysis and code generation
+
+    Level 1 folds constant scalar and vector arithmetic and propagates
+    constants assigned to variables into later expressions. Level 2 also
+    evaluates pure primitives such as vec_average on constant data at
+    compile time, drops if and while statements whose condition is
+    constant, removes assignments whose value is never read unless they
+    may raise, and hands if and while bodies to LoopOptimizer for
+    loop-invariant code motion and common subexpression elimination.
+    Level 0 leaves the AST as it is.
+
+    Optimized programs print and plot the same as unoptimized ones. Folds
+    that would fail or produce a non-finite value at run time, such as a
+    division by zero, are left to run time.
+    """
+
+    def __init__(self, level=1):
+        self.level = level
+        # Constant node each variable is known to hold
+        self.constants = {}
+        self.stats = {'folded': 0, 'propagated': 0, 'evaluated': 0, 'eliminated': 0}
+        self.loops = LoopOptimizer(stats=self.stats)
+
+    def optimize(self, ast):
+        """Return an optimized copy of the AST"""
+        if self.level <= 0:
+            return ast
+        statements = [optimized for statement in ast.statements for optimized in self.statement(statement)]
+        if self.level >= 2:
+            statements = self.eliminate(statements, set())
+            self.loops.names |= identifiers(ast)
+            statements = self.loops.optimize(statements)
+        return StatementsNode(statements)
+
+    def optimize_stream(self, statements):
+        """Optimize statements one at a time, yielding the statements each
+        becomes
+
+        Dead assignments, which can only be found looking at the statements
+        after them, are not removed.
+        """
+        if self.level <= 0:
+            yield from statements
+            return
+        for statement in statements:
+            for optimized in self.statement(statement):
+                yield from self.loops.statement(optimized) if self.level >= 2 else (optimized,)
+
+    # Statements: each becomes a list of statements
+
+    def statement(self, node):
+        if isinstance(node, AssignmentNode):
+            return self.assignment(node)
+        inner = node.statement
+        if isinstance(inner, FunctionCallNode):
+            return self.call_statement(inner)
+        if isinstance(inner, IfNode):
+            return self.if_statement(inner)
+        if isinstance(inner, WhileNode):
+            return self.while_statement(inner)
+        return [node]
+
+    def block(self, node):
+        return [optimized for statement in node.statements for optimized in self.statement(statement)]
+
+    def assignment(self, node):
+        name = node.identifier.name
+        if isinstance(node.expr, FunctionCallNode):
+            evaluated = self.evaluate_primitive(node.expr, node.identifier)
+            if evaluated is not None:
+                return evaluated
+            expr = self.call(node.expr)
+            self.constants.pop(name, None)
+        else:
+            expr = self.visit(node.expr)
+            constant = self.constant_node(expr)
+            if constant is not None:
+                self.constants[name] = constant
+            else:
+                self.constants.pop(name, None)
+        return [node if expr is node.expr else AssignmentNode(node.identifier, expr)]
+
+    def call_statement(self, node):
+        evaluated = self.evaluate_primitive(node, None)
+        if evaluated is not None:
+            return evaluated
+        return [StatementNode(self.call(node))]
+
+    def if_statement(self, node):
+        condition = self.visit(node.condition)
+        truth = self.truth(condition)
+        if truth is not None and self.level >= 2:
+            self.stats['eliminated'] += 1
+            taken = node.if_body if truth else node.else_body
+            return self.block(taken) if taken else []
+
+        before = dict(self.constants)
+        if_body = self.block(node.if_body)
+        after_if = self.constants
+        self.constants = before
+        else_body = None
+        if node.else_body:
+            self.constants = dict(before)
+            else_body = StatementsNode(self.block(node.else_body))
+        # Known after the if only where both branches agree
+        self.constants = {name: constant for name, constant in self.constants.items()
+                          if self.same_constant(after_if.get(name), constant)}
+        return [StatementNode(IfNode(condition, StatementsNode(if_body), else_body))]
+
+    def while_statement(self, node):
+        # Variables assigned in the body are unknown at the loop head
+        before = self.constants
+        variant = assigned(node.body)
+        self.constants = {name: constant for name, constant in before.items() if name not in variant}
+        condition = self.visit(node.condition)
+        if self.level >= 2 and self.truth(condition) is False:
+            self.stats['eliminated'] += 1
+            self.constants = before
+            return []
+
+        loop_head = dict(self.constants)
+        body = self.block(node.body)
+        self.constants = loop_head
+        return [StatementNode(WhileNode(condition, StatementsNode(body)))]
+
+    # Expressions: each becomes an equivalent expression
+
+    def visit(self, node):
+        visitor = getattr(self, f"visit_{type(node).__name__}", None)
+        return visitor(node) if visitor else node
+
+    def visit_IdentifierNode(self, node):
+        constant = self.constants.get(node.name)
+        if isinstance(constant, NumberNode):
+            self.stats['propagated'] += 1
+            return self.number(constant.value, node)
+        # Vector constants are only substituted when they fold away
+        return node
+
+    def visit_VectorNode(self, node):
+        if all(type(element) is NumberNode for element in node.elements):
+            return node
+        elements = [self.visit(element) for element in node.elements]
+        if all(new is old for new, old in zip(elements, node.elements)):
+            return node
+        return VectorNode(elements)
+
+    def visit_UnaryOpNode(self, node):
+        expr = self.visit(node.expr)
+        value = self.value(expr)
+        if node.op.token_type == TokenType.MINUS and value is not None:
+            folded = self.fold(operator.neg, (value,), node)
+            if folded is not None:
+                return folded
+        if expr is node.expr:
+            return node
+        return UnaryOpNode(self.token(node.op, node), expr)
+
+    def visit_BinaryOpNode(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = ARITHMETIC.get(node.op.token_type)
+        if op is not None:
+            values = (self.value(left), self.value(right))
+            if values[0] is not None and values[1] is not None:
+                folded = self.fold(op, values, node)
+                if folded is not None:
+                    return folded
+        if left is node.left and right is node.right:
+            return node
+        return BinaryOpNode(left, self.token(node.op, node), right)
+
+    def visit_FunctionCallNode(self, node):
+        return self.call(node)
+
+    def call(self, node):
+        """Optimize a call's arguments and forget the results it assigns
+
+        Identifier arguments are kept: the R templates use them as
+        parameter names.
+        """
+        for name in PRIMITIVE_RESULTS.get(node.identifier, ()):
+            self.constants.pop(name, None)
+        args = [arg if isinstance(arg, IdentifierNode) else self.visit(arg) for arg in node.args]
+        if all(new is old for new, old in zip(args, node.args)):
+            return node
+        return FunctionCallNode(node.identifier, args)
+
+    # Constants
+
+    def value(self, node):
+        """The constant value of an expression: a float, a float64 array,
+        or None if it is not constant"""
+        if isinstance(node, IdentifierNode):
+            node = self.constants.get(node.name)
+        if isinstance(node, NumberNode):
+            return node.value
+        if isinstance(node, PackedVectorNode):
+            return np.frombuffer(node.values, dtype=np.float64)
+        if isinstance(node, VectorNode) and all(type(element) is NumberNode for element in node.elements):
+            return np.array([element.value for element in node.elements], dtype=np.float64)
+        return None
+
+    def constant_node(self, node):
+        """The constant node an assigned expression stands for, if any"""
+        if isinstance(node, IdentifierNode):
+            return self.constants.get(node.name)
+        if isinstance(node, (NumberNode, PackedVectorNode)):
+            return node
+        if isinstance(node, VectorNode) and all(type(element) is NumberNode for element in node.elements):
+            return node
+        return None
+
+    def same_constant(self, first, second):
+        """Whether two constant nodes hold the same value"""
+        if first is second:
+            return True
+        if first is None or second is None:
+            return False
+        first, second = self.value(first), self.value(second)
+        return (type(first) is type(second) and np.shape(first) == np.shape(second)
+                and bool(np.all(first == second)))
+
+    def fold(self, op, values, node):
+        """Apply op to constant values at compile time, returning a
+        constant node, or None where run time would differ"""
+        if any(np.size(value) > FOLD_LIMIT for value in values):
+            return None
+        if op is operator.truediv:
+            divisor = values[1]
+            if np.any(np.asarray(divisor) == 0):
+                return None
+        vectors = [value for value in values if isinstance(value, np.ndarray)]
+        if len(vectors) == 2 and len(vectors[0]) != len(vectors[1]):
+            return None
+        with np.errstate(all='ignore'):
+            result = op(*values)
+        folded = self.literal(result, node)
+        if folded is not None:
+            self.stats['folded'] += 1
+        return folded
+
+    def literal(self, value, node):
+        """A literal node for a finite scalar or a short 1-D vector"""
+        if isinstance(value, np.ndarray):
+            if value.ndim != 1 or len(value) > FOLD_LIMIT or not np.isfinite(value).all():
+                return None
+            token = Token(TokenType.VECTOR, array('d', value.tolist()), *self.location(node))
+            return PackedVectorNode(token)
+        if not math.isfinite(value):
+            return None
+        return self.number(float(value), node)
+
+    def number(self, value, node):
+        return NumberNode(Token(TokenType.NUMBER, value, *self.location(node)))
+
+    def token(self, op, node):
+        return Token(op.token_type, op.value, *self.location(node))
+
+    def location(self, node):
+        """Line and column for nodes built in place of node; nodes such as
+        vectors carry no position"""
+        return getattr(node, 'line', 0), getattr(node, 'column', 0)
+
+    def truth(self, condition):
+        """The value of a comparison of constant scalars, or None"""
+        if not isinstance(condition, BinaryOpNode):
+            return None
+        compare = COMPARISONS.get(condition.op.token_type)
+        left, right = self.value(condition.left), self.value(condition.right)
+        if compare is None or not isinstance(left, float) or not isinstance(right, float):
+            return None
+        return compare(left, right)
+
+    def evaluate_primitive(self, node, target):
+        """Evaluate a pure primitive on constant data at compile time
+
+        Returns the statements replacing the call: like the call, they set
+        and print result, then assign it to target if any. Returns None if
+        the call cannot be evaluated.
+        """
+        if self.level < 2 or node.identifier not in PURE_PRIMITIVES:
+            return None
+        evaluate, arity = PURE_PRIMITIVES[node.identifier]
+        values = [self.value(self.visit(arg)) for arg in node.args[:arity]]
+        if not values or any(value is None for value in values):
+            return None
+        try:
+            with np.errstate(all='ignore'):
+                result = evaluate(*values)
+        except Exception:
+            return None
+        position = target if target is not None else node.args[0]
+        literal = self.literal(result, position)
+        if literal is None:
+            return None
+
+        self.stats['evaluated'] += 1
+        result_name = self.identifier(RESULT_NAME, position)
+        statements = [
+            AssignmentNode(result_name, literal),
+            StatementNode(FunctionCallNode('print', [result_name]))
+        ]
+        for name in PRIMITIVE_RESULTS[node.identifier]:
+            self.constants.pop(name, None)
+        self.constants[RESULT_NAME] = literal
+        if target is not None:
+            statements.append(AssignmentNode(target, result_name))
+            self.constants[target.name] = literal
+        return statements
+
+    def identifier(self, name, position):
+        return IdentifierNode(Token(TokenType.IDENTIFIER, name, *self.location(position)))
+
+    # Dead code
+
+    def may_raise(self, node):
+        """Whether evaluating an expression may raise at run time: it
+        divides by a value not known to be nonzero, or combines two values
+        not known to have the same shape"""
+        for child in walk(node):
+            if not isinstance(child, BinaryOpNode):
+                continue
+            # Variables left in optimized expressions hold no constant
+            left, right = (None if isinstance(operand, IdentifierNode) else self.value(operand)
+                           for operand in (child.left, child.right))
+            if child.op.token_type == TokenType.DIVIDE and (right is None or np.any(np.asarray(right) == 0)):
+                return True
+            # A number combines with anything
+            if left is not None and np.ndim(left) == 0 or right is not None and np.ndim(right) == 0:
+                continue
+            if left is None or right is None or np.shape(left) != np.shape(right):
+                return True
+        return False
+
+    def eliminate(self, statements, live):
+        """Remove assignments of values never read, working backwards
+
+        live holds the names read after the statements; it is updated to
+        the names read before them. Assignments whose expression calls a
+        function are kept for the call's effects, and those whose
+        expression may raise for its error.
+        """
+        kept = []
+        for statement in reversed(statements):
+            if isinstance(statement, AssignmentNode):
+                name = statement.identifier.name
+                if name not in live and not has_call(statement.expr) and not self.may_raise(statement.expr):
+                    self.stats['eliminated'] += 1
+                    continue
+                live.discard(name)
+                live |= reads(statement.expr)
+            elif isinstance(statement.statement, IfNode):
+                node = statement.statement
+                after = set(live)
+                node.if_body.statements = self.eliminate(node.if_body.statements, live)
+                if node.else_body:
+                    else_live = set(after)
+                    node.else_body.statements = self.eliminate(node.else_body.statements, else_live)
+                    live |= else_live
+                else:
+                    live |= after
+                if (not node.if_body.statements and not (node.else_body and node.else_body.statements)
+                        and not has_call(node.condition)):
+                    self.stats['eliminated'] += 1
+                    continue
+                live |= reads(node.condition)
+            elif isinstance(statement.statement, WhileNode):
+                # Anything read in the loop may be read by a later iteration
+                node = statement.statement
+                live |= reads(node)
+                node.body.statements = self.eliminate(node.body.statements, set(live))
+            else:
+                live |= reads(statement)
+            kept.append(statement)
+        kept.reverse()
+        return kept
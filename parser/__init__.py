@@ -3,12 +3,16 @@
 from .parser import (
     Parser, ASTNode, BinaryOpNode, UnaryOpNode, NumberNode, 
     IdentifierNode, AssignmentNode, StatementNode, 
-    StatementsNode, IfNode, WhileNode, FunctionCallNode, VectorNode
+    StatementsNode, IfNode, WhileNode, FunctionCallNode, VectorNode,
+    PackedVectorNode, StringNode
 )
+from .incremental import IncrementalParser, ParseResult, TextEdit
 
 __all__ = [
     'Parser', 'ASTNode', 'BinaryOpNode', 'UnaryOpNode', 
     'NumberNode', 'IdentifierNode', 'AssignmentNode', 
     'StatementNode', 'StatementsNode', 'IfNode', 
-    'WhileNode', 'FunctionCallNode', 'VectorNode'
+    'WhileNode', 'FunctionCallNode', 'VectorNode',
+    'PackedVectorNode', 'StringNode',
+    'IncrementalParser', 'ParseResult', 'TextEdit'
 ]
\ No newline at end of file
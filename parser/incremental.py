@@ -0,0 +1,194 @@
+# parser/incremental.py
+from array import array
+from bisect import bisect_left
+
+from scanner.lexer import TokenType
+from scanner.token_buffer import TokenBuffer
+from .parser import Parser, StatementsNode, ASTNode
+
+class TextEdit:
+    """Replace source_code[start:end] with text"""
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+class ParseResult:
+    """A parsed source: its tokens, AST and top-level statement token spans
+
+    spans[i] is the [first, end) token index range of ast.statements[i].
+    """
+    def __init__(self, source_code, tokens, ast, spans):
+        self.source_code = source_code
+        self.tokens = tokens
+        self.ast = ast
+        self.spans = spans
+
+def position(source_code, offset):
+    """The (line, column) of an offset, counted like token positions"""
+    line_start = source_code.rfind('\n', 0, offset) + 1
+    return source_code.count('\n', 0, offset) + 1, offset - line_start + 1
+
+def shift_positions(statements, line, line_delta, column_delta):
+    """Move the nodes of statements by line_delta lines, and those on line
+    by column_delta columns too"""
+    stack = list(statements)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, ASTNode):
+            slots = type(node).__slots__
+            if 'line' in slots:
+                if node.line == line:
+                    node.column += column_delta
+                node.line += line_delta
+            stack.extend(getattr(node, slot) for slot in slots if slot not in ('line', 'column'))
+
+class IncrementalParser:
+    """Re-lex and re-parse only the parts of a source touched by edits
+
+    Statements outside the damaged region are reused: those after it are
+    the previous parse's nodes, moved to their positions in the edited
+    source.
+    """
+
+    def __init__(self, pack_vectors=False):
+        self.pack_vectors = pack_vectors
+        # Work done by the last parse or reparse
+        self.relexed_tokens = 0
+        self.reparsed_statements = 0
+
+    def parse(self, source_code):
+        """Fully lex and parse source_code"""
+        tokens = TokenBuffer.from_source(source_code, self.pack_vectors)
+        statements, spans, _ = self.parse_statements(tokens, 0)
+        self.relexed_tokens = len(tokens)
+        self.reparsed_statements = len(statements)
+        return ParseResult(source_code, tokens, StatementsNode(statements), spans)
+
+    def parse_statements(self, tokens, first, resume=()):
+        """Parse top-level statements starting at token index first
+
+        Parsing stops early on reaching a token index in resume. Returns the
+        statements, their spans and the resume index reached, if any.
+        """
+        parser = Parser(tokens.views(first))
+        statements = []
+        spans = []
+        while parser.current_token.token_type not in (TokenType.EOF, TokenType.RBRACE):
+            start = first + parser.pos
+            if start in resume:
+                return statements, spans, start
+            statements.append(parser.statement())
+            spans.append((start, first + parser.pos))
+        return statements, spans, None
+
+    def reparse(self, previous, edits):
+        """Apply non-overlapping edits, given against previous.source_code
+
+        Edits at the same offset are applied in the order given. Raises the
+        same errors a full parse of the edited source would.
+        """
+        if not edits:
+            return previous
+        old_source = previous.source_code
+        old_tokens = previous.tokens
+        offsets = old_tokens.offsets
+        lengths = old_tokens.lengths
+        eof = len(old_tokens) - 1
+
+        # Build the new source and the damaged region, in old offsets
+        edits = sorted(edits, key=lambda edit: edit.start)
+        parts = []
+        cursor = 0
+        for edit in edits:
+            parts.append(old_source[cursor:edit.start])
+            parts.append(edit.text)
+            cursor = edit.end
+        parts.append(old_source[cursor:])
+        source_code = ''.join(parts)
+        damage_start = edits[0].start
+        damage_end = edits[-1].end
+        delta = len(source_code) - len(old_source)
+
+        # Re-lex from the end of the last token that ends before the damage:
+        # the lexer holds no state between tokens, so that is a safe restart.
+        first = bisect_left(offsets, damage_start, 0, eof)
+        if first and offsets[first - 1] + lengths[first - 1] >= damage_start:
+            first -= 1
+        relex_start = offsets[first - 1] + lengths[first - 1] if first else 0
+
+        # Re-lex up to the first unchanged token after the damage, growing
+        # the window until the lexer reaches it between tokens
+        last = bisect_left(offsets, damage_end, 0, eof)
+        step = 1
+        while last < eof:
+            window = TokenBuffer(source_code[relex_start:offsets[last] + delta])
+            if window.scan(self.pack_vectors, final=False) == len(window.source_code):
+                break
+            last += step
+            step *= 2
+        else:
+            window = TokenBuffer(source_code[relex_start:])
+            try:
+                window.scan(self.pack_vectors)
+            except Exception:
+                # Report the error with its position in the whole source
+                TokenBuffer.from_source(source_code, self.pack_vectors)
+                raise
+            last = eof + 1
+
+        tokens = self.splice(old_tokens, first, last, window, relex_start, delta, source_code)
+        count_delta = len(window) - (last - first)
+        self.relexed_tokens = len(window)
+
+        # Keep the statements whose tokens, and the lookahead token that
+        # ended them, all precede the re-lexed ones. Re-parse from there
+        # until reaching the start of an old statement after them.
+        old_spans = previous.spans
+        kept = 0
+        while kept < len(old_spans) and old_spans[kept][1] < first:
+            kept += 1
+        start = old_spans[kept - 1][1] if kept else 0
+        resume = {}
+        for index in range(kept, len(old_spans)):
+            if old_spans[index][0] >= last:
+                resume[old_spans[index][0] + count_delta] = index
+        statements, spans, resumed = self.parse_statements(tokens, start, resume)
+        self.reparsed_statements = len(statements)
+
+        statements = previous.ast.statements[:kept] + statements
+        spans = old_spans[:kept] + spans
+        if resumed is not None:
+            index = resume[resumed]
+            # The source after the damage is unchanged, but may have moved
+            old_line, old_column = position(old_source, damage_end)
+            new_line, new_column = position(source_code, damage_end + delta)
+            if (old_line, old_column) != (new_line, new_column):
+                shift_positions(previous.ast.statements[index:], old_line, new_line - old_line,
+                                new_column - old_column)
+            statements += previous.ast.statements[index:]
+            spans += [(a + count_delta, b + count_delta) for a, b in old_spans[index:]]
+        return ParseResult(source_code, tokens, StatementsNode(statements), spans)
+
+    def splice(self, old_tokens, first, last, window, relex_start, delta, source_code):
+        """Replace old tokens [first, last) with the tokens of window"""
+        tokens = TokenBuffer(source_code)
+        tokens.types = old_tokens.types[:first] + window.types + old_tokens.types[last:]
+        tokens.offsets = (old_tokens.offsets[:first] +
+                          array('q', [offset + relex_start for offset in window.offsets]) +
+                          array('q', [offset + delta for offset in old_tokens.offsets[last:]]))
+        tokens.lengths = old_tokens.lengths[:first] + window.lengths + old_tokens.lengths[last:]
+        # Lexer leaves the EOF token on the last character of the source
+        tokens.offsets[-1] = max(len(source_code) - 1, 0)
+
+        count_delta = len(window) - (last - first)
+        for index, values in old_tokens.vectors.items():
+            if index < first:
+                tokens.vectors[index] = values
+            elif index >= last:
+                tokens.vectors[index + count_delta] = values
+        for index, values in window.vectors.items():
+            tokens.vectors[index + first] = values
+        return tokens
@@ -1,43 +1,97 @@
 # parser/parser.py
+from sys import intern
+
 from scanner.lexer import TokenType, Token
 
 class ASTNode:
-    pass
+    """Base of all AST nodes
+
+    Nodes use __slots__ and keep no reference to the tokens they were built
+    from: leaf and operator nodes record the line and column of their token
+    instead, and operators are shared Operator instances.
+    """
+    __slots__ = ()
+
+class Operator:
+    """Type and text of an operator token, shared by all nodes using it"""
+    __slots__ = ('token_type', 'value')
+    _interned = {}
+
+    def __init__(self, token_type, value):
+        self.token_type = token_type
+        self.value = value
+
+    @classmethod
+    def of(cls, token):
+        """Return the shared Operator for an operator token"""
+        operator = cls._interned.get(token.token_type)
+        if operator is None:
+            operator = cls.shared(token.token_type, token.value)
+        return operator
+
+    @classmethod
+    def shared(cls, token_type, value):
+        """Return the shared Operator of a token type"""
+        operator = cls._interned.get(token_type)
+        if operator is None:
+            operator = cls._interned[token_type] = cls(token_type, value)
+        return operator
+
+    def __reduce__(self):
+        # Unpickled operators are the shared ones too
+        return (Operator.shared, (self.token_type, self.value))
 
 class BinaryOpNode(ASTNode):
+    __slots__ = ('left', 'op', 'right', 'line', 'column')
+
     def __init__(self, left, op, right):
         self.left = left
-        self.op = op
+        self.op = Operator.of(op)
         self.right = right
+        self.line = op.line
+        self.column = op.column
     
     def __str__(self):
         return f"({self.left} {self.op.value} {self.right})"
 
 class UnaryOpNode(ASTNode):
+    __slots__ = ('op', 'expr', 'line', 'column')
+
     def __init__(self, op, expr):
-        self.op = op
+        self.op = Operator.of(op)
         self.expr = expr
+        self.line = op.line
+        self.column = op.column
     
     def __str__(self):
         return f"({self.op.value}{self.expr})"
 
 class NumberNode(ASTNode):
+    __slots__ = ('value', 'line', 'column')
+
     def __init__(self, token):
-        self.token = token
         self.value = token.value
+        self.line = token.line
+        self.column = token.column
     
     def __str__(self):
         return str(self.value)
 
 class IdentifierNode(ASTNode):
+    __slots__ = ('name', 'line', 'column')
+
     def __init__(self, token):
-        self.token = token
-        self.name = token.value
+        # Names repeat throughout a program: keep one copy of each
+        self.name = intern(token.value)
+        self.line = token.line
+        self.column = token.column
     
     def __str__(self):
         return self.name
 
 class AssignmentNode(ASTNode):
+    __slots__ = ('identifier', 'expr')
+
     def __init__(self, identifier, expr):
         self.identifier = identifier
         self.expr = expr
@@ -46,6 +100,8 @@ class AssignmentNode(ASTNode):
         return f"{self.identifier} = {self.expr}"
 
 class StatementNode(ASTNode):
+    __slots__ = ('statement',)
+
     def __init__(self, statement):
         self.statement = statement
     
@@ -53,6 +109,8 @@ class StatementNode(ASTNode):
         return str(self.statement)
 
 class StatementsNode(ASTNode):
+    __slots__ = ('statements',)
+
     def __init__(self, statements):
         self.statements = statements if statements else []
     
@@ -60,6 +118,8 @@ class StatementsNode(ASTNode):
         return '\n'.join(str(stmt) for stmt in self.statements)
 
 class IfNode(ASTNode):
+    __slots__ = ('condition', 'if_body', 'else_body')
+
     def __init__(self, condition, if_body, else_body=None):
         self.condition = condition
         self.if_body = if_body
@@ -72,6 +132,8 @@ class IfNode(ASTNode):
         return result
 
 class WhileNode(ASTNode):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
@@ -80,6 +142,8 @@ class WhileNode(ASTNode):
         return f"while ({self.condition}) {{\n{self.body}\n}}"
 
 class FunctionCallNode(ASTNode):
+    __slots__ = ('identifier', 'args')
+
     def __init__(self, identifier, args):
         self.identifier = identifier
         self.args = args
@@ -89,6 +153,8 @@ class FunctionCallNode(ASTNode):
         return f"{self.identifier}({args_str})"
 
 class VectorNode(ASTNode):
+    __slots__ = ('elements',)
+
     def __init__(self, elements):
         self.elements = elements
     
@@ -96,33 +162,80 @@ class VectorNode(ASTNode):
         elements_str = ', '.join(str(elem) for elem in self.elements)
         return f"[{elements_str}]"
 
+class PackedVectorNode(ASTNode):
+    """All-constant numeric vector literal held as an array('d')"""
+    __slots__ = ('values', 'line', 'column')
+
+    def __init__(self, token):
+        self.values = token.value
+        self.line = token.line
+        self.column = token.column
+    
+    def __str__(self):
+        elements_str = ', '.join(map(str, self.values))
+        return f"[{elements_str}]"
+
 class StringNode(ASTNode):
+    __slots__ = ('value', 'line', 'column')
+
     def __init__(self, token):
-        self.token = token
         self.value = token.value
+        self.line = token.line
+        self.column = token.column
     
     def __str__(self):
         return f'"{self.value}"'
 
+# Binding power of each binary operator; all are left associative. Unary
+# minus binds tighter than any of them, applying to a single factor.
+BINARY_PRECEDENCE = {
+    TokenType.PLUS: 1,
+    TokenType.MINUS: 1,
+    TokenType.MULTIPLY: 2,
+    TokenType.DIVIDE: 2
+}
+
+# Kinds of Parser.expression stack frames
+UNARY, BINARY, GROUP, CALL, VECTOR = 'unary', 'binary', 'group', 'call', 'vector'
+
 class Parser:
     def __init__(self, tokens):
+        # tokens may be a list or any iterator of tokens (e.g. a streaming
+        # lexer); only one token of lookahead is ever buffered.
         self.tokens = tokens
+        self.token_iter = iter(tokens)
         self.pos = 0
-        self.current_token = tokens[0]
+        self.current_token = next(self.token_iter)
+        self.next_token = None
     
     def error(self, expected):
         token = self.current_token
         raise Exception(f"Syntax error at {token.line}:{token.column}: Expected {expected}, but got {token.token_type.name} '{token.value}'")
     
+    def peek(self):
+        """Return the token after the current one, or None at the end"""
+        if self.next_token is None:
+            self.next_token = next(self.token_iter, None)
+        return self.next_token
+    
     def eat(self, token_type):
         """Consume the current token if it matches the expected type"""
         if self.current_token.token_type == token_type:
-            self.pos += 1
-            if self.pos < len(self.tokens):
-                self.current_token = self.tokens[self.pos]
+            self.advance()
         else:
             self.error(token_type.name)
     
+    def advance(self):
+        """Consume the current token, whose type the caller has checked"""
+        self.pos += 1
+        token = self.next_token
+        if token is None:
+            token = next(self.token_iter, None)
+        else:
+            self.next_token = None
+        if token is not None:
+            self.current_token = token
+    
     def program(self):
         """Program -> Statements"""
         statements = self.statements()
@@ -130,19 +243,21 @@ class Parser:
     
     def statements(self):
         """Statements -> Statement Statements | ε"""
-        statements = []
-        
+        return StatementsNode(list(self.iter_statements()))
+    
+    def iter_statements(self):
+        """Yield statements one at a time as they are parsed, up to the
+        end of the input or of the enclosing block"""
         while (self.current_token.token_type != TokenType.EOF and 
                self.current_token.token_type != TokenType.RBRACE):
-            statements.append(self.statement())
-        
-        return StatementsNode(statements)
+            yield self.statement()
     
     def statement(self):
         """Statement -> Assignment | ConditionalStatement | LoopStatement | FunctionCall"""
         if self.current_token.token_type == TokenType.IDENTIFIER:
             # Look ahead to check if it's an assignment or function call
-            if self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1].token_type == TokenType.ASSIGN:
+            next_token = self.peek()
+            if next_token is not None and next_token.token_type == TokenType.ASSIGN:
                 return self.assignment_statement()
             else:
                 return StatementNode(self.function_call())
@@ -200,7 +315,7 @@ class Parser:
         args = []
         if self.current_token.token_type != TokenType.RPAREN:
             # First check if it's a vector literal starting here
-            if self.current_token.token_type == TokenType.LBRACKET:
+            if self.current_token.token_type in (TokenType.LBRACKET, TokenType.VECTOR):
                 args.append(self.vector())
             else:
                 args.append(self.expression())
@@ -209,7 +324,7 @@ class Parser:
                 self.eat(TokenType.COMMA)
                 
                 # Check again if it's a vector literal
-                if self.current_token.token_type == TokenType.LBRACKET:
+                if self.current_token.token_type in (TokenType.LBRACKET, TokenType.VECTOR):
                     args.append(self.vector())
                 else:
                     args.append(self.expression())
@@ -218,20 +333,105 @@ class Parser:
         return FunctionCallNode(identifier, args)
     
     def expression(self):
-        """Expression -> Term ((PLUS | MINUS) Term)*"""
-        node = self.term()
-        
-        while (self.current_token.token_type in 
-               (TokenType.PLUS, TokenType.MINUS)):
+        """Expression -> Term ((PLUS | MINUS) Term)*
+        Term -> Factor ((MULTIPLY | DIVIDE) Factor)*
+        Factor -> NUMBER | STRING | IDENTIFIER | ( Expression ) | -Factor | FunctionCall | Vector | VECTOR
+
+        Pratt parser driven by BINARY_PRECEDENCE. Pending operators, open
+        parentheses, call arguments and vector elements are kept on an
+        explicit stack instead of the call stack, so neither long operator
+        chains nor deep nesting run into Python's recursion limit.
+        """
+        stack = []
+        while True:
+            # Prefix position: open constructs until an operand is complete
             token = self.current_token
-            if token.token_type == TokenType.PLUS:
-                self.eat(TokenType.PLUS)
+            token_type = token.token_type
+            argument = False
+            if token_type == TokenType.MINUS:
+                self.advance()
+                stack.append((UNARY, token))
+                continue
+            elif token_type == TokenType.LPAREN:
+                self.advance()
+                stack.append((GROUP,))
+                continue
+            elif token_type == TokenType.LBRACKET:
+                # A vector opening a call argument is the whole argument
+                argument = bool(stack) and stack[-1][0] is CALL
+                self.advance()
+                if self.current_token.token_type != TokenType.RBRACKET:
+                    stack.append((VECTOR, [], argument))
+                    continue
+                self.advance()
+                node = VectorNode([])
+            elif token_type == TokenType.IDENTIFIER:
+                next_token = self.peek()
+                if next_token is not None and next_token.token_type == TokenType.LPAREN:
+                    self.advance()
+                    self.advance()
+                    if self.current_token.token_type != TokenType.RPAREN:
+                        stack.append((CALL, token.value, []))
+                        continue
+                    self.advance()
+                    node = FunctionCallNode(token.value, [])
+                else:
+                    self.advance()
+                    node = IdentifierNode(token)
+            elif token_type == TokenType.NUMBER:
+                self.advance()
+                node = NumberNode(token)
+            elif token_type == TokenType.STRING:
+                self.advance()
+                node = StringNode(token)
+            elif token_type == TokenType.VECTOR:
+                # Packed, it is still the whole argument it opens
+                argument = bool(stack) and stack[-1][0] is CALL
+                self.advance()
+                node = PackedVectorNode(token)
             else:
-                self.eat(TokenType.MINUS)
-            
-            node = BinaryOpNode(node, token, self.term())
-        
-        return node
+                self.error("factor")
+
+            # Operand complete: reduce until the next operator or element
+            while True:
+                if not argument:
+                    while stack and stack[-1][0] is UNARY:
+                        node = UnaryOpNode(stack.pop()[1], node)
+                    op = self.current_token
+                    precedence = BINARY_PRECEDENCE.get(op.token_type)
+                    # Operators are left associative: reduce equal precedence
+                    while (stack and stack[-1][0] is BINARY and
+                           (precedence is None or stack[-1][3] >= precedence)):
+                        _, left, left_op, _ = stack.pop()
+                        node = BinaryOpNode(left, left_op, node)
+                    if precedence is not None:
+                        self.advance()
+                        stack.append((BINARY, node, op, precedence))
+                        break
+
+                # End of an expression: close the innermost open construct
+                if not stack:
+                    return node
+                frame = stack[-1]
+                if frame[0] is GROUP:
+                    self.eat(TokenType.RPAREN)
+                    stack.pop()
+                    argument = False
+                    continue
+                items = frame[2] if frame[0] is CALL else frame[1]
+                items.append(node)
+                if self.current_token.token_type == TokenType.COMMA:
+                    self.advance()
+                    break
+                stack.pop()
+                if frame[0] is CALL:
+                    self.eat(TokenType.RPAREN)
+                    node = FunctionCallNode(frame[1], items)
+                    argument = False
+                else:
+                    self.eat(TokenType.RBRACKET)
+                    node = VectorNode(items)
+                    argument = frame[2]
     
     def condition(self):
         """Condition -> Expression (GREATER|LESS) Expression"""
@@ -250,59 +450,12 @@ class Parser:
         
         return left
     
-    def term(self):
-        """Term -> Factor ((MULTIPLY | DIVIDE) Factor)*"""
-        node = self.factor()
-        
-        while (self.current_token.token_type in 
-               (TokenType.MULTIPLY, TokenType.DIVIDE)):
-            token = self.current_token
-            if token.token_type == TokenType.MULTIPLY:
-                self.eat(TokenType.MULTIPLY)
-            else:
-                self.eat(TokenType.DIVIDE)
-            
-            node = BinaryOpNode(node, token, self.factor())
-        
-        return node
-    
-    def factor(self):
-        """Factor -> NUMBER | IDENTIFIER | ( Expression ) | -Factor | FunctionCall | Vector"""
-        token = self.current_token
-        
-        if token.token_type == TokenType.NUMBER:
-            self.eat(TokenType.NUMBER)
-            return NumberNode(token)
-        
-        elif token.token_type == TokenType.STRING:
-            self.eat(TokenType.STRING)
-            return StringNode(token)
-                
-        elif token.token_type == TokenType.IDENTIFIER:
-            # Look ahead to check if it's a function call
-            if self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1].token_type == TokenType.LPAREN:
-                return self.function_call()
-            else:
-                self.eat(TokenType.IDENTIFIER)
-                return IdentifierNode(token)
-        
-        elif token.token_type == TokenType.LPAREN:
-            self.eat(TokenType.LPAREN)
-            node = self.expression()
-            self.eat(TokenType.RPAREN)
-            return node
-        
-        elif token.token_type == TokenType.MINUS:
-            self.eat(TokenType.MINUS)
-            return UnaryOpNode(token, self.factor())
-        
-        elif token.token_type == TokenType.LBRACKET:
-            return self.vector()
-        
-        self.error("factor")
-    
     def vector(self):
-        """Vector -> [ [Expression [, Expression]*] ]"""
+        """Vector -> [ [Expression [, Expression]*] ] | VECTOR"""
+        if self.current_token.token_type == TokenType.VECTOR:
+            token = self.current_token
+            self.advance()
+            return PackedVectorNode(token)
         self.eat(TokenType.LBRACKET)
         
         elements = []
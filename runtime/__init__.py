@@ -1,4 +1,5 @@
 # runtime/__init__.py
-from .executor import RuntimeExecutor
+from .executor import RuntimeExecutor, RunMetrics
+from .pool import WorkerPool
 
-__all__ = ['RuntimeExecutor']
\ No newline at end of file
+__all__ = ['RuntimeExecutor', 'RunMetrics', 'WorkerPool']
\ No newline at end of file
@@ -1,32 +1,240 @@
 # runtime/executor.py
+import io
 import os
+import sys
+import time
+import shutil
+import signal
+import resource
+import linecache
+import threading
+import traceback
+import contextlib
 import subprocess
 import tempfile
 
+# Directory holding the wizuall_runtime package generated Python imports
+RUNTIME_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# File name generated Python runs under when executed in process
+IN_PROCESS_FILENAME = '<wizuall>'
+
+# gcc flags of the optimization profiles C can be built with
+C_PROFILES = {
+    'O2': ['-O2'],
+    'native': ['-O3', '-march=native'],
+    'openmp': ['-O3', '-march=native', '-fopenmp']
+}
+DEFAULT_C_PROFILE = 'O2'
+
+# How often a streamed program's resident memory is checked, in seconds
+MEMORY_POLL_INTERVAL = 0.05
+
+# Bytes of a streamed program's stderr kept for its error message: the
+# last ones it wrote
+STDERR_LIMIT = 64 * 1024
+
+class RunMetrics:
+    """Resources a program used: wall and CPU time in seconds, and its
+    peak resident memory in bytes, None where it could not be measured"""
+    def __init__(self, wall_time, cpu_time, peak_rss, returncode):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_rss = peak_rss
+        self.returncode = returncode
+
+    def as_dict(self):
+        return {'wall_time': self.wall_time, 'cpu_time': self.cpu_time, 'peak_rss': self.peak_rss,
+                'returncode': self.returncode}
+
+def resident_memory(pid):
+    """Resident set size of a process in bytes, or None where it cannot be
+    read"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def peak_memory(pid):
+    """Peak resident set size of a process in bytes since it last executed
+    a program, its VmHWM, or None where it cannot be read"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _maxrss(usage):
+    """ru_maxrss of an rusage in bytes"""
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+class _Watchdog(threading.Thread):
+    """Kill a process once it has run for timeout seconds or its resident
+    memory exceeds max_memory bytes; exceeded names the limit it hit
+
+    Every MEMORY_POLL_INTERVAL seconds it also samples the process's peak
+    resident memory, the largest of which is peak_rss.
+    """
+    def __init__(self, process, timeout, max_memory):
+        super().__init__(daemon=True)
+        self.process = process
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.max_memory = max_memory
+        self.stopped = threading.Event()
+        self.exceeded = None
+        self.peak_rss = None
+
+    def run(self):
+        while True:
+            peak = peak_memory(self.process.pid)
+            if peak is not None:
+                self.peak_rss = max(self.peak_rss or 0, peak)
+            interval = MEMORY_POLL_INTERVAL
+            if self.deadline is not None:
+                interval = min(interval, self.deadline - time.monotonic())
+            if self.stopped.wait(max(interval, 0)):
+                return
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.exceeded = 'timeout'
+            elif self.max_memory is not None and (resident_memory(self.process.pid) or 0) > self.max_memory:
+                self.exceeded = 'memory'
+            else:
+                continue
+            _kill(self.process)
+            return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def _kill(process):
+    """Kill a process not yet reaped; Popen.kill would reap it, losing its
+    rusage"""
+    os.kill(process.pid, signal.SIGKILL)
+
+def _drain(pipe, kept):
+    """Read a pipe to its end, keeping the last STDERR_LIMIT bytes"""
+    for chunk in iter(lambda: pipe.read1(8192), b''):
+        kept.extend(chunk)
+        del kept[:-STDERR_LIMIT]
+
 class RuntimeExecutor:
-    def __init__(self, target_code, target_language='python'):
+    def __init__(self, target_code, target_language='python', in_process=False, profile=DEFAULT_C_PROFILE,
+                 binary_cache=None):
         self.target_code = target_code
         self.target_language = target_language
+        # Generated Python runs in this interpreter, whose modules stay
+        # imported from one execution to the next
+        self.in_process = in_process and target_language == 'python'
+        self.flags = C_PROFILES[profile]
+        # Built binaries are reused from a BinaryCache, if given
+        self.binary_cache = binary_cache
+        # RunMetrics of the last streamed execution
+        self.metrics = None
         
         # Define supported target languages and their execution commands
         self.language_configs = {
             'python': {
                 'extension': '.py',
-                'execute_cmd': ['python', '{}']
+                'execute_cmd': ['python', '{source}']
             },
             'c': {
                 'extension': '.c',
-                'compile_cmd': ['gcc', '{}', '-o', '{}.out', '-lm'],
-                'execute_cmd': ['./{}']
+                'compile_cmd': ['gcc', '{source}', '-o', '{binary}', '-lm'],
+                'execute_cmd': ['{binary}']
             },
             'r': {
                 'extension': '.R',
-                'execute_cmd': ['Rscript', '{}']
+                'execute_cmd': ['Rscript', '{source}']
             }
         }
     
     def execute(self):
         """Save, compile if needed, and execute the generated code"""
+        if self.in_process:
+            return self.execute_in_process()
+        
+        with self.program() as execute_cmd:
+            # Execute the code
+            result = subprocess.run(execute_cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    env=self.environment())
+            
+            if result.returncode != 0:
+                error_message = result.stderr.decode('utf-8')
+                raise Exception(f"Execution error:\n{error_message}")
+            
+            # Return the output
+            return result.stdout.decode('utf-8')
+    
+    def stream(self, timeout=None, max_memory=None):
+        """Execute the generated code in a new process, yielding the lines
+        it prints as it prints them
+
+        The process is killed, raising TimeoutError, once it has run for
+        timeout seconds, and MemoryError once its resident memory exceeds
+        max_memory bytes, checked every MEMORY_POLL_INTERVAL seconds where
+        /proc is available. Other failures raise like execute(), with the
+        end of what the program wrote to stderr. Closing the generator
+        early kills the program. Once it has exited, metrics holds its
+        RunMetrics, from the rusage of the process.
+
+        A new process starts out counting the resident memory of this one,
+        which its rusage reports as its peak unless its own exceeds it.
+        Below that, the peak resident memory is the largest the watchdog
+        sampled, so a peak reached within the last MEMORY_POLL_INTERVAL
+        seconds may be missed, and a program exiting before the first
+        sample has none.
+        """
+        self.metrics = None
+        with self.program() as execute_cmd:
+            env = self.environment()
+            # Lines are written as they are printed rather than when a
+            # buffer fills
+            env['PYTHONUNBUFFERED'] = '1'
+            if self.target_language == 'c' and shutil.which('stdbuf'):
+                execute_cmd = ['stdbuf', '-oL', *execute_cmd]
+            inherited = _maxrss(resource.getrusage(resource.RUSAGE_SELF))
+            start = time.perf_counter()
+            process = subprocess.Popen(execute_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            stderr = bytearray()
+            reader = threading.Thread(target=_drain, args=(process.stderr, stderr), daemon=True)
+            reader.start()
+            watchdog = _Watchdog(process, timeout, max_memory)
+            watchdog.start()
+            try:
+                for line in process.stdout:
+                    yield line.decode('utf-8', errors='replace')
+            finally:
+                if sys.exc_info()[0] is not None:
+                    _kill(process)
+                # Limits hold until the program exits, which leaves it to
+                # be reaped for its rusage
+                os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+                watchdog.stop()
+                _, status, usage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+                reader.join()
+                process.stdout.close()
+                process.stderr.close()
+                peak_rss = _maxrss(usage) if _maxrss(usage) > inherited else watchdog.peak_rss
+                self.metrics = RunMetrics(time.perf_counter() - start, usage.ru_utime + usage.ru_stime,
+                                          peak_rss, process.returncode)
+            
+            if watchdog.exceeded == 'timeout':
+                raise TimeoutError(f"Execution timed out after {timeout}s")
+            if watchdog.exceeded == 'memory':
+                raise MemoryError(f"Execution exceeded {max_memory} bytes of memory")
+            if process.returncode != 0:
+                raise Exception(f"Execution error:\n{stderr.decode('utf-8', errors='replace')}")
+    
+    @contextlib.contextmanager
+    def program(self):
+        """Save, and compile if needed, the generated code; yields the
+        command executing it, then removes the files"""
         if self.target_language not in self.language_configs:
             raise ValueError(f"Unsupported target language: {self.target_language}")
         
@@ -37,31 +245,12 @@ class RuntimeExecutor:
             temp_filename = temp.name
             temp.write(self.target_code.encode('utf-8'))
         
+        # Compiled programs are written next to their source
+        paths = {'source': temp_filename, 'binary': temp_filename[:-len(config['extension'])] + '.out'}
         try:
             # Compile if needed (e.g., for C)
-            if 'compile_cmd' in config:
-                compile_cmd = [cmd.format(temp_filename) for cmd in config['compile_cmd']]
-                result = subprocess.run(compile_cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-                
-                if result.returncode != 0:
-                    error_message = result.stderr.decode('utf-8')
-                    raise Exception(f"Compilation error:\n{error_message}")
-                
-                # Set the execute command to the compiled binary
-                execute_cmd = [cmd.format(temp_filename.replace(config['extension'], '.out')) for cmd in config['execute_cmd']]
-            else:
-                # For interpreted languages
-                execute_cmd = [cmd.format(temp_filename) for cmd in config['execute_cmd']]
-            
-            # Execute the code
-            result = subprocess.run(execute_cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-            
-            if result.returncode != 0:
-                error_message = result.stderr.decode('utf-8')
-                raise Exception(f"Execution error:\n{error_message}")
-            
-            # Return the output
-            return result.stdout.decode('utf-8')
+            binary = self.build(config, paths) if 'compile_cmd' in config else None
+            yield [cmd.format(**dict(paths, binary=binary)) for cmd in config['execute_cmd']]
         
         finally:
             # Clean up temporary files
@@ -69,7 +258,76 @@ class RuntimeExecutor:
                 os.unlink(temp_filename)
             
             # Clean up compiled binary for C
-            if self.target_language == 'c':
-                binary_path = temp_filename.replace(config['extension'], '.out')
-                if os.path.exists(binary_path):
-                    os.unlink(binary_path)
\ No newline at end of file
+            if os.path.exists(paths['binary']):
+                os.unlink(paths['binary'])
+    
+    def build(self, config, paths):
+        """Compile the program with the profile's flags, unless the binary
+        cache has it already; returns the path of the binary to run"""
+        key = None
+        if self.binary_cache is not None:
+            key = self.binary_cache.key(self.target_code, self.flags)
+            cached = self.binary_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        compile_cmd = [cmd.format(**paths) for cmd in config['compile_cmd']] + self.flags
+        result = subprocess.run(compile_cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+        
+        if result.returncode != 0:
+            error_message = result.stderr.decode('utf-8')
+            raise Exception(f"Compilation error:\n{error_message}")
+        
+        if key is not None:
+            return self.binary_cache.put(key, paths['binary']) or paths['binary']
+        return paths['binary']
+    
+    def execute_in_process(self):
+        """Run the generated Python in this interpreter, as the main module
+        of a fresh namespace, and return what it printed
+
+        Errors are reported as a new interpreter reports them: an exception
+        or a non-zero exit raises with what the program wrote to stderr
+        and the traceback. Output a program writes straight to the file
+        descriptors is not captured, and as stdout is redirected for the
+        whole process, programs should not run in process concurrently.
+        """
+        program = compile(self.target_code, IN_PROCESS_FILENAME, 'exec')
+        # Tracebacks show the program's lines like they do for a file
+        linecache.cache[IN_PROCESS_FILENAME] = (len(self.target_code), None,
+                                                self.target_code.splitlines(True), IN_PROCESS_FILENAME)
+        if RUNTIME_PATH not in sys.path:
+            sys.path.insert(0, RUNTIME_PATH)
+        namespace = {'__name__': '__main__', '__builtins__': __builtins__}
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = sys.argv
+        sys.argv = [IN_PROCESS_FILENAME]
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    exec(program, namespace)
+                except SystemExit as error:
+                    if error.code not in (None, 0):
+                        if not isinstance(error.code, int):
+                            print(error.code, file=sys.stderr)
+                        raise Exception(f"Execution error:\n{stderr.getvalue()}") from None
+                except Exception as error:
+                    # Leave this frame out of the traceback
+                    stderr.write(''.join(traceback.format_exception(type(error), error,
+                                                                    error.__traceback__.tb_next)))
+                    raise Exception(f"Execution error:\n{stderr.getvalue()}") from None
+        finally:
+            sys.argv = argv
+            linecache.cache.pop(IN_PROCESS_FILENAME, None)
+            # Figures would otherwise pile up from one program to the next
+            pyplot = sys.modules.get('matplotlib.pyplot')
+            if pyplot is not None:
+                pyplot.close('all')
+        return stdout.getvalue()
+    
+    def environment(self):
+        """Environment of the program, able to import wizuall_runtime"""
+        env = dict(os.environ)
+        paths = [RUNTIME_PATH] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else [])
+        env['PYTHONPATH'] = os.pathsep.join(paths)
+        return env
@@ -0,0 +1,203 @@
+# runtime/pool.py
+import os
+import sys
+import queue
+import threading
+import importlib
+import resource
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from runtime.executor import RuntimeExecutor, RUNTIME_PATH
+
+# Modules each worker imports once, before its first program
+WARM_MODULES = (
+    'numpy', 'matplotlib.pyplot', 'sklearn.cluster', 'sklearn.ensemble', 'sklearn.svm',
+    'sklearn.model_selection', 'sklearn.metrics', 'wizuall_runtime'
+)
+
+DEFAULT_MAX_JOBS = 100
+
+def resident_memory():
+    """Resident set size of this process in bytes; its peak where the
+    current size is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def _worker(connection, max_jobs, max_memory):
+    """Run the programs received on connection until told to stop or due
+    for recycling
+
+    Each reply is (error, output, recycle): error is the message of a
+    failed execution, and recycle whether the worker exits after it.
+    """
+    if RUNTIME_PATH not in sys.path:
+        sys.path.insert(0, RUNTIME_PATH)
+    import matplotlib
+    matplotlib.use('Agg')
+    for name in WARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    baseline = resident_memory()
+    connection.send(None)
+    jobs = 0
+    while True:
+        try:
+            code = connection.recv()
+        except EOFError:
+            return
+        if code is None:
+            return
+        output = error = None
+        try:
+            output = RuntimeExecutor(code, in_process=True).execute()
+        except Exception as exception:
+            error = str(exception)
+        jobs += 1
+        recycle = jobs >= max_jobs or (max_memory is not None and resident_memory() - baseline > max_memory)
+        connection.send((error, output, recycle))
+        if recycle:
+            return
+
+class _Worker:
+    """A worker process and the parent's end of its pipe"""
+    def __init__(self, context, max_jobs, max_memory):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker, args=(child, max_jobs, max_memory), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def wait_ready(self):
+        """Wait until the worker has imported its modules"""
+        if not self.ready:
+            self.connection.recv()
+            self.ready = True
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.connection.close()
+
+class WorkerPool:
+    """Execute generated Python programs on a pool of warm worker processes
+
+    Workers import NumPy, matplotlib (with the Agg backend), scikit-learn
+    and wizuall_runtime once when they start, then run the programs sent
+    to them over a pipe, each as __main__ in a fresh namespace like
+    RuntimeExecutor does in process, returning the output or raising the
+    same errors. A worker is replaced by a new one after max_jobs
+    programs, once its resident memory has grown by more than max_memory
+    bytes since it started, or when a program outlives its timeout.
+
+    execute() runs a program on the next idle worker and may be called
+    from several threads; submit() and map() queue programs for the
+    pool's own threads, one per worker.
+    """
+
+    def __init__(self, size=None, max_jobs=DEFAULT_MAX_JOBS, max_memory=None, timeout=None):
+        self.size = size or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
+        self.timeout = timeout
+        # Workers import the modules themselves rather than inheriting
+        # the parent's state
+        self.context = multiprocessing.get_context('spawn')
+        self.idle = queue.Queue()
+        # Guards the worker list and the stats
+        self.lock = threading.Lock()
+        self.workers = [self.start_worker() for _ in range(self.size)]
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.executor = ThreadPoolExecutor(self.size)
+        self.stats = {'jobs': 0, 'errors': 0, 'timeouts': 0, 'recycled': 0}
+
+    def start_worker(self):
+        return _Worker(self.context, self.max_jobs, self.max_memory)
+
+    def wait_ready(self):
+        """Wait until every worker has imported its modules"""
+        with self.lock:
+            workers = list(self.workers)
+        for worker in workers:
+            worker.wait_ready()
+
+    def execute(self, code, timeout=None):
+        """Run a program on an idle worker and return its output
+
+        Raises TimeoutError if it runs longer than timeout seconds (by
+        default the pool's), and Exception with the program's error
+        otherwise.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        worker = self.idle.get()
+        try:
+            try:
+                worker.wait_ready()
+                worker.connection.send(code)
+                finished = worker.connection.poll(timeout)
+                if finished:
+                    error, output, recycle = worker.connection.recv()
+            except (EOFError, OSError):
+                # The worker died, taking the program with it
+                failed, worker = worker, self.replace(worker, kill=True)
+                raise Exception(f"Execution error:\nWorker exited with code {failed.process.exitcode}")
+            if not finished:
+                self.count('timeouts')
+                worker = self.replace(worker, kill=True)
+                raise TimeoutError(f"Execution timed out after {timeout}s")
+            self.count('jobs')
+            if recycle:
+                self.count('recycled')
+                worker = self.replace(worker)
+            if error is not None:
+                self.count('errors')
+                raise Exception(error)
+            return output
+        finally:
+            self.idle.put(worker)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def replace(self, worker, kill=False):
+        """Stop a worker and start another in its place"""
+        worker.stop(kill)
+        replacement = self.start_worker()
+        with self.lock:
+            self.workers[self.workers.index(worker)] = replacement
+        return replacement
+
+    def submit(self, code, timeout=None):
+        """Queue a program, returning a Future of its output"""
+        return self.executor.submit(self.execute, code, timeout)
+
+    def map(self, codes, timeout=None):
+        """Outputs of programs run on the pool, in order"""
+        return [future.result() for future in [self.submit(code, timeout) for code in codes]]
+
+    def close(self):
+        """Stop the workers once the queued programs have run"""
+        self.executor.shutdown()
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,5 +1,11 @@
 # scanner/__init__.py
 
 from .lexer import Lexer, Token, TokenType
+from .fast_lexer import FastLexer
+from .stream_lexer import StreamingLexer
+from .token_buffer import TokenBuffer, TokenView
 
-__all__ = ['Lexer', 'Token', 'TokenType']
+__all__ = [
+    'Lexer', 'FastLexer', 'StreamingLexer', 'TokenBuffer',
+    'TokenView', 'Token', 'TokenType'
+]
@@ -0,0 +1,258 @@
+# scanner/fast_lexer.py
+import re
+from array import array
+
+from .lexer import Lexer, Token, TokenType
+
+# Candidate for a vector literal made only of (optionally negated) numbers,
+# which can be lexed as a single VECTOR token holding an array('d'). The
+# pattern has no repeated groups, so the regex engine needs no per-element
+# state; packed_values then rejects candidates that are not well formed.
+VECTOR_LITERAL = r'\[[\s0-9.,\-]*\]'
+
+# The start of a vector literal that may still become packable once more
+# input arrives
+PARTIAL_VECTOR = re.compile(r'\[[\s0-9.,\-]*\Z', re.ASCII)
+
+# Master pattern: one alternative per token class. Only ASCII is matched here;
+# anything else lands in OTHER and is handed to the reference Lexer so the
+# token stream (and the errors it raises) stays identical.
+TOKEN_PATTERN_TEMPLATE = r"""
+  [ \t\r\f\v]*
+  (?:
+    VECTOR_ALTERNATIVE
+    (?P<NUMBER>[0-9]+(?:\.[0-9]*)?|\.[0-9]*)
+  | (?P<OP>[-+*/=<>(){}\[\],])
+  | (?P<NEWLINE>\n)
+  | (?P<IDENTIFIER>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<COMMENT>\#[^\n]*)
+  | (?P<STRING>"[^"]*")
+  | (?P<OTHER>.)
+  | \Z
+  )
+"""
+
+TOKEN_PATTERN = re.compile(
+    TOKEN_PATTERN_TEMPLATE.replace('VECTOR_ALTERNATIVE', ''),
+    re.VERBOSE | re.DOTALL | re.ASCII)
+PACKED_TOKEN_PATTERN = re.compile(
+    TOKEN_PATTERN_TEMPLATE.replace('VECTOR_ALTERNATIVE', f'(?P<VECTOR>{VECTOR_LITERAL}) |'),
+    re.VERBOSE | re.DOTALL | re.ASCII)
+
+def packed_values(text):
+    """Convert the text of a VECTOR_LITERAL match to an array('d')
+
+    Raises ValueError unless every element is a single number, optionally
+    negated, as in [1, -2.5, .5]; the literal is then lexed token by token.
+    """
+    return array('d', map(float, text[1:-1].split(',')))
+
+OPERATORS = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '=': TokenType.ASSIGN,
+    '>': TokenType.GREATER,
+    '<': TokenType.LESS,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    '[': TokenType.LBRACKET,
+    ']': TokenType.RBRACKET,
+    ',': TokenType.COMMA
+}
+
+KEYWORDS = {
+    'if': TokenType.IF,
+    'else': TokenType.ELSE,
+    'while': TokenType.WHILE
+}
+
+class ScanState:
+    """Position of a scan: offset into the source and the current line
+
+    line_start and prev_line_start are the offsets of the first character
+    of the current and previous line. They may be negative when the scanned
+    source is a window onto a larger input.
+    """
+
+    def __init__(self, position=0, line=1, line_start=0, prev_line_start=0):
+        self.position = position
+        self.line = line
+        self.line_start = line_start
+        self.prev_line_start = prev_line_start
+
+    def advance_lines(self, source, start, end):
+        """Account for the newlines in source[start:end]"""
+        newlines = source.count('\n', start, end)
+        if newlines:
+            last = source.rfind('\n', start, end)
+            if newlines > 1:
+                self.prev_line_start = source.rfind('\n', start, last) + 1
+            else:
+                self.prev_line_start = self.line_start
+            self.line += newlines
+            self.line_start = last + 1
+
+    def eof_token(self, end, last_char):
+        """Build the EOF token for a source ending at offset end in last_char
+
+        Lexer leaves the EOF token on the last character of the source, or
+        at 1:1 when the source is empty (last_char is '').
+        """
+        if not last_char:
+            return Token(TokenType.EOF, None, 1, 1)
+        last = end - 1
+        if last_char == '\n':
+            return Token(TokenType.EOF, None, self.line - 1, last - self.prev_line_start + 1)
+        return Token(TokenType.EOF, None, self.line, last - self.line_start + 1)
+
+def _fallback(source, start, state):
+    """Lex a single token with the reference Lexer starting at start
+
+    Returns the token, the offset of its first character (the reference
+    lexer may skip whitespace and comments first) and the offset after it.
+    """
+    lexer = Lexer(source)
+    lexer.position = start
+    lexer.line = state.line
+    lexer.column = start - state.line_start + 1
+    lexer.current_char = source[start]
+    while lexer.current_char is not None:
+        if lexer.current_char.isspace():
+            lexer.skip_whitespace()
+        elif lexer.current_char == '#':
+            lexer.skip_comment()
+        else:
+            break
+    token_start = lexer.position
+    token = lexer.get_next_token()
+    return token, token_start, lexer.position
+
+def scan(source, state, final=True, pack_vectors=False):
+    """Yield tokens from source, starting from and updating state
+
+    When final is False, source is only a prefix of the input: scanning
+    stops before any token that might continue past the end of source,
+    leaving state.position on its first character.
+
+    With pack_vectors, all-constant numeric vector literals are emitted as
+    one VECTOR token whose value is an array('d') of the elements.
+    """
+    pattern = PACKED_TOKEN_PATTERN if pack_vectors else TOKEN_PATTERN
+    partial = pack_vectors and not final
+    length = len(source)
+    limit = length if final else -1
+    identifier = TokenType.IDENTIFIER
+    number = TokenType.NUMBER
+    keywords = KEYWORDS
+    operators = OPERATORS
+    line = state.line
+    line_start = state.line_start
+    prev_line_start = state.prev_line_start
+    position = state.position
+
+    while position < length:
+        for m in pattern.finditer(source, position):
+            kind = m.lastgroup
+            if kind is None:
+                continue
+            start = m.start(kind)
+            end = m.end()
+
+            if kind == 'NUMBER':
+                if not (end < length and source[end] < '\x80' or end == limit):
+                    break
+                yield Token(number, float(m.group(kind)), line, start - line_start + 1)
+            elif kind == 'OP':
+                text = source[start]
+                if partial and text == '[' and PARTIAL_VECTOR.match(source, start):
+                    end = length
+                    break
+                yield Token(operators[text], text, line, start - line_start + 1)
+            elif kind == 'NEWLINE':
+                line += 1
+                prev_line_start = line_start
+                line_start = end
+            elif kind == 'IDENTIFIER':
+                if not (end < length and source[end] < '\x80' or end == limit):
+                    break
+                text = m.group(kind)
+                yield Token(keywords.get(text, identifier), text, line, start - line_start + 1)
+            elif kind == 'COMMENT':
+                if end == length and not final:
+                    break
+            elif kind == 'STRING' or kind == 'VECTOR':
+                if kind == 'STRING':
+                    yield Token(TokenType.STRING, source[start + 1:end - 1], line, start - line_start + 1)
+                else:
+                    try:
+                        values = packed_values(m.group(kind))
+                    except ValueError:
+                        yield Token(TokenType.LBRACKET, '[', line, start - line_start + 1)
+                        break
+                    yield Token(TokenType.VECTOR, values, line, start - line_start + 1)
+                state.line, state.line_start, state.prev_line_start = line, line_start, prev_line_start
+                state.advance_lines(source, start, end)
+                line, line_start, prev_line_start = state.line, state.line_start, state.prev_line_start
+            else:
+                break
+        else:
+            position = length
+            break
+
+        state.line, state.line_start, state.prev_line_start = line, line_start, prev_line_start
+        state.position = start
+
+        # Not a packable literal after all: carry on after its bracket
+        if kind == 'VECTOR':
+            position = start + 1
+            continue
+
+        # A token touching the end of a partial source may continue in the
+        # next chunk, and so may a string whose closing quote is not here yet
+        # or a vector literal that might still be packed.
+        if not final and (end == length or source[start] == '"'):
+            return
+
+        # Non-ASCII input may extend an identifier or number, or be a
+        # token class of its own; the reference lexer decides.
+        try:
+            token, _, end = _fallback(source, start, state)
+        except Exception:
+            if final:
+                raise
+            return
+        if not final and end >= length:
+            return
+        if token.token_type != TokenType.EOF:
+            yield token
+        state.advance_lines(source, start, end)
+        line, line_start, prev_line_start = state.line, state.line_start, state.prev_line_start
+        position = end
+
+    state.line, state.line_start, state.prev_line_start = line, line_start, prev_line_start
+    state.position = position
+
+class FastLexer:
+    """Regex-driven lexer producing the same Token stream as Lexer
+
+    With pack_vectors, numeric vector literals become single VECTOR tokens.
+    """
+
+    def __init__(self, source_code, pack_vectors=False):
+        self.source_code = source_code
+        self.pack_vectors = pack_vectors
+
+    def tokens(self):
+        """Yield tokens lazily, ending with the EOF token"""
+        source = self.source_code
+        state = ScanState()
+        yield from scan(source, state, pack_vectors=self.pack_vectors)
+        yield state.eof_token(len(source), source[-1:])
+
+    def tokenize(self):
+        """Convert the entire source code into tokens"""
+        return list(self.tokens())
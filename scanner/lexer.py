@@ -31,6 +31,7 @@ class TokenType(Enum):
     NUMBER = auto()
     EOF = auto()
     STRING = auto()
+    VECTOR = auto()  # Packed all-constant numeric vector literal
 
 class Token:
     def __init__(self, token_type, value, line, column):
@@ -0,0 +1,65 @@
+# scanner/stream_lexer.py
+import codecs
+
+from .fast_lexer import ScanState, scan
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+class StreamingLexer:
+    """Lex a file object in fixed-size chunks, yielding tokens lazily
+
+    Accepts text files as well as binary files and mmap objects, which are
+    decoded incrementally. Only the unconsumed tail of the current chunk is
+    kept in memory, so memory use does not grow with the size of the source.
+    With pack_vectors, numeric vector literals become single VECTOR tokens.
+    """
+
+    def __init__(self, source_file, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8',
+                 pack_vectors=False):
+        self.source_file = source_file
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.pack_vectors = pack_vectors
+
+    def tokens(self):
+        """Yield tokens lazily, ending with the EOF token"""
+        read = self.source_file.read
+        decoder = None
+        state = ScanState()
+        buffer = ''
+        last_char = ''
+        read_size = self.chunk_size
+
+        while True:
+            chunk = read(read_size)
+            final = not chunk
+            if isinstance(chunk, bytes):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(self.encoding)()
+                chunk = decoder.decode(chunk, final)
+            if chunk:
+                last_char = chunk[-1]
+
+            # Drop what has been consumed; offsets in state are relative to
+            # the buffer, so shift them along with it.
+            consumed = state.position
+            buffer = buffer[consumed:] + chunk
+            state.position = 0
+            state.line_start -= consumed
+            state.prev_line_start -= consumed
+
+            yield from scan(buffer, state, final, self.pack_vectors)
+
+            if final:
+                break
+
+            # A token longer than a chunk (typically a packed vector literal)
+            # is rescanned after every read; grow the reads so that costs
+            # amortized linear time.
+            read_size = self.chunk_size if state.position else read_size * 2
+
+        yield state.eof_token(len(buffer), last_char)
+
+    def tokenize(self):
+        """Convert the entire source into tokens"""
+        return list(self.tokens())
@@ -0,0 +1,231 @@
+# scanner/token_buffer.py
+from array import array
+from bisect import bisect_right
+from functools import partial
+
+from .lexer import TokenType
+from .fast_lexer import (
+    TOKEN_PATTERN, PACKED_TOKEN_PATTERN, PARTIAL_VECTOR, OPERATORS, KEYWORDS,
+    ScanState, _fallback, packed_values
+)
+
+# Token type codes as stored in the buffer: the TokenType enum value
+TOKEN_TYPES = {token_type.value: token_type for token_type in TokenType}
+
+class TokenView:
+    """Read-only Token interface onto one entry of a TokenBuffer
+
+    The type is resolved up front since the parser tests it constantly;
+    values, lines and columns are materialized from the source on access.
+    """
+    __slots__ = ('buffer', 'index', 'token_type')
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+        self.token_type = TOKEN_TYPES[buffer.types[index]]
+
+    @property
+    def value(self):
+        return self.buffer.value(self.index)
+
+    @property
+    def line(self):
+        return self.buffer.position(self.index)[0]
+
+    @property
+    def column(self):
+        return self.buffer.position(self.index)[1]
+
+    def __str__(self):
+        return f"Token({self.token_type}, '{self.value}', {self.line}:{self.column})"
+
+class TokenBuffer:
+    """Struct-of-arrays token store
+
+    Each token costs one type code, one source offset and one length; token
+    values, lines and columns are derived from the source when requested.
+    Packed vector values are the exception, being parsed while lexing.
+    Indexing or iterating yields TokenView objects, which the Parser accepts
+    in place of Token instances. With pack_vectors, a numeric vector literal
+    takes a single VECTOR entry whatever its length.
+    """
+
+    def __init__(self, source_code):
+        self.source_code = source_code
+        self.types = array('B')
+        self.offsets = array('q')
+        self.lengths = array('l')
+        self.line_starts = None
+        self.line_numbers = None
+        # Values of VECTOR entries, by index: parsed while validating them
+        self.vectors = {}
+
+    @classmethod
+    def from_source(cls, source_code, pack_vectors=False):
+        """Lex source_code straight into a new buffer"""
+        buffer = cls(source_code)
+        buffer.scan(pack_vectors)
+        return buffer
+
+    def scan(self, pack_vectors=False, final=True):
+        """Append the tokens of the source, ending with EOF
+
+        Mirrors fast_lexer.scan, recording spans instead of building Token
+        objects. When final is False the source is only a prefix of the
+        input: no EOF is appended and scanning stops before any token that
+        might continue past the end. Returns the offset scanning stopped at.
+        """
+        source = self.source_code
+        length = len(source)
+        limit = length if final else -1
+        add_type = self.types.append
+        add_offset = self.offsets.append
+        add_length = self.lengths.append
+        identifier = TokenType.IDENTIFIER.value
+        number = TokenType.NUMBER.value
+        string = TokenType.STRING.value
+        vector = TokenType.VECTOR.value
+        pattern = PACKED_TOKEN_PATTERN if pack_vectors else TOKEN_PATTERN
+        partial = pack_vectors and not final
+        vectors = self.vectors
+        keywords = {text: token_type.value for text, token_type in KEYWORDS.items()}
+        operators = {text: token_type.value for text, token_type in OPERATORS.items()}
+        state = ScanState()
+        counted = 0
+        position = 0
+
+        while position < length:
+            for m in pattern.finditer(source, position):
+                kind = m.lastgroup
+                if kind is None or kind == 'NEWLINE':
+                    continue
+                start = m.start(kind)
+                end = m.end()
+
+                if kind == 'NUMBER':
+                    if not (end < length and source[end] < '\x80' or end == limit):
+                        break
+                    # Reject what float() would, as Lexer does
+                    if end - start == 1 and source[start] == '.':
+                        break
+                    add_type(number)
+                elif kind == 'OP':
+                    text = source[start]
+                    if partial and text == '[' and PARTIAL_VECTOR.match(source, start):
+                        end = length
+                        break
+                    add_type(operators[text])
+                elif kind == 'IDENTIFIER':
+                    if not (end < length and source[end] < '\x80' or end == limit):
+                        break
+                    add_type(keywords.get(m.group(kind), identifier))
+                elif kind == 'COMMENT':
+                    if end == length and not final:
+                        break
+                    continue
+                elif kind == 'STRING':
+                    add_type(string)
+                elif kind == 'VECTOR':
+                    try:
+                        vectors[len(self.types)] = packed_values(m.group(kind))
+                    except ValueError:
+                        add_type(operators['['])
+                        add_offset(start)
+                        add_length(1)
+                        break
+                    add_type(vector)
+                else:
+                    break
+                add_offset(start)
+                add_length(end - start)
+            else:
+                position = length
+                break
+
+            # Not a packable literal after all: carry on after its bracket
+            if kind == 'VECTOR':
+                position = start + 1
+                continue
+
+            # A token touching the end of a partial source may continue
+            if not final and (end == length or source[start] == '"'):
+                return start
+
+            # Lines are only needed by the reference lexer's error messages
+            newlines = source.count('\n', counted, start)
+            if newlines:
+                state.line += newlines
+                state.line_start = source.rfind('\n', counted, start) + 1
+            counted = start
+            try:
+                token, token_start, end = _fallback(source, start, state)
+            except Exception:
+                if final:
+                    raise
+                return start
+            if not final and end >= length:
+                return start
+            if token.token_type != TokenType.EOF:
+                add_type(token.token_type.value)
+                add_offset(token_start)
+                add_length(end - token_start)
+            position = end
+
+        if final:
+            # Lexer leaves the EOF token on the last character of the source
+            add_type(TokenType.EOF.value)
+            add_offset(max(length - 1, 0))
+            add_length(0)
+        return position
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.types)
+        if not 0 <= index < len(self.types):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        return self.views()
+
+    def views(self, start=0):
+        """Iterate over TokenViews from index start"""
+        return map(partial(TokenView, self), range(start, len(self.types)))
+
+    def text(self, index):
+        """Return the source text of a token"""
+        offset = self.offsets[index]
+        return self.source_code[offset:offset + self.lengths[index]]
+
+    def value(self, index):
+        """Materialize the value a Lexer Token would carry"""
+        token_type = TOKEN_TYPES[self.types[index]]
+        if token_type == TokenType.NUMBER:
+            return float(self.text(index))
+        if token_type == TokenType.STRING:
+            return self.text(index)[1:-1]
+        if token_type == TokenType.VECTOR:
+            return self.vectors[index]
+        if token_type == TokenType.EOF:
+            return None
+        return self.text(index)
+
+    def position(self, index):
+        """Return the (line, column) of a token"""
+        if self.line_starts is None:
+            line_starts = array('q', [0])
+            source = self.source_code
+            newline = source.find('\n')
+            while newline != -1:
+                line_starts.append(newline + 1)
+                newline = source.find('\n', newline + 1)
+            self.line_starts = line_starts
+            # One int object per line, shared by every position on it
+            self.line_numbers = list(range(len(line_starts) + 1))
+        offset = self.offsets[index]
+        line = bisect_right(self.line_starts, offset)
+        return self.line_numbers[line], offset - self.line_starts[line - 1] + 1
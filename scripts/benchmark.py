@@ -0,0 +1,1039 @@
+# scripts/benchmark.py
+import os
+import re
+import sys
+import time
+import shutil
+import random
+import argparse
+import contextlib
+import io
+import tempfile
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.lexer import Lexer, TokenType
+from scanner.fast_lexer import FastLexer
+from scanner.stream_lexer import StreamingLexer
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser, ASTNode, BinaryOpNode, UnaryOpNode, NumberNode, IdentifierNode
+from parser.incremental import IncrementalParser, TextEdit
+from semantics.semantic_analyzer import SemanticAnalyzer
+from semantics.shape_analyzer import ShapeAnalyzer
+from semantics.code_generator import CodeGenerator
+from semantics.parallel_compiler import ParallelCompiler
+from semantics.fusion import operator_count
+from optimizer.optimizer import Optimizer
+from runtime.executor import RuntimeExecutor, C_PROFILES
+from cache.binary_cache import BinaryCache
+from runtime.pool import WorkerPool
+
+def generate_source(n_elements, n_vectors=4, seed=0):
+    """Generate a WizuAll program dominated by large vector literals"""
+    rng = random.Random(seed)
+    lines = ["# generated benchmark program"]
+    for v in range(n_vectors):
+        values = ', '.join(f"{rng.uniform(0, 1000):.3f}" for _ in range(n_elements // n_vectors))
+        lines.append(f"v{v} = [{values}]")
+    lines.append("total = v0 + v1 * 2 - v2 / 3")
+    lines.append("plot(v0, total)")
+    return '\n'.join(lines) + '\n'
+
+def timed(func, repeat):
+    """Return the best wall time of func over repeat runs, and its last result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_lexer(args):
+    """Compare FastLexer throughput against the reference Lexer"""
+    source_code = generate_source(args.size)
+    print(f"Source: {len(source_code)} characters")
+
+    ref_time, ref_tokens = timed(lambda: Lexer(source_code).tokenize(), args.repeat)
+    fast_time, fast_tokens = timed(lambda: FastLexer(source_code).tokenize(), args.repeat)
+
+    same = ([(t.token_type, t.value, t.line, t.column) for t in ref_tokens] ==
+            [(t.token_type, t.value, t.line, t.column) for t in fast_tokens])
+
+    print(f"Lexer.tokenize:     {ref_time:8.3f}s  {len(ref_tokens) / ref_time:12,.0f} tokens/s")
+    print(f"FastLexer.tokenize: {fast_time:8.3f}s  {len(fast_tokens) / fast_time:12,.0f} tokens/s")
+    print(f"Speedup: {ref_time / fast_time:.1f}x, identical token streams: {same}")
+    return same
+
+def traced_peak(func):
+    """Return the peak traced memory in bytes while running func"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_stream(args):
+    """Compare peak lexing memory of whole-file and streaming lexing"""
+    def consume(tokens):
+        for _ in tokens:
+            pass
+
+    for size in (args.size // 4, args.size // 2, args.size):
+        with tempfile.NamedTemporaryFile('w', suffix='.wzl', delete=False) as f:
+            f.write(generate_source(size))
+            path = f.name
+        try:
+            def whole_file():
+                with open(path, 'r') as source:
+                    consume(FastLexer(source.read()).tokens())
+
+            def streaming():
+                with open(path, 'r') as source:
+                    consume(StreamingLexer(source).tokens())
+
+            print(f"{os.path.getsize(path):>12,} bytes: "
+                  f"read + FastLexer peak {traced_peak(whole_file) / 2**20:8.2f} MiB, "
+                  f"StreamingLexer peak {traced_peak(streaming) / 2**20:8.2f} MiB")
+        finally:
+            os.unlink(path)
+
+def bench_tokens(args):
+    """Compare memory held by a List[Token] and by a TokenBuffer"""
+    source_code = generate_source(args.size)
+    results = {}
+
+    for name, lex in (('List[Token]', lambda: FastLexer(source_code).tokenize()),
+                      ('TokenBuffer', lambda: TokenBuffer.from_source(source_code))):
+        tracemalloc.start()
+        tokens = lex()
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        parse_time, ast = timed(lambda: Parser(tokens).parse(), 1)
+        results[name] = str(ast)
+        print(f"{name:12} {len(tokens):>10,} tokens  {held / 2**20:8.2f} MiB  "
+              f"{held / len(tokens):6.1f} bytes/token  parse {parse_time:.3f}s")
+
+    same = results['List[Token]'] == results['TokenBuffer']
+    print(f"Identical ASTs: {same}")
+    return same
+
+def compile_source(source_code, pack_vectors):
+    """Run the front end and code generation, returning the generated code"""
+    ast = Parser(TokenBuffer.from_source(source_code, pack_vectors)).parse()
+    SemanticAnalyzer(ast).analyze()
+    return CodeGenerator(ast, 'python').generate()
+
+def bench_vectors(args):
+    """Compare compiling vector literals element by element and packed"""
+    source_code = generate_source(args.size)
+    results = {}
+
+    for name, pack_vectors in (('per-element', False), ('packed', True)):
+        elapsed, code = timed(lambda: compile_source(source_code, pack_vectors), args.repeat)
+        peak = traced_peak(lambda: compile_source(source_code, pack_vectors))
+        results[name] = code
+        print(f"{name:12} compile {elapsed:8.3f}s  peak {peak / 2**20:8.2f} MiB")
+
+    same = results['per-element'] == results['packed']
+    print(f"Identical generated code: {same}")
+    return same
+
+def bench_analysis(args):
+    """Time semantic analysis of arithmetic on large vector literals"""
+    source_code = generate_source(args.size)
+    ok = True
+
+    for name, pack_vectors in (('per-element', False), ('packed', True)):
+        ast = Parser(TokenBuffer.from_source(source_code, pack_vectors)).parse()
+
+        def analyze():
+            analyzer = SemanticAnalyzer(ast)
+            analyzer.analyze()
+            return analyzer
+
+        elapsed, analyzer = timed(analyze, args.repeat)
+        symbols = analyzer.symbol_table.symbols
+        v0, v1, v2 = (list(symbols[f"v{v}"].value) for v in range(3))
+        expected = [a + b * 2 - c / 3 for a, b, c in zip(v0, v1, v2)]
+        same = list(symbols['total'].value) == expected
+        ok = ok and same and not analyzer.errors
+        print(f"{name:12} analyze {elapsed:8.3f}s  values match: {same}")
+
+    return ok
+
+def bench_shapes(args):
+    """Compare analysis over values with shape-only analysis"""
+    source_code = generate_source(args.size)
+    # Chain of intermediate vectors, all held by the symbol table
+    source_code += ''.join(f"t{i} = total * {i} + v3\n" for i in range(20))
+    source_code += "bad = v0 + [1, 2]\n"
+    results = {}
+
+    for name, pack_vectors in (('per-element', False), ('packed', True)):
+        ast = Parser(TokenBuffer.from_source(source_code, pack_vectors)).parse()
+        for analyzer_class in (SemanticAnalyzer, ShapeAnalyzer):
+            def analyze():
+                analyzer = analyzer_class(ast)
+                analyzer.analyze()
+                return analyzer
+
+            elapsed, analyzer = timed(analyze, args.repeat)
+            peak = traced_peak(analyze)
+            results[name, analyzer_class] = analyzer.errors
+            print(f"{name:12} {analyzer_class.__name__:16} analyze {elapsed:8.3f}s  "
+                  f"peak {peak / 2**20:8.2f} MiB  errors {analyzer.errors}")
+
+    same = len(set(map(tuple, results.values()))) == 1
+    print(f"Identical errors: {same}")
+    return same
+
+def bench_incremental(args):
+    """Compare a full reparse with an incremental one after a one-line edit"""
+    n_statements = max(args.size // 10, 1)
+    source_code = ''.join(f"x{i} = {i} + [1, 2, 3] * 2\n" for i in range(n_statements))
+    incremental = IncrementalParser(pack_vectors=True)
+    previous = incremental.parse(source_code)
+
+    start = source_code.index(f"x{n_statements // 2} = ")
+    edit = TextEdit(start, start + len(f"x{n_statements // 2}"), "edited")
+    edited = source_code[:edit.start] + edit.text + source_code[edit.end:]
+
+    full_time, full = timed(lambda: IncrementalParser(pack_vectors=True).parse(edited), args.repeat)
+    incremental_time, result = timed(lambda: incremental.reparse(previous, [edit]), args.repeat)
+    print(f"full reparse        {full_time:8.4f}s  ({len(full.tokens)} tokens, {len(full.ast.statements)} statements)")
+    print(f"incremental reparse {incremental_time:8.4f}s  ({incremental.relexed_tokens} tokens, "
+          f"{incremental.reparsed_statements} statements)")
+    print(f"Speedup: {full_time / incremental_time:.1f}x")
+
+    same = str(result.ast) == str(full.ast)
+    print(f"Identical AST: {same}")
+    return same
+
+class RecursiveParser(Parser):
+    """The recursive descent expression grammar Parser.expression replaced,
+    kept as a baseline"""
+
+    def expression(self):
+        node = self.term()
+        while self.current_token.token_type in (TokenType.PLUS, TokenType.MINUS):
+            token = self.current_token
+            self.eat(token.token_type)
+            node = BinaryOpNode(node, token, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.current_token.token_type in (TokenType.MULTIPLY, TokenType.DIVIDE):
+            token = self.current_token
+            self.eat(token.token_type)
+            node = BinaryOpNode(node, token, self.factor())
+        return node
+
+    def factor(self):
+        token = self.current_token
+        if token.token_type == TokenType.NUMBER:
+            self.eat(TokenType.NUMBER)
+            return NumberNode(token)
+        if token.token_type == TokenType.IDENTIFIER:
+            self.eat(TokenType.IDENTIFIER)
+            return IdentifierNode(token)
+        if token.token_type == TokenType.LPAREN:
+            self.eat(TokenType.LPAREN)
+            node = self.expression()
+            self.eat(TokenType.RPAREN)
+            return node
+        if token.token_type == TokenType.MINUS:
+            self.eat(TokenType.MINUS)
+            return UnaryOpNode(token, self.factor())
+        self.error("factor")
+
+def tree_shape(node):
+    """Flatten an expression tree without recursing, for comparisons"""
+    shape = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinaryOpNode):
+            shape.append(node.op.value)
+            stack += (node.right, node.left)
+        elif isinstance(node, UnaryOpNode):
+            shape.append('neg')
+            stack.append(node.expr)
+        elif isinstance(node, NumberNode):
+            shape.append(node.value)
+        else:
+            shape.append(node.name)
+    return shape
+
+def generate_expression(n_terms, seed=0):
+    """Generate a flat expression mixing all operators, as code generators do"""
+    rng = random.Random(seed)
+    parts = [f"t{rng.randrange(100)}"]
+    for _ in range(n_terms - 1):
+        term = f"t{rng.randrange(100)}" if rng.random() < 0.5 else f"{rng.randrange(1, 100)}"
+        if rng.random() < 0.1:
+            term = f"-({term} - 1)"
+        parts.append(f" {rng.choice('+-*/')} {term}")
+    return ''.join(parts)
+
+def bench_expressions(args):
+    """Compare the Pratt expression parser with recursive descent"""
+    terms = args.size // 2
+    depth = 10 * sys.getrecursionlimit()
+    sources = {
+        f'{terms} terms': generate_expression(terms),
+        f'{terms} additions': ' + '.join(['x'] * terms),
+        f'depth {depth}': '(' * depth + 'x' + ')' * depth,
+    }
+    same = True
+    for name, source_code in sources.items():
+        tokens = TokenBuffer.from_source(source_code)
+        results = {}
+        for parser_name, parser_class in (('recursive', RecursiveParser), ('pratt', Parser)):
+            try:
+                elapsed, tree = timed(lambda: parser_class(tokens).expression(), args.repeat)
+            except RecursionError:
+                print(f"{name:18} {parser_name:10} RecursionError")
+                continue
+            results[parser_name] = tree_shape(tree)
+            print(f"{name:18} {parser_name:10} {elapsed:8.3f}s")
+        if len(results) == 2:
+            same = same and results['recursive'] == results['pratt']
+    print(f"Identical trees: {same}")
+    return same
+
+def generate_program(n_statements, seed=0):
+    """Generate a WizuAll program of many small statements"""
+    rng = random.Random(seed)
+    lines = ["x0 = [1, 2, 3]"]
+    for i in range(1, n_statements):
+        a, b = rng.randrange(i), rng.randrange(i)
+        lines.append(rng.choice([
+            f"x{i} = x{a} * {rng.randrange(100)} + -x{b} / 2",
+            f"x{i} = [x{a}, {rng.randrange(100)}, x{b} - 1]",
+            f"x{i} = vec_max(x{a}) - (x{b} + 0.5)",
+            f"if (x{a} > x{b}) {{ x{i} = x{a} }} else {{ x{i} = x{b} * 2 }}",
+        ]))
+    return '\n'.join(lines) + '\n'
+
+def count_nodes(ast):
+    """Count the nodes of an AST without recursing"""
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        count += 1
+        for name in ('statements', 'args', 'elements'):
+            stack.extend(getattr(node, name, ()))
+        for name in ('statement', 'identifier', 'expr', 'left', 'right',
+                     'condition', 'if_body', 'else_body', 'body'):
+            child = getattr(node, name, None)
+            if isinstance(child, ASTNode):
+                stack.append(child)
+    return count
+
+def bench_ast(args):
+    """Measure the memory held by the AST of a large program"""
+    source_code = generate_program(args.size // 4)
+    for name, lex in (('List[Token]', lambda: FastLexer(source_code).tokenize()),
+                      ('TokenBuffer', lambda: TokenBuffer.from_source(source_code))):
+        tokens = lex()
+        elapsed, ast = timed(lambda: Parser(tokens).parse(), args.repeat)
+        del ast
+        tracemalloc.start()
+        ast = Parser(tokens).parse()
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        nodes = count_nodes(ast)
+        print(f"{name:12} {nodes:>10,} nodes  held {held / 2**20:8.2f} MiB  peak {peak / 2**20:8.2f} MiB  "
+              f"{held / nodes:6.1f} bytes/node  parse {elapsed:.3f}s")
+
+def generate_dashboard(n_statements, n_names=50, seed=0):
+    """Generate a long program updating a fixed set of variables"""
+    rng = random.Random(seed)
+    lines = [f"x{i} = [{i}, {i + 1}, {i + 2}]" for i in range(n_names)]
+    for _ in range(n_statements - n_names):
+        i, a, b = (rng.randrange(n_names) for _ in range(3))
+        lines.append(rng.choice([
+            f"x{i} = x{a} * {rng.randrange(1, 100)} + x{b} / 2",
+            f"x{i} = [{rng.randrange(100)}, {rng.randrange(100)}, {rng.randrange(100)}] - x{a}",
+            f"if (x{a} > x{b}) {{ x{i} = x{a} }} else {{ x{i} = x{b} * 2 }}",
+            f"plot(x{a}, x{b})",
+        ]))
+    return '\n'.join(lines) + '\n'
+
+def compile_whole(path, output_path):
+    with open(path) as f:
+        source_code = f.read()
+    ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+    SemanticAnalyzer(ast).analyze()
+    with open(output_path, 'w') as f:
+        f.write(CodeGenerator(ast, 'python').generate())
+
+def compile_streamed(path, output_path):
+    with open(path) as source, open(output_path, 'w') as output:
+        parser = Parser(StreamingLexer(source, pack_vectors=True).tokens())
+        statements = SemanticAnalyzer(None).analyze_stream(parser.iter_statements())
+        CodeGenerator(None, 'python').generate_stream(statements, output)
+
+def bench_pipeline(args):
+    """Compare whole-program and statement-streaming compilation"""
+    same = True
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'program.wzl')
+        outputs = {}
+        for scale in (1, 2, 4):
+            n_statements = scale * args.size // 20
+            with open(path, 'w') as f:
+                f.write(generate_dashboard(n_statements))
+            for name, compile_file in (('whole', compile_whole), ('streamed', compile_streamed)):
+                output_path = os.path.join(temp_dir, f'{name}.py')
+                elapsed, _ = timed(lambda: compile_file(path, output_path), args.repeat)
+                peak = traced_peak(lambda: compile_file(path, output_path))
+                with open(output_path) as f:
+                    outputs[name] = f.read()
+                print(f"{n_statements:>8} statements  {name:8} {elapsed:8.3f}s  peak {peak / 2**20:8.2f} MiB")
+            same = same and outputs['whole'] == outputs['streamed']
+    print(f"Identical generated code: {same}")
+    return same
+
+def bench_parallel(args):
+    """Time parallel compilation with 1, 2, 4 and 8 worker processes"""
+    source_code = generate_dashboard(args.size // 4)
+    print(f"{os.cpu_count()} CPUs, {args.size // 4} statements")
+    outputs = set()
+    serial = None
+    for jobs in (1, 2, 4, 8):
+        compiler = ParallelCompiler('python', jobs)
+        elapsed, (_, _, code) = timed(lambda: compiler.compile(source_code), args.repeat)
+        serial = serial or elapsed
+        outputs.add(code)
+        print(f"{jobs} jobs  {elapsed:8.3f}s  speedup {serial / elapsed:5.2f}x  ({compiler.chunks} chunks)")
+    same = len(outputs) == 1
+    print(f"Identical generated code: {same}")
+    return same
+
+def generate_constants(n_statements, seed=0):
+    """Generate a program of constant arithmetic and vector primitives
+    on small literals, with a loop updating a running total"""
+    rng = random.Random(seed)
+    lines = ["scale = 2 * 3 - 1", "base = [1, 2, 3, 4, 5, 6, 7, 8]", "i = 0", "acc = 0"]
+    for n in range(n_statements):
+        lines.append(rng.choice([
+            f"t{n} = base * scale + {rng.randrange(100)} / 4",
+            f"b{n} = base * {rng.randrange(1, 9)}\nm{n} = vec_average(b{n}, 3)",
+            f"d{n} = base - {rng.randrange(100)}\nvec_max(d{n})",
+            f"u{n} = scale * {rng.randrange(100)} - {rng.randrange(100)}",
+        ]))
+    lines.append("while (i < 100) { acc = acc + scale * 2  i = i + 1 }")
+    lines.append("print(acc)")
+    return '\n'.join(lines) + '\n'
+
+def bench_optimizer(args):
+    """Compare compile time, code size and run time at -O0, -O1 and -O2"""
+    source_code = generate_constants(args.size // 100)
+    outputs = set()
+    for level in (0, 1, 2):
+        def compile_program():
+            ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+            SemanticAnalyzer(ast).analyze()
+            return CodeGenerator(Optimizer(level).optimize(ast), 'python').generate()
+
+        elapsed, code = timed(compile_program, args.repeat)
+        program = compile(code, f'<O{level}>', 'exec')
+        output = io.StringIO()
+        def run():
+            output.seek(0)
+            output.truncate()
+            with contextlib.redirect_stdout(output):
+                exec(program, {})
+
+        run_time, _ = timed(run, args.repeat)
+        outputs.add(output.getvalue())
+        print(f"-O{level}  compile {elapsed:8.3f}s  code {len(code) / 2**10:8.1f} KiB  run {run_time:8.3f}s")
+    same = len(outputs) == 1
+    print(f"Identical output: {same}")
+    return same
+
+def generate_smoothing(n_elements, iterations=200, seed=0):
+    """Generate an iterative smoothing script over vectors too long to fold"""
+    rng = random.Random(seed)
+    values = lambda: ', '.join(f"{rng.uniform(0, 100):.3f}" for _ in range(n_elements))
+    return f"""signal = [{values()}]
+noise = [{values()}]
+weights = [{values()}]
+s = signal
+i = 0
+while (i < {iterations}) {{
+    baseline = signal * 0.5 + noise * 0.1
+    scaled = weights / 100
+    s = s * 0.5 + baseline * 0.25 + (signal - noise) * scaled
+    err = (s - signal) * (s - signal)
+    drift = (s - signal) / (s + signal)
+    i = i + 1
+}}
+vec_max(err)
+vec_min(drift)
+"""
+
+def bench_loops(args):
+    """Compare run time of a smoothing loop with and without loop-invariant
+    code motion and common subexpression elimination"""
+    source_code = generate_smoothing(args.size // 20)
+    outputs = set()
+    times = {}
+    for level in (0, 1, 2):
+        ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+        SemanticAnalyzer(ast).analyze()
+        optimizer = Optimizer(level)
+        code = CodeGenerator(optimizer.optimize(ast), 'python').generate()
+        program = compile(code, f'<O{level}>', 'exec')
+        output = io.StringIO()
+        def run():
+            output.seek(0)
+            output.truncate()
+            with contextlib.redirect_stdout(output):
+                exec(program, {})
+
+        times[level], _ = timed(run, args.repeat)
+        outputs.add(output.getvalue())
+        print(f"-O{level}  run {times[level]:8.3f}s  speedup {times[0] / times[level]:5.2f}x  "
+              f"hoisted {optimizer.stats.get('hoisted', 0)}  reused {optimizer.stats.get('reused', 0)}")
+    same = len(outputs) == 1
+    print(f"Identical output: {same}")
+    return same
+
+def bench_fusion(args):
+    """Compare fused blockwise evaluation of compound vector expressions
+    with NumPy evaluating them operator by operator"""
+    length = args.size * 25
+    rng = np.random.default_rng(0)
+    operands = {name: rng.uniform(1, 100, length) for name in ('x', 'y', 'w')}
+    print(f"{length} elements, {length * 8 / 2**20:.1f} MiB per vector")
+    same = True
+    for expression in ("((x + y) * 2) - w", "(x * y + w * 0.5) / (x - y + 3)", "-(x - w) * (y + 1) / 2 + x"):
+        ast = Parser(TokenBuffer.from_source(f"r = {expression}")).parse()
+        results = []
+        for fuse in (False, True):
+            program = compile(CodeGenerator(ast, 'python', fuse).generate(), '<fusion>', 'exec')
+            def run():
+                namespace = dict(operands)
+                exec(program, namespace)
+                return namespace['r']
+
+            elapsed, result = timed(run, args.repeat)
+            peak = traced_peak(run)
+            results.append(result)
+            name = 'fused' if fuse else 'unfused'
+            # Unfused, each operator allocates a full-size vector unless
+            # NumPy reuses a temporary operand in place
+            allocations = 1 if fuse else operator_count(ast.statements[0].expr)
+            # Memory beyond the result itself is held by temporaries
+            print(f"{expression:32} {name:8} {elapsed:8.3f}s  full-size allocations <= {allocations}  "
+                  f"peak temporaries {(peak - result.nbytes) / 2**20:8.2f} MiB")
+        same = same and np.array_equal(*results)
+    print(f"Identical results: {same}")
+    return same
+
+INPLACE_LOOP = """acc = x * 0
+s = x
+i = 0
+while (i < n) {
+    acc = acc + x * 0.5 - y
+    s = (s + acc) / 2
+    i = i + 1
+}
+vec_max(acc)
+vec_max(s)
+"""
+
+def bench_inplace(args):
+    """Compare a loop updating vectors in place with one allocating new
+    vectors at every assignment, both at -O2"""
+    length = args.size * 5
+    iterations = 100
+    rng = np.random.default_rng(0)
+    inputs = {'x': rng.uniform(1, 100, length), 'y': rng.uniform(1, 100, length), 'n': float(iterations)}
+    print(f"{length} elements, {length * 8 / 2**20:.1f} MiB per vector, {iterations} iterations")
+    outputs = set()
+    for reuse in (False, True):
+        ast = Parser(TokenBuffer.from_source(INPLACE_LOOP)).parse()
+        code = CodeGenerator(Optimizer(2).optimize(ast), 'python', fuse=True, reuse=reuse).generate()
+        program = compile(code, '<inplace>', 'exec')
+        output = io.StringIO()
+        def run():
+            output.seek(0)
+            output.truncate()
+            with contextlib.redirect_stdout(output):
+                exec(program, dict(inputs))
+
+        elapsed, _ = timed(run, args.repeat)
+        peak = traced_peak(run)
+        outputs.add(output.getvalue())
+        name = 'in place' if reuse else 'new'
+        # Beyond the inputs, acc, s and the hoisted x * 0.5 are live
+        print(f"{name:9} {elapsed:8.3f}s  {elapsed / iterations * 1000:7.2f} ms/iteration  "
+              f"peak {peak / (length * 8):5.2f} vectors")
+    same = len(outputs) == 1
+    print(f"Identical output: {same}")
+    return same
+
+def generate_chain(n_elements, n_vectors=100, seed=0):
+    """Generate a program deriving each vector from the two before it"""
+    rng = random.Random(seed)
+    values = ', '.join(f"{rng.uniform(0, 100):.3f}" for _ in range(n_elements))
+    lines = [f"v0 = [{values}]", "v1 = v0 * 2"]
+    lines.extend(f"v{i} = v{i - 1} * 0.5 + v{i - 2} * 0.25" for i in range(2, n_vectors))
+    lines.append(f"vec_max(v{n_vectors - 1})")
+    return '\n'.join(lines) + '\n'
+
+# Compiles a generated program, then runs it and prints the peak RSS in
+# KiB it reached while running. On Linux with glibc the peak is reset
+# after compiling, which for large literals takes more memory than
+# running.
+RSS_PROBE = """import resource, sys
+with open(sys.argv[1]) as f:
+    program = compile(f.read(), sys.argv[1], 'exec')
+try:
+    # Hand the memory compiling freed back to the system, then reset the peak
+    import ctypes, gc
+    gc.collect()
+    ctypes.CDLL(None).malloc_trim(0)
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+except (OSError, AttributeError):
+    pass
+exec(program, {'__name__': '__main__'})
+try:
+    with open('/proc/self/status') as f:
+        peak = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(peak, file=sys.stderr)
+"""
+
+def peak_rss(code):
+    """Peak RSS in bytes of a fresh interpreter running code"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'program.py')
+        with open(path, 'w') as f:
+            f.write(code)
+        result = subprocess.run([sys.executable, '-c', RSS_PROBE, path], capture_output=True, text=True, check=True,
+                                env=RuntimeExecutor('').environment())
+    return int(result.stderr.split()[-1]) * 1024, result.stdout
+
+def bench_liveness(args):
+    """Compare the peak RSS of a chain of vector assignments at -O2 with
+    and without releasing each vector after its last use"""
+    n_vectors = 100
+    source_code = generate_chain(args.size, n_vectors)
+    ast = Optimizer(2).optimize(Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse())
+    start = Parser(TokenBuffer.from_source(generate_chain(args.size, 2), pack_vectors=True)).parse()
+    baseline, _ = peak_rss(CodeGenerator(start, 'python').generate())
+    print(f"{n_vectors} vectors of {args.size} elements, {args.size * 8 / 2**20:.1f} MiB each; "
+          f"first two vectors alone {baseline / 2**20:.1f} MiB")
+    outputs = set()
+    for release in (False, True):
+        code = CodeGenerator(ast, 'python', fuse=True, reuse=True, release=release).generate()
+        peak, output = peak_rss(code)
+        outputs.add(output)
+        name = 'released' if release else 'kept'
+        print(f"{name:9} peak RSS {peak / 2**20:8.1f} MiB  above baseline {(peak - baseline) / 2**20:8.1f} MiB")
+    same = len(outputs) == 1
+    print(f"Identical output: {same}")
+    return same
+
+def generate_independent(n_elements, n_inputs=4, seed=0):
+    """Generate a program running the same analyses on independent inputs"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_inputs):
+        values = ', '.join(f"{rng.gauss(50 * (i % 3), 10):.3f}" for _ in range(n_elements))
+        lines.append(f"x{i} = [{values}]")
+    for i in range(n_inputs):
+        lines.append(f"clustering(x{i}, 8)")
+        lines.append(f"vec_average(x{i}, 500)")
+        lines.append(f"s{i} = (x{i} - {i}) * (x{i} + {i}) / 2")
+        lines.append(f"vec_max(s{i})")
+    return '\n'.join(lines) + '\n'
+
+# Compiles a generated program as the main module, then prints the wall
+# time of running it; the primitives' imports are not timed
+TIME_PROBE = """import sys as _sys, time as _time
+import matplotlib as _matplotlib
+_matplotlib.use('Agg')
+import numpy, matplotlib.pyplot, sklearn.cluster, numpy.lib.stride_tricks
+with open(_sys.argv[1]) as _f:
+    _program = compile(_f.read(), _sys.argv[1], 'exec')
+_start = _time.perf_counter()
+exec(_program, globals())
+print(_time.perf_counter() - _start, file=_sys.stderr)
+"""
+
+def bench_schedule(args):
+    """Compare sequential code with statements scheduled on threads and
+    on processes"""
+    n_inputs = 4
+    source_code = generate_independent(args.size // 4, n_inputs)
+    ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+    print(f"{n_inputs} inputs of {args.size // 4} elements, {os.cpu_count()} CPUs")
+    outputs = set()
+    times = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'program.py')
+        for schedule in (None, 'thread', 'process'):
+            with open(path, 'w') as f:
+                f.write(CodeGenerator(ast, 'python', schedule=schedule, workers=n_inputs).generate())
+            best = None
+            for _ in range(args.repeat):
+                result = subprocess.run([sys.executable, '-c', TIME_PROBE, path], capture_output=True,
+                                        text=True, check=True, cwd=tmpdir, env=RuntimeExecutor('').environment())
+                elapsed = float(result.stderr.split()[-1])
+                best = elapsed if best is None else min(best, elapsed)
+            times[schedule] = best
+            # KMeans is not seeded, so only compare the other results
+            outputs.add('\n'.join(line for line in result.stdout.split('\n')
+                                  if not line.startswith(('Cluster', ' ['))))
+            name = schedule or 'sequential'
+            print(f"{name:10} run {best:8.3f}s  speedup {times[None] / best:5.2f}x")
+    same = len(outputs) == 1
+    print(f"Identical output: {same}")
+    return same
+
+def generate_calls(n_calls, n_elements=100, seed=0):
+    """Generate a program calling the vector primitives n_calls times"""
+    rng = random.Random(seed)
+    primitives = ['vec_average(x)', 'vec_max(y, 3)', 'vec_min(x, 5)', 'vec_reverse(y)',
+                  'vec_product(x, y)', 'vec_compare(x, y)']
+    lines = [f"x = [{', '.join(f'{rng.uniform(0, 100):.3f}' for _ in range(n_elements))}]",
+             "y = x * 2 - 50"]
+    lines.extend(f"r{i} = {primitives[i % len(primitives)]}" for i in range(n_calls))
+    return '\n'.join(lines) + '\n'
+
+class TemplateCodeGenerator(CodeGenerator):
+    """Code generator inlining each primitive's template at its call, as
+    generated code did before wizuall_runtime"""
+
+    def __init__(self, ast):
+        super().__init__(ast, 'python')
+        self.headers['python'] = ["import numpy as np", "import matplotlib.pyplot as plt", ""]
+
+    def is_runtime_call(self, node):
+        return False
+
+# Loads numpy and pyplot, then prints the wall time of compiling and
+# running a generated program, as a fresh interpreter starting it does
+STARTUP_PROBE = """import sys as _sys, time as _time
+import matplotlib as _matplotlib
+_matplotlib.use('Agg')
+import numpy, matplotlib.pyplot, numpy.lib.stride_tricks
+_start = _time.perf_counter()
+with open(_sys.argv[1]) as _f:
+    exec(compile(_f.read(), _sys.argv[1], 'exec'), {'__name__': '__main__'})
+print(_time.perf_counter() - _start, file=_sys.stderr)
+"""
+
+def bench_runtime(args):
+    """Compare the generated file size and the time a fresh interpreter
+    takes to compile and run the program with inlined templates and with
+    wizuall_runtime"""
+    n_calls = max(1, args.size // 1000)
+    ast = Parser(TokenBuffer.from_source(generate_calls(n_calls), pack_vectors=True)).parse()
+    print(f"{n_calls} primitive calls")
+    outputs = set()
+    for name, generator in (('inline', TemplateCodeGenerator(ast)), ('runtime', CodeGenerator(ast, 'python'))):
+        code = generator.generate()
+        output, elapsed = startup_time(code, args.repeat)
+        outputs.add(output)
+        print(f"{name:8} {len(code.encode()) / 1024:8.1f} KiB  compile and run {elapsed * 1000:8.1f} ms")
+    same = len(outputs) == 1
+    print(f"Identical output: {same}")
+    return same
+
+def startup_time(code, repeat):
+    """Output and best time of fresh interpreters compiling and running
+    code; wizuall_runtime's bytecode is cached by a first, untimed run"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'program.py')
+        with open(path, 'w') as f:
+            f.write(code)
+        times = []
+        for _ in range(repeat + 1):
+            result = subprocess.run([sys.executable, '-c', STARTUP_PROBE, path], capture_output=True, text=True,
+                                    check=True, cwd=tmpdir, env=RuntimeExecutor('').environment())
+            times.append(float(result.stderr.split()[-1]))
+    return result.stdout, min(times[1:])
+
+def bench_inprocess(args):
+    """Compare the latency of executing a small program in a new
+    interpreter with executing it in this one, where the first run pays
+    for the imports the later ones reuse"""
+    n_calls = max(1, args.size // 10000)
+    code = CodeGenerator(Parser(TokenBuffer.from_source(generate_calls(n_calls))).parse(), 'python').generate()
+    print(f"{n_calls} primitive calls")
+    outputs = set()
+    subprocess_time, output = timed(RuntimeExecutor(code).execute, args.repeat)
+    outputs.add(output)
+    print(f"{'subprocess':12} {subprocess_time * 1000:8.1f} ms")
+    executor = RuntimeExecutor(code, in_process=True)
+    first, output = timed(executor.execute, 1)
+    outputs.add(output)
+    warm, output = timed(executor.execute, args.repeat)
+    outputs.add(output)
+    print(f"{'first':12} {first * 1000:8.1f} ms")
+    print(f"{'in process':12} {warm * 1000:8.1f} ms  speedup {subprocess_time / warm:6.1f}x")
+    same = len(outputs) == 1
+    print(f"Identical output: {same}")
+    return same
+
+def bench_streaming(args):
+    """Compare the time to the first line and the compiler's peak memory
+    when executing a program printing many lines, with execute() and
+    stream()"""
+    n_lines = args.size
+    code = (f"import time\nprint('start')\ntime.sleep(0.5)\n"
+            f"for i in range({n_lines}):\n    print(i * 0.5)")
+    print(f"Printing {n_lines} lines")
+    executor = RuntimeExecutor(code)
+    results = {}
+    for name in ('execute', 'stream'):
+        first = []
+        lines = []
+        def run():
+            start = time.perf_counter()
+            if name == 'execute':
+                output = executor.execute()
+                first.append(time.perf_counter() - start)
+                lines.append(output.count('\n'))
+            else:
+                count = 0
+                for count, line in enumerate(executor.stream(), 1):
+                    if count == 1:
+                        first.append(time.perf_counter() - start)
+                lines.append(count)
+        peak = traced_peak(run)
+        results[name] = lines[0]
+        print(f"{name:8} first line {first[0] * 1000:8.1f} ms  peak {peak / 2**20:8.1f} MiB")
+    metrics = executor.metrics
+    peak_rss = 'unknown' if metrics.peak_rss is None else f"{metrics.peak_rss / 2**20:.1f} MiB"
+    print(f"Program: wall {metrics.wall_time:.3f}s  CPU {metrics.cpu_time:.3f}s  peak RSS {peak_rss}")
+    same = results['execute'] == results['stream']
+    print(f"Same lines: {same}")
+    return same
+
+def bench_pool(args):
+    """Compare the throughput of small programs executed each in a new
+    interpreter with a pool of warm workers, one per CPU"""
+    n_programs = max(1, args.size // 5000)
+    codes = [CodeGenerator(Parser(TokenBuffer.from_source(generate_calls(20, seed=seed))).parse(),
+                           'python').generate() for seed in range(n_programs)]
+    # New interpreters are slow enough that a sample gives their rate
+    sample = codes[:max(1, min(n_programs, 10))]
+    elapsed, expected = timed(lambda: [RuntimeExecutor(code).execute() for code in sample], 1)
+    subprocess_rate = len(sample) / elapsed
+    print(f"{n_programs} programs, {os.cpu_count()} CPUs")
+    print(f"{'subprocess':10} {subprocess_rate:8.1f} programs/s")
+    start = time.perf_counter()
+    with WorkerPool() as pool:
+        pool.wait_ready()
+        print(f"{'pool start':10} {time.perf_counter() - start:8.2f}s")
+        elapsed, outputs = timed(lambda: pool.map(codes), args.repeat)
+        print(f"{'pool':10} {n_programs / elapsed:8.1f} programs/s  speedup {n_programs / elapsed / subprocess_rate:6.1f}x  "
+              f"recycled {pool.stats['recycled']}")
+    same = outputs[:len(sample)] == expected
+    print(f"Identical output: {same}")
+    return same
+
+def bench_c(args):
+    """Compare the smoothing loop run by the NumPy code generated for
+    Python with the C code generated for it, built with each profile
+
+    Python times exclude starting the interpreter and importing NumPy;
+    C times are of the whole process.
+    """
+    if shutil.which('gcc') is None:
+        print("gcc not found")
+        return False
+    n_elements = args.size // 2
+    source_code = generate_smoothing(n_elements, iterations=50)
+    ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+    print(f"{n_elements} elements, 50 iterations, {os.cpu_count()} CPUs")
+    outputs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'program.py')
+        with open(path, 'w') as f:
+            f.write(CodeGenerator(ast, 'python').generate())
+        best = None
+        for _ in range(args.repeat):
+            result = subprocess.run([sys.executable, '-c', TIME_PROBE, path], capture_output=True,
+                                    text=True, check=True, cwd=tmpdir, env=RuntimeExecutor('').environment())
+            elapsed = float(result.stderr.split()[-1])
+            best = elapsed if best is None else min(best, elapsed)
+        numpy_time = best
+        outputs.append(result.stdout)
+        print(f"{'NumPy':28} {'':16} run {numpy_time:8.3f}s")
+        source = os.path.join(tmpdir, 'program.c')
+        with open(source, 'w') as f:
+            f.write(CodeGenerator(ast, 'c').generate())
+        binary = os.path.join(tmpdir, 'program')
+        for name, flags in C_PROFILES.items():
+            name = ' '.join(flags)
+            start = time.perf_counter()
+            subprocess.run(['gcc', *flags, source, '-o', binary, '-lm'], check=True)
+            compile_time = time.perf_counter() - start
+            elapsed, result = timed(lambda: subprocess.run([binary], capture_output=True, text=True,
+                                                           check=True, cwd=tmpdir), args.repeat)
+            outputs.append(result.stdout)
+            print(f"{name:28} compile {compile_time:6.2f}s  run {elapsed:8.3f}s  "
+                  f"speedup {numpy_time / elapsed:6.2f}x")
+    same = all(same_numbers(outputs[0], output) for output in outputs[1:])
+    print(f"Same output: {same}")
+    return same
+
+def bench_binaries(args):
+    """Compare executing generated C when gcc builds it with executing
+    it again from the binary cache, for each profile"""
+    if shutil.which('gcc') is None:
+        print("gcc not found")
+        return False
+    source_code = generate_smoothing(max(1, args.size // 100), iterations=50)
+    code = CodeGenerator(Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse(), 'c').generate()
+    print(f"{len(code.encode()) / 1024:.1f} KiB of C")
+    outputs = set()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in C_PROFILES:
+            cache = BinaryCache(os.path.join(tmpdir, profile))
+            executor = RuntimeExecutor(code, 'c', profile=profile, binary_cache=cache)
+            cold, output = timed(executor.execute, 1)
+            outputs.add(output)
+            warm, output = timed(executor.execute, args.repeat)
+            outputs.add(output)
+            print(f"{profile:8} build and run {cold * 1000:8.1f} ms  cached {warm * 1000:8.1f} ms  "
+                  f"speedup {cold / warm:6.1f}x  hits {cache.stats['hits']}")
+    # With -march=native, gcc may fuse multiplications and additions,
+    # changing the last digits
+    same = all(same_numbers(min(outputs), output) for output in outputs)
+    print(f"Same output: {same}")
+    return same
+
+def bench_native(args):
+    """Compare loop-heavy programs run by the NumPy code generated for
+    Python, by the same code with its loops as native kernels, and by the
+    C code generated for them, each built with -O2
+
+    Python times are of executing the program in this interpreter, the
+    kernels' library loaded from the binary cache; C times are of the
+    whole process.
+    """
+    if shutil.which('gcc') is None:
+        print("gcc not found")
+        return False
+    flags = C_PROFILES['O2']
+    programs = [
+        (f"{args.size // 2} elements, 50 iterations", generate_smoothing(args.size // 2, iterations=50)),
+        ("16 elements, 20000 iterations", generate_smoothing(16, iterations=20000))
+    ]
+    same = True
+    previous = os.environ.get('WIZUALL_CACHE_DIR')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Kernels are built into a cache of their own
+        os.environ['WIZUALL_CACHE_DIR'] = tmpdir
+        try:
+            for description, source_code in programs:
+                print(description)
+                ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+                outputs = []
+                times = {}
+                for name, native in (('NumPy', None), ('native', flags)):
+                    program = compile(CodeGenerator(ast, 'python', native=native).generate(), f'<{name}>', 'exec')
+                    output = io.StringIO()
+                    def run():
+                        output.seek(0)
+                        output.truncate()
+                        with contextlib.redirect_stdout(output):
+                            exec(program, {})
+                    # The first run builds the kernels
+                    run()
+                    times[name], _ = timed(run, args.repeat)
+                    outputs.append(output.getvalue())
+                source = os.path.join(tmpdir, 'program.c')
+                with open(source, 'w') as f:
+                    f.write(CodeGenerator(ast, 'c').generate())
+                binary = os.path.join(tmpdir, 'program')
+                subprocess.run(['gcc', *flags, source, '-o', binary, '-lm'], check=True)
+                times['C'], result = timed(lambda: subprocess.run([binary], capture_output=True, text=True,
+                                                                  check=True, cwd=tmpdir), args.repeat)
+                outputs.append(result.stdout)
+                for name, elapsed in times.items():
+                    print(f"  {name:8} run {elapsed:8.3f}s  speedup {times['NumPy'] / elapsed:6.2f}x")
+                same = same and all(same_numbers(outputs[0], output) for output in outputs[1:])
+        finally:
+            if previous is None:
+                del os.environ['WIZUALL_CACHE_DIR']
+            else:
+                os.environ['WIZUALL_CACHE_DIR'] = previous
+    print(f"Same output: {same}")
+    return same
+
+def same_numbers(expected, actual):
+    """Whether two outputs print the same text around numbers that agree
+    to within rounding; C prints comparisons as numbers, not booleans"""
+    pattern = r'True|False|[-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?|nan|inf'
+    def split(output):
+        numbers = [1.0 if token == 'True' else 0.0 if token == 'False' else float(token)
+                   for token in re.findall(pattern, output)]
+        return numbers, re.sub(pattern, '', output).split()
+    expected_numbers, expected_text = split(expected)
+    actual_numbers, actual_text = split(actual)
+    return (expected_text == actual_text and len(expected_numbers) == len(actual_numbers)
+            and np.allclose(expected_numbers, actual_numbers, rtol=1e-9, equal_nan=True))
+
+BENCHMARKS = {
+    'binaries': bench_binaries,
+    'c': bench_c,
+    'native': bench_native,
+    'inprocess': bench_inprocess,
+    'pool': bench_pool,
+    'streaming': bench_streaming,
+    'runtime': bench_runtime,
+    'optimizer': bench_optimizer,
+    'schedule': bench_schedule,
+    'liveness': bench_liveness,
+    'inplace': bench_inplace,
+    'fusion': bench_fusion,
+    'loops': bench_loops,
+    'analysis': bench_analysis,
+    'parallel': bench_parallel,
+    'pipeline': bench_pipeline,
+    'shapes': bench_shapes,
+    'ast': bench_ast,
+    'expressions': bench_expressions,
+    'incremental': bench_incremental,
+    'lexer': bench_lexer,
+    'stream': bench_stream,
+    'tokens': bench_tokens,
+    'vectors': bench_vectors
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='WizuAll Benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS), help='Benchmark to run')
+    parser.add_argument('--size', type=int, default=200000, help='Number of vector elements in the generated program')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed repetitions')
+
+    args = parser.parse_args()
+
+    success = BENCHMARKS[args.benchmark](args)
+    return 0 if success is not False else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,7 +35,7 @@ def build_project():
     # Check if package directories exist
     required_dirs = [
         'preprocessor', 'scanner', 'parser', 'semantics', 
-        'visual_primitives', 'runtime', 'tests', 'scripts'
+        'optimizer', 'visual_primitives', 'runtime', 'wizuall_runtime', 'cache', 'tests', 'scripts'
     ]
     
     for directory in required_dirs:
@@ -2,11 +2,18 @@
 
 from .symbol_table import Symbol, SymbolTable
 from .semantic_analyzer import SemanticAnalyzer
+from .shape_analyzer import Shape, ShapeAnalyzer
 from .code_generator import CodeGenerator
+from .fusion import ElementwiseFusion
+from .parallel_compiler import ParallelCompiler
 
 __all__ = [
     'Symbol', 
     'SymbolTable', 
     'SemanticAnalyzer', 
-    'CodeGenerator'
+    'Shape',
+    'ShapeAnalyzer',
+    'CodeGenerator',
+    'ElementwiseFusion',
+    'ParallelCompiler'
 ]
\ No newline at end of file
@@ -0,0 +1,403 @@
+# semantics/c_backend.py
+from parser.parser import *
+from scanner.lexer import TokenType
+from optimizer.dataflow import PRIMITIVE_RESULTS, walk, reads, identifiers
+
+# Types of values in generated C: numbers are doubles, vectors wz_vec
+NUMBER = 'number'
+VECTOR = 'vector'
+
+OPERATORS = {
+    TokenType.PLUS: '+',
+    TokenType.MINUS: '-',
+    TokenType.MULTIPLY: '*',
+    TokenType.DIVIDE: '/',
+    TokenType.GREATER: '>',
+    TokenType.LESS: '<'
+}
+
+# Primitives implemented by the C runtime; the others have no C version
+C_PRIMITIVES = {'plot', 'vec_average', 'vec_max', 'vec_min', 'vec_reverse', 'vec_product'}
+
+# Names a variable cannot have in C; such variables get a trailing
+# underscore
+RESERVED = {
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
+    'extern', 'float', 'for', 'goto', 'if', 'inline', 'int', 'long', 'register', 'restrict', 'return',
+    'short', 'signed', 'sizeof', 'static', 'struct', 'switch', 'typedef', 'union', 'unsigned', 'void',
+    'volatile', 'while', 'main', 'size_t', 'NULL', 'NAN', 'INFINITY', 'EOF', 'stdin', 'stdout', 'stderr'
+}
+
+def c_name(name):
+    """The C identifier of a WizuAll variable"""
+    base = name.rstrip('_')
+    if base in RESERVED or base.startswith(('wz_', 'WZ_')):
+        return name + '_'
+    return name
+
+def c_string(value):
+    """C string literal of a WizuAll string"""
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'"{escaped}"'
+
+class CBackend:
+    """Statements of a WizuAll program as C, for the C target of CodeGenerator
+
+    Every variable is either a number, a double, or a vector, a wz_vec
+    owning its elements on the heap, and keeps that type throughout the
+    program: a variable some statement assigns a vector to is a vector,
+    holding numbers as vectors of one element that print as numbers, and
+    so are the variables primitives assign their results to.
+    Variables are declared in main before the first top-level statement
+    using them. When compiling a stream, types are inferred one top-level
+    statement at a time, and a variable that held a number cannot be
+    assigned a vector later.
+
+    Arithmetic on vectors becomes one loop per assignment over the whole
+    expression, with no intermediate vectors, writing into the target's
+    own buffer when it is long enough. The loops vectorize, and when
+    compiled with -fopenmp those over at least WZ_PARALLEL_THRESHOLD
+    elements run on all cores. Vectors of one element broadcast like
+    NumPy's, and printed vectors look like NumPy's.
+    """
+
+    def __init__(self, primitives):
+        # Names of all the primitives; those without a C version are errors
+        self.primitives = set(primitives)
+        self.types = {}
+        self.declared = set()
+        self.temporaries = 0
+        # Number variable the current statement declares as it assigns it
+        self.declaring = None
+
+    # Types
+
+    def infer(self, statements):
+        """Types of the variables statements assign, given the known types
+        of the others"""
+        types = {}
+        changed = True
+        while changed:
+            changed = False
+            for node in walk(statements):
+                if isinstance(node, AssignmentNode):
+                    assigned = [(node.identifier.name, self.type_of(node.expr, types))]
+                elif isinstance(node, FunctionCallNode):
+                    # Primitives of either type assign their results, so
+                    # these are always vectors
+                    assigned = [(name, VECTOR) for name in PRIMITIVE_RESULTS.get(node.identifier, ())]
+                else:
+                    continue
+                for name, value_type in assigned:
+                    if name not in types or value_type == VECTOR and types[name] != VECTOR:
+                        types[name] = value_type
+                        changed = True
+        return types
+
+    def type_of(self, node, types=None):
+        if isinstance(node, (VectorNode, PackedVectorNode)):
+            return VECTOR
+        if isinstance(node, IdentifierNode):
+            if types and node.name in types:
+                return types[node.name]
+            return self.types.get(node.name, NUMBER)
+        if isinstance(node, BinaryOpNode):
+            return VECTOR if VECTOR in (self.type_of(node.left, types), self.type_of(node.right, types)) else NUMBER
+        if isinstance(node, UnaryOpNode):
+            return self.type_of(node.expr, types)
+        if isinstance(node, FunctionCallNode):
+            return self.call_type(node)
+        return NUMBER
+
+    def call_type(self, node):
+        name = node.identifier
+        if name in ('vec_average', 'vec_max', 'vec_min'):
+            return VECTOR if len(node.args) > 1 else NUMBER
+        if name == 'vec_reverse':
+            return VECTOR
+        if name == 'vec_product':
+            return NUMBER if self.product_type(node) == 'dot' else VECTOR
+        return NUMBER
+
+    def product_type(self, node):
+        if len(node.args) < 3:
+            return 'dot'
+        kind = node.args[2]
+        if not isinstance(kind, StringNode) or kind.value not in ('dot', 'cross', 'element'):
+            raise ValueError("vec_product needs a literal 'dot', 'cross' or 'element' product type in C")
+        return kind.value
+
+    # Statements
+
+    def declarations(self, statement):
+        """Lines declaring the variables a top-level statement uses first"""
+        for name, value_type in self.infer([statement]).items():
+            if value_type == VECTOR and self.types.get(name) == NUMBER and name in self.declared:
+                raise ValueError(f"Variable {name} holds a number before a vector, which the C backend "
+                                 f"cannot compile a statement at a time")
+            if value_type == VECTOR or name not in self.types:
+                self.types[name] = value_type
+        names = identifiers(statement)
+        for node in walk(statement):
+            if isinstance(node, FunctionCallNode):
+                names.update(PRIMITIVE_RESULTS.get(node.identifier, ()))
+        self.declaring = None
+        if isinstance(statement, StatementNode):
+            statement = statement.statement
+        if (isinstance(statement, AssignmentNode) and statement.identifier.name not in self.declared
+                and self.types.get(statement.identifier.name, NUMBER) == NUMBER
+                and statement.identifier.name not in reads(statement.expr)):
+            self.declaring = statement.identifier.name
+        lines = []
+        for name in sorted(names - self.declared):
+            self.declared.add(name)
+            if name == self.declaring:
+                continue
+            if self.types.get(name, NUMBER) == VECTOR:
+                lines.append(f"wz_vec {c_name(name)} = WZ_EMPTY;")
+            else:
+                lines.append(f"double {c_name(name)} = 0.0;")
+        return lines
+
+    def release(self):
+        """Lines freeing the vectors of all variables at the end of main"""
+        return [f"wz_free(&{c_name(name)});" for name in sorted(self.declared)
+                if self.types.get(name) == VECTOR]
+
+    def assignment(self, node):
+        """Lines assigning an expression to a variable"""
+        name = node.identifier.name
+        target = c_name(name)
+        lines, cleanup = [], []
+        declare = 'double ' if name == self.declaring else ''
+        self.declaring = None
+        expr = node.expr
+        if self.types.get(name, NUMBER) == NUMBER:
+            value = self.number(expr, lines, cleanup)
+            lines.append(f"{declare}{target} = {value};")
+        elif isinstance(expr, FunctionCallNode) and expr.identifier in self.primitives:
+            self.primitive_statement(expr, lines, cleanup)
+            results = PRIMITIVE_RESULTS.get(expr.identifier)
+            if results:
+                lines.append(self.assign(name, c_name(results[0]), self.type_of(expr), owned=False))
+            else:
+                lines.append(f"wz_assign(&{target}, wz_number(0.0));")
+        elif self.type_of(expr) == NUMBER:
+            value = self.number(expr, lines, cleanup)
+            lines.append(self.assign(name, value, NUMBER))
+        elif isinstance(expr, IdentifierNode):
+            lines.append(f"wz_assign(&{target}, wz_copy({c_name(expr.name)}));")
+        elif isinstance(expr, (VectorNode, PackedVectorNode)):
+            lines.extend(self.literal(expr, target, lines, cleanup))
+        else:
+            lines.extend(self.elementwise(expr, target, lines, cleanup))
+        return lines + cleanup
+
+    def call_statement(self, node):
+        """Lines of a call whose value is not used"""
+        lines, cleanup = [], []
+        if node.identifier == 'print':
+            self.print_call(node, lines, cleanup)
+        elif node.identifier in self.primitives:
+            self.primitive_statement(node, lines, cleanup)
+        else:
+            lines.append(f"{self.call(node, lines, cleanup)[0]};")
+        return lines + cleanup
+
+    def condition(self, node):
+        """Lines computing a condition, and the condition; the lines must
+        run each time it is tested"""
+        lines, cleanup = [], []
+        if self.type_of(node) == VECTOR:
+            value = self.temporary('wz_t')
+            if isinstance(node, IdentifierNode):
+                lines.append(f"wz_vec {value} = wz_copy({c_name(node.name)});")
+            else:
+                lines.append(f"wz_vec {value} = WZ_EMPTY;")
+                lines.extend(self.elementwise(node, value, lines, cleanup))
+            condition = f"wz_condition(&{value})"
+        else:
+            condition = self.number(node, lines, cleanup)
+            if condition.startswith('(') and condition.endswith(')'):
+                condition = condition[1:-1]
+        if not lines and not cleanup:
+            return [], condition
+        test = self.temporary('wz_c')
+        return lines + [f"int {test} = {condition};"] + cleanup, test
+
+    def assign(self, name, value, value_type, owned=True):
+        """Statement assigning a value of a type to a variable"""
+        target = c_name(name)
+        if self.types.get(name, NUMBER) == NUMBER:
+            if value_type == VECTOR:
+                return f"{target} = wz_value({value});"
+            return f"{target} = {value};"
+        if value_type == NUMBER:
+            return f"wz_assign(&{target}, wz_number({value}));"
+        return f"wz_assign(&{target}, {value if owned else f'wz_copy({value})'});"
+
+    # Expressions
+
+    def temporary(self, prefix):
+        self.temporaries += 1
+        return f"{prefix}{self.temporaries - 1}"
+
+    def number(self, node, lines, cleanup):
+        """C expression of a number-typed expression; calls it makes are
+        hoisted into lines"""
+        return self.render(node, {}, lines, cleanup)
+
+    def vector(self, node, lines, cleanup):
+        """Name of a wz_vec holding a vector expression's value, computed
+        into a temporary if it is not a variable"""
+        if isinstance(node, IdentifierNode):
+            return c_name(node.name)
+        if isinstance(node, FunctionCallNode):
+            return self.call(node, lines, cleanup)[0]
+        value = self.temporary('wz_t')
+        lines.append(f"wz_vec {value} = WZ_EMPTY;")
+        if isinstance(node, (VectorNode, PackedVectorNode)):
+            lines.extend(self.literal(node, value, lines, cleanup))
+        else:
+            lines.extend(self.elementwise(node, value, lines, cleanup))
+        cleanup.insert(0, f"wz_free(&{value});")
+        return value
+
+    def literal(self, node, target, lines, cleanup):
+        """Lines assigning a vector literal to target"""
+        if isinstance(node, PackedVectorNode):
+            elements = [repr(value) for value in node.values]
+            constant = True
+        else:
+            if any(self.type_of(element) == VECTOR for element in node.elements):
+                raise ValueError("The C backend supports one-dimensional vectors only")
+            elements = [self.number(element, lines, cleanup) for element in node.elements]
+            constant = all(isinstance(element, NumberNode) for element in node.elements)
+        if not elements:
+            return [f"wz_assign(&{target}, wz_from(NULL, 0));"]
+        if constant:
+            name = self.temporary('wz_literal')
+            return [f"static const double {name}[{len(elements)}] = {{{', '.join(elements)}}};",
+                    f"wz_assign(&{target}, wz_from({name}, {len(elements)}));"]
+        return [f"wz_assign(&{target}, wz_from((const double[]){{{', '.join(elements)}}}, {len(elements)}));"]
+
+    def elementwise(self, node, target, lines, cleanup):
+        """Lines of the loop computing a vector expression into target"""
+        operands = {}
+        body = self.render(node, operands, lines, cleanup)
+        names = list(operands)
+        size = f"{names[0]}.length"
+        for name in names[1:]:
+            size = f"wz_size({size}, {name}.length)"
+        dims = ' | '.join(f"{name}.dims" for name in names)
+        block = ["{", f"    size_t wz_n = {size};"]
+        # The target may be an operand whose buffer wz_output replaces
+        for index, (name, pointer) in enumerate(operands.items()):
+            block.append(f"    const double *wz_d{index} = {name}.data;")
+            block.append(f"    const double *{pointer} = wz_expand({name}, wz_n);")
+        block.extend([
+            f"    double *wz_out = wz_output(&{target}, wz_n, {dims});",
+            "    WZ_LOOP",
+            "    for (size_t wz_i = 0; wz_i < wz_n; wz_i++)",
+            f"        wz_out[wz_i] = {body};"
+        ])
+        for index, pointer in enumerate(operands.values()):
+            block.append(f"    wz_release({pointer}, wz_d{index});")
+        block.append("}")
+        return block
+
+    def render(self, node, operands, lines, cleanup):
+        """C expression of node; the vectors it reads are added to
+        operands, by name, and read elementwise"""
+        if isinstance(node, NumberNode):
+            return repr(float(node.value))
+        if isinstance(node, StringNode):
+            return c_string(node.value)
+        if isinstance(node, BinaryOpNode):
+            left = self.render(node.left, operands, lines, cleanup)
+            right = self.render(node.right, operands, lines, cleanup)
+            return f"({left} {OPERATORS.get(node.op.token_type, node.op.value)} {right})"
+        if isinstance(node, UnaryOpNode):
+            return f"(-{self.render(node.expr, operands, lines, cleanup)})"
+        if self.type_of(node) == NUMBER:
+            if isinstance(node, IdentifierNode):
+                return c_name(node.name)
+            if isinstance(node, FunctionCallNode):
+                return self.call(node, lines, cleanup)[0]
+            return '0.0'
+        name = self.vector(node, lines, cleanup)
+        if name not in operands:
+            operands[name] = f"wz_a{len(operands)}"
+        return f"{operands[name]}[wz_i]"
+
+    # Calls
+
+    def call(self, node, lines, cleanup):
+        """C expression of a call and its type; a primitive's value is
+        computed in lines, assigning its results"""
+        name = node.identifier
+        if name == 'print':
+            self.print_call(node, lines, cleanup)
+            return '0.0', NUMBER
+        if name in self.primitives:
+            call_type = self.call_type(node)
+            value = self.temporary('wz_c')
+            declaration = 'double' if call_type == NUMBER else 'wz_vec'
+            lines.append(f"{declaration} {value} = {self.primitive(node, lines, cleanup)};")
+            for result in PRIMITIVE_RESULTS.get(name, ()):
+                lines.append(self.assign(result, value, call_type, owned=False))
+            if call_type == VECTOR:
+                cleanup.insert(0, f"wz_free(&{value});")
+            return value, call_type
+        args = [self.vector(arg, lines, cleanup) if self.type_of(arg) == VECTOR
+                else self.number(arg, lines, cleanup) for arg in node.args]
+        return f"{name}({', '.join(args)})", NUMBER
+
+    def primitive_statement(self, node, lines, cleanup):
+        """Lines of a primitive called for its effects, assigning its
+        results"""
+        results = PRIMITIVE_RESULTS.get(node.identifier)
+        call = self.primitive(node, lines, cleanup)
+        if results:
+            lines.append(self.assign(results[0], call, self.call_type(node)))
+        else:
+            lines.append(f"{call};")
+
+    def primitive(self, node, lines, cleanup):
+        """Call of a primitive in the C runtime"""
+        name = node.identifier
+        if name not in C_PRIMITIVES:
+            raise ValueError(f"Unsupported visualization function: {name}")
+        args = node.args
+        if not args:
+            raise ValueError(f"{name} needs a vector")
+        data = self.vector(args[0], lines, cleanup)
+        if name == 'plot':
+            if len(args) > 1:
+                return f"wz_plot({data}, &{self.vector(args[1], lines, cleanup)})"
+            return f"wz_plot({data}, NULL)"
+        if name == 'vec_reverse':
+            return f"wz_vec_reverse({data})"
+        if name == 'vec_product':
+            other = self.vector(args[1], lines, cleanup) if len(args) > 1 else data
+            return f"wz_vec_product_{self.product_type(node)}({data}, {other})"
+        if len(args) > 1:
+            return f"wz_{name}_window({data}, {self.number(args[1], lines, cleanup)})"
+        return f"wz_{name}({data})"
+
+    def print_call(self, node, lines, cleanup):
+        """Lines printing the arguments of print like Python does, once
+        all of them have been evaluated"""
+        printed = []
+        for arg in node.args:
+            if isinstance(arg, StringNode):
+                printed.append(f"wz_print_string({c_string(arg.value)});")
+            elif self.type_of(arg) == VECTOR:
+                printed.append(f"wz_print_vector({self.vector(arg, lines, cleanup)});")
+            else:
+                printed.append(f"wz_print_number({self.number(arg, lines, cleanup)});")
+        for index, line in enumerate(printed):
+            if index:
+                lines.append("wz_print_space();")
+            lines.append(line)
+        lines.append("wz_print_end();")
@@ -0,0 +1,627 @@
+# semantics/c_runtime.py
+
+# Vectors at least this long are split across OpenMP threads
+PARALLEL_THRESHOLD = 1 << 16
+
+# Defined once in each generated C program
+RUNTIME = r'''#include <string.h>
+
+#ifndef WZ_PARALLEL_THRESHOLD
+#define WZ_PARALLEL_THRESHOLD ''' + str(PARALLEL_THRESHOLD) + r'''
+#endif
+
+/* Elementwise loops: iterations are independent, so they vectorize, and
+   with -fopenmp long ones run on all cores */
+#ifdef _OPENMP
+#define WZ_LOOP _Pragma("omp parallel for simd if (wz_n >= WZ_PARALLEL_THRESHOLD)")
+#else
+#define WZ_LOOP _Pragma("GCC ivdep")
+#endif
+
+/* A vector of length doubles; dims is 0 for a number held by a variable
+   that may also hold vectors, and borrowed is set for the elements of an
+   array passed to a kernel, which are never written or freed */
+typedef struct {
+    double *data;
+    size_t length;
+    int dims;
+    int borrowed;
+} wz_vec;
+
+#define WZ_EMPTY {NULL, 0, 1, 0}
+
+#ifdef WZ_KERNEL
+/* Kernels return to their caller on errors, which reads the message */
+#include <setjmp.h>
+
+static jmp_buf wz_error;
+static const char *wz_error_message;
+
+static inline void wz_fail(const char *message)
+{
+    static char buffer[256];
+    snprintf(buffer, sizeof buffer, "%s", message);
+    wz_error_message = buffer;
+    longjmp(wz_error, 1);
+}
+
+const char *wz_kernel_error(void)
+{
+    return wz_error_message;
+}
+
+void wz_free_data(double *data)
+{
+    free(data);
+}
+#else
+static inline void wz_fail(const char *message)
+{
+    fflush(stdout);
+    fprintf(stderr, "Error: %s\n", message);
+    exit(1);
+}
+#endif
+
+static inline double *wz_alloc(size_t length)
+{
+    double *data = malloc((length ? length : 1) * sizeof(double));
+    if (data == NULL)
+        wz_fail("out of memory");
+    return data;
+}
+
+static inline void wz_free(wz_vec *v)
+{
+    if (!v->borrowed)
+        free(v->data);
+    v->data = NULL;
+    v->length = 0;
+    v->borrowed = 0;
+}
+
+/* Length of the result of an elementwise operation on vectors of lengths
+   a and b, broadcasting vectors of one element */
+static inline size_t wz_size(size_t a, size_t b)
+{
+    char message[128];
+    if (a == b || b == 1)
+        return a;
+    if (a == 1)
+        return b;
+    snprintf(message, sizeof message, "operands could not be broadcast together with shapes (%zu,) (%zu,)", a, b);
+    wz_fail(message);
+    return 0;
+}
+
+/* The elements of v, repeated to length n if it has a single one; the
+   caller frees a repeated copy with wz_release, given v's data from
+   before any change to v */
+static inline const double *wz_expand(wz_vec v, size_t n)
+{
+    double *data;
+    if (v.length == n)
+        return v.data;
+    data = wz_alloc(n);
+    for (size_t i = 0; i < n; i++)
+        data[i] = v.data[0];
+    return data;
+}
+
+static inline void wz_release(const double *data, const double *original)
+{
+    if (data != original)
+        free((double *)data);
+}
+
+/* Buffer for a result of length n to be written to v: v's own when it
+   is that long */
+static inline double *wz_output(wz_vec *v, size_t n, int dims)
+{
+    if (v->length != n || v->data == NULL || v->borrowed) {
+        wz_free(v);
+        v->data = wz_alloc(n);
+        v->length = n;
+    }
+    v->dims = dims;
+    return v->data;
+}
+
+static inline void wz_assign(wz_vec *v, wz_vec value)
+{
+    wz_free(v);
+    *v = value;
+}
+
+static inline wz_vec wz_copy(wz_vec v)
+{
+    wz_vec copy = {wz_alloc(v.length), v.length, v.dims, 0};
+    memcpy(copy.data, v.data, v.length * sizeof(double));
+    return copy;
+}
+
+static inline wz_vec wz_from(const double *data, size_t length)
+{
+    wz_vec v = {wz_alloc(length), length, 1, 0};
+    memcpy(v.data, data, length * sizeof(double));
+    return v;
+}
+
+static inline wz_vec wz_number(double value)
+{
+    wz_vec v = {wz_alloc(1), 1, 0, 0};
+    v.data[0] = value;
+    return v;
+}
+
+/* The number a variable that may hold vectors holds */
+static inline double wz_value(wz_vec v)
+{
+    if (v.length != 1)
+        wz_fail("only vectors of one element can be converted to numbers");
+    return v.data[0];
+}
+
+/* Whether a condition holds; frees it */
+static inline int wz_condition(wz_vec *v)
+{
+    int truth;
+    if (v->length != 1)
+        wz_fail("The truth value of an array with more than one element is ambiguous");
+    truth = v->data[0] != 0;
+    wz_free(v);
+    return truth;
+}
+
+/* Printing, in the format Python and NumPy use */
+
+/* Shortest digits reading back as x: the number of significant digits
+   and the decimal exponent of the first */
+static inline int wz_shortest(double x, int *exponent)
+{
+    char buffer[40];
+    int precision;
+    for (precision = 1; precision < 17; precision++) {
+        snprintf(buffer, sizeof buffer, "%.*e", precision - 1, x);
+        if (strtod(buffer, NULL) == x)
+            break;
+    }
+    snprintf(buffer, sizeof buffer, "%.*e", precision - 1, x);
+    *exponent = atoi(strchr(buffer, 'e') + 1);
+    return precision;
+}
+
+static inline void wz_print_number(double x)
+{
+    int exponent, digits;
+    if (isnan(x)) {
+        fputs("nan", stdout);
+        return;
+    }
+    if (isinf(x)) {
+        fputs(x > 0 ? "inf" : "-inf", stdout);
+        return;
+    }
+    digits = wz_shortest(x, &exponent);
+    if (exponent >= -4 && exponent < 16) {
+        int decimals = digits - 1 - exponent;
+        printf("%.*f", decimals > 0 ? decimals : 1, x);
+    } else {
+        char buffer[40], *e;
+        snprintf(buffer, sizeof buffer, "%.*e", digits - 1, x);
+        e = strchr(buffer, 'e');
+        printf("%.*se%c%02d", (int)(e - buffer), buffer, e[1], abs(atoi(e + 1)));
+    }
+}
+
+/* Positional digits of x with at most 8 decimals, trailing zeros
+   dropped but the point kept */
+static inline void wz_positional(double x, char *buffer, size_t size)
+{
+    int exponent, digits = wz_shortest(x, &exponent), decimals = digits - 1 - exponent;
+    char *end;
+    snprintf(buffer, size, "%.*f", decimals < 0 ? 0 : decimals > 8 ? 8 : decimals, x);
+    if (strchr(buffer, '.') == NULL)
+        strcat(buffer, ".");
+    end = buffer + strlen(buffer) - 1;
+    while (*end == '0')
+        *end-- = '\0';
+}
+
+/* Scientific digits of x with at most 8 decimals in the mantissa,
+   trailing zeros dropped but the point kept */
+static inline void wz_scientific(double x, char *mantissa, size_t size, int *exponent)
+{
+    int digits = wz_shortest(x, exponent), decimals = digits - 1;
+    char *end;
+    snprintf(mantissa, size, "%.*e", decimals > 8 ? 8 : decimals, x);
+    *exponent = atoi(strchr(mantissa, 'e') + 1);
+    *strchr(mantissa, 'e') = '\0';
+    if (strchr(mantissa, '.') == NULL)
+        strcat(mantissa, ".");
+    end = mantissa + strlen(mantissa) - 1;
+    while (*end == '0')
+        *end-- = '\0';
+}
+
+/* Width of the integer and fraction parts every element is padded to */
+typedef struct {
+    int scientific, pad_left, pad_right, precision, exponent_digits;
+} wz_format;
+
+static inline wz_format wz_fill_format(const double *data, const size_t *indices, size_t count)
+{
+    wz_format format = {0, 0, 0, 0, 0};
+    double max_value = 0, min_value = 0;
+    int finite = 0, nonzero = 0, negative_inf = 0;
+    char buffer[64];
+    for (size_t k = 0; k < count; k++) {
+        double x = data[indices[k]], a = fabs(x);
+        if (!isfinite(x)) {
+            negative_inf |= isinf(x) && x < 0;
+            continue;
+        }
+        finite++;
+        if (x != 0) {
+            max_value = nonzero ? fmax(max_value, a) : a;
+            min_value = nonzero ? fmin(min_value, a) : a;
+            nonzero++;
+        }
+    }
+    if (nonzero && (max_value >= 1e8 || min_value < 0.0001 || max_value / min_value > 1000.))
+        format.scientific = 1;
+    for (size_t k = 0; k < count; k++) {
+        double x = data[indices[k]];
+        int left, right, exponent;
+        if (!isfinite(x))
+            continue;
+        if (format.scientific) {
+            int digits;
+            wz_scientific(x, buffer, sizeof buffer, &exponent);
+            left = (int)(strchr(buffer, '.') - buffer);
+            right = (int)strlen(buffer) - left - 1;
+            digits = snprintf(NULL, 0, "%d", abs(exponent));
+            if (digits < 2)
+                digits = 2;
+            if (digits > format.exponent_digits)
+                format.exponent_digits = digits;
+        } else {
+            wz_positional(x, buffer, sizeof buffer);
+            left = (int)(strchr(buffer, '.') - buffer);
+            right = (int)strlen(buffer) - left - 1;
+        }
+        if (left > format.pad_left)
+            format.pad_left = left;
+        if (right > format.pad_right)
+            format.pad_right = right;
+    }
+    if (format.scientific) {
+        format.precision = format.pad_right;
+        format.pad_right = format.exponent_digits + 2 + format.precision;
+    }
+    if (finite < (int)count) {
+        int offset = format.pad_right + 1;
+        if (3 - offset > format.pad_left)
+            format.pad_left = 3 - offset;
+        if (3 + negative_inf - offset > format.pad_left)
+            format.pad_left = 3 + negative_inf - offset;
+    }
+    return format;
+}
+
+static inline int wz_format_element(double x, wz_format format, char *out, size_t size)
+{
+    char buffer[64];
+    if (!isfinite(x)) {
+        const char *text = isnan(x) ? "nan" : x > 0 ? "inf" : "-inf";
+        return snprintf(out, size, "%*s", format.pad_left + format.pad_right + 1, text);
+    }
+    if (format.scientific) {
+        int exponent, left;
+        size_t length;
+        wz_scientific(x, buffer, sizeof buffer, &exponent);
+        left = (int)(strchr(buffer, '.') - buffer);
+        length = strlen(buffer);
+        while ((int)length - left - 1 < format.precision)
+            buffer[length++] = '0';
+        buffer[length] = '\0';
+        return snprintf(out, size, "%*s%se%c%0*d", format.pad_left - left, "", buffer,
+                        exponent < 0 ? '-' : '+', format.exponent_digits, abs(exponent));
+    }
+    wz_positional(x, buffer, sizeof buffer);
+    {
+        int left = (int)(strchr(buffer, '.') - buffer), right = (int)strlen(buffer) - left - 1;
+        return snprintf(out, size, "%*s%s%*s", format.pad_left - left, "", buffer, format.pad_right - right, "");
+    }
+}
+
+/* Elements printed from each end of vectors over 1000 elements long */
+#define WZ_EDGE_ITEMS 3
+
+static inline void wz_print_vector(wz_vec v)
+{
+    size_t shown[2 * WZ_EDGE_ITEMS], count = 0, *indices;
+    int summary = v.length > 1000;
+    wz_format format;
+    char line[128], word[96];
+    size_t line_length;
+    int first_line = 1;
+    if (v.dims == 0) {
+        wz_print_number(v.data[0]);
+        return;
+    }
+    if (summary) {
+        for (size_t i = 0; i < WZ_EDGE_ITEMS; i++)
+            shown[count++] = i;
+        for (size_t i = v.length - WZ_EDGE_ITEMS; i < v.length; i++)
+            shown[count++] = i;
+        indices = shown;
+    } else {
+        indices = malloc((v.length ? v.length : 1) * sizeof(size_t));
+        for (size_t i = 0; i < v.length; i++)
+            indices[count++] = i;
+    }
+    format = wz_fill_format(v.data, indices, count);
+    /* Lines wrap before 75 characters, continuing after a space */
+    strcpy(line, " ");
+    line_length = 1;
+    fputc('[', stdout);
+    for (size_t k = 0; k < count + (summary ? 1 : 0); k++) {
+        size_t word_length;
+        if (summary && k == WZ_EDGE_ITEMS)
+            word_length = (size_t)snprintf(word, sizeof word, "...");
+        else
+            word_length = (size_t)wz_format_element(v.data[indices[summary && k > WZ_EDGE_ITEMS ? k - 1 : k]],
+                                                     format, word, sizeof word);
+        if (line_length + word_length > 74 && line_length > 1) {
+            while (line_length > 0 && line[line_length - 1] == ' ')
+                line[--line_length] = '\0';
+            /* The bracket takes the place of the first line's space */
+            fputs(line + first_line, stdout);
+            fputc('\n', stdout);
+            first_line = 0;
+            strcpy(line, " ");
+            line_length = 1;
+        }
+        memcpy(line + line_length, word, word_length + 1);
+        line_length += word_length;
+        if (k + 1 < count + (summary ? 1 : 0)) {
+            line[line_length++] = ' ';
+            line[line_length] = '\0';
+        }
+    }
+    fputs(line + first_line, stdout);
+    fputc(']', stdout);
+    if (!summary)
+        free(indices);
+}
+
+static inline void wz_print(wz_vec v)
+{
+    wz_print_vector(v);
+    fputc('\n', stdout);
+}
+
+/* Pieces of a print call */
+static inline void wz_print_string(const char *s)
+{
+    fputs(s, stdout);
+}
+
+static inline void wz_print_space(void)
+{
+    fputc(' ', stdout);
+}
+
+static inline void wz_print_end(void)
+{
+    fputc('\n', stdout);
+}
+
+/* Primitives, printing their result like the Python runtime */
+
+/* Sum of n elements in NumPy's pairwise order */
+static inline double wz_sum(const double *data, size_t n)
+{
+    if (n < 8) {
+        double sum = 0.;
+        for (size_t i = 0; i < n; i++)
+            sum += data[i];
+        return sum;
+    }
+    if (n <= 128) {
+        double r[8], sum;
+        size_t i;
+        for (int j = 0; j < 8; j++)
+            r[j] = data[j];
+        for (i = 8; i < n - n % 8; i += 8)
+            for (int j = 0; j < 8; j++)
+                r[j] += data[i + j];
+        sum = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]));
+        for (; i < n; i++)
+            sum += data[i];
+        return sum;
+    } else {
+        size_t half = n / 2;
+        half -= half % 8;
+        return wz_sum(data, half) + wz_sum(data + half, n - half);
+    }
+}
+
+static inline double wz_mean(const double *data, size_t n)
+{
+    return wz_sum(data, n) / (double)n;
+}
+
+static inline double wz_max(const double *data, size_t n)
+{
+    double m;
+    if (n == 0)
+        wz_fail("zero-size array to reduction operation maximum which has no identity");
+    m = data[0];
+    for (size_t i = 1; i < n && !isnan(m); i++)
+        if (data[i] > m || isnan(data[i]))
+            m = data[i];
+    return m;
+}
+
+static inline double wz_min(const double *data, size_t n)
+{
+    double m;
+    if (n == 0)
+        wz_fail("zero-size array to reduction operation minimum which has no identity");
+    m = data[0];
+    for (size_t i = 1; i < n && !isnan(m); i++)
+        if (data[i] < m || isnan(data[i]))
+            m = data[i];
+    return m;
+}
+
+/* Reduction of each window of the vector padded with copies of its
+   first element, or of the whole vector without a window */
+static inline wz_vec wz_windowed(double (*reduce)(const double *, size_t), wz_vec v, double window)
+{
+    wz_vec result;
+    size_t w = (size_t)window;
+    if (w == 0)
+        return wz_number(reduce(v.data, v.length));
+    if (v.length == 0)
+        wz_fail("cannot compute a moving reduction of an empty vector");
+    result.data = wz_alloc(v.length);
+    result.length = v.length;
+    result.dims = 1;
+    result.borrowed = 0;
+    {
+        double *padded = wz_alloc(v.length + w - 1);
+        for (size_t i = 0; i < w - 1; i++)
+            padded[i] = v.data[0];
+        memcpy(padded + w - 1, v.data, v.length * sizeof(double));
+        for (size_t i = 0; i < v.length; i++)
+            result.data[i] = reduce(padded + i, w);
+        free(padded);
+    }
+    wz_print(result);
+    return result;
+}
+
+static inline double wz_vec_average(wz_vec v)
+{
+    double result = wz_mean(v.data, v.length);
+    wz_print_number(result);
+    fputc('\n', stdout);
+    return result;
+}
+
+static inline double wz_vec_max(wz_vec v)
+{
+    double result = wz_max(v.data, v.length);
+    wz_print_number(result);
+    fputc('\n', stdout);
+    return result;
+}
+
+static inline double wz_vec_min(wz_vec v)
+{
+    double result = wz_min(v.data, v.length);
+    wz_print_number(result);
+    fputc('\n', stdout);
+    return result;
+}
+
+static inline wz_vec wz_vec_average_window(wz_vec v, double window)
+{
+    return wz_windowed(wz_mean, v, window);
+}
+
+static inline wz_vec wz_vec_max_window(wz_vec v, double window)
+{
+    return wz_windowed(wz_max, v, window);
+}
+
+static inline wz_vec wz_vec_min_window(wz_vec v, double window)
+{
+    return wz_windowed(wz_min, v, window);
+}
+
+static inline wz_vec wz_vec_reverse(wz_vec v)
+{
+    wz_vec result = {wz_alloc(v.length), v.length, v.dims, 0};
+    for (size_t i = 0; i < v.length; i++)
+        result.data[i] = v.data[v.length - 1 - i];
+    wz_print(result);
+    return result;
+}
+
+static inline double wz_vec_product_dot(wz_vec a, wz_vec b)
+{
+    double result = 0.;
+    char message[128];
+    if (a.length != b.length) {
+        snprintf(message, sizeof message, "shapes (%zu,) and (%zu,) not aligned", a.length, b.length);
+        wz_fail(message);
+    }
+    for (size_t i = 0; i < a.length; i++)
+        result += a.data[i] * b.data[i];
+    wz_print_number(result);
+    fputc('\n', stdout);
+    return result;
+}
+
+static inline wz_vec wz_vec_product_cross(wz_vec a, wz_vec b)
+{
+    wz_vec result = {wz_alloc(3), 3, 1, 0};
+    if (a.length != 3 || b.length != 3)
+        wz_fail("the C backend computes cross products of vectors of 3 elements only");
+    result.data[0] = a.data[1] * b.data[2] - a.data[2] * b.data[1];
+    result.data[1] = a.data[2] * b.data[0] - a.data[0] * b.data[2];
+    result.data[2] = a.data[0] * b.data[1] - a.data[1] * b.data[0];
+    wz_print(result);
+    return result;
+}
+
+static inline wz_vec wz_vec_product_element(wz_vec a, wz_vec b)
+{
+    size_t wz_n = wz_size(a.length, b.length);
+    const double *x = wz_expand(a, wz_n), *y = wz_expand(b, wz_n);
+    wz_vec result = {wz_alloc(wz_n), wz_n, a.dims | b.dims, 0};
+    double *out = result.data;
+    WZ_LOOP
+    for (size_t i = 0; i < wz_n; i++)
+        out[i] = x[i] * y[i];
+    wz_release(x, a.data);
+    wz_release(y, b.data);
+    wz_print(result);
+    return result;
+}
+
+/* Plots with gnuplot when it is installed, to wizuall_plot.png; the data
+   is left in wizuall_plot.dat */
+static inline void wz_plot(wz_vec x, const wz_vec *y)
+{
+    FILE *data = fopen("wizuall_plot.dat", "w"), *gnuplot;
+    if (data == NULL) {
+        fprintf(stderr, "Error opening wizuall_plot.dat\n");
+        return;
+    }
+    for (size_t i = 0; i < x.length; i++) {
+        if (y != NULL)
+            fprintf(data, "%.17g %.17g\n", x.data[i], i < y->length ? y->data[i] : NAN);
+        else
+            fprintf(data, "%zu %.17g\n", i, x.data[i]);
+    }
+    fclose(data);
+    if (system("command -v gnuplot > /dev/null 2>&1") != 0)
+        return;
+    gnuplot = popen("gnuplot", "w");
+    if (gnuplot == NULL)
+        return;
+    fprintf(gnuplot, "set terminal png size 1000,600\n");
+    fprintf(gnuplot, "set output 'wizuall_plot.png'\n");
+    fprintf(gnuplot, "set title 'WizuAll Plot'\n");
+    fprintf(gnuplot, "set xlabel 'X'\n");
+    fprintf(gnuplot, "set ylabel 'Y'\n");
+    fprintf(gnuplot, "set grid\n");
+    fprintf(gnuplot, "plot 'wizuall_plot.dat' with lines title 'Data'\n");
+    pclose(gnuplot);
+}
+'''
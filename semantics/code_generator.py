@@ -2,28 +2,69 @@
 from parser.parser import *
 from semantics.symbol_table import SymbolTable
 from visual_primitives.viz_functions import VisualizationPrimitives
+from semantics.fusion import ElementwiseFusion
+from optimizer.buffers import BufferReuse
+from optimizer.liveness import Liveness
+from optimizer.dataflow import PRIMITIVE_RESULTS, identifiers, assigned
+from semantics.scheduler import StatementScheduler, RUNTIME as SCHEDULE_RUNTIME
+from semantics.c_backend import CBackend
+from semantics.c_runtime import RUNTIME as C_RUNTIME
+from semantics.native import NativeKernels
+
+# Primitives generated code calls in wizuall_runtime rather than inlining
+# a template for
+VIZ_FUNCTIONS = [
+    'plot', 'histogram', 'heatmap', 'scatter', 'bar', 'line',
+    'vec_average', 'vec_max', 'vec_min', 'vec_reverse',
+    'vec_product', 'vec_compare', 'clustering', 'classification'
+]
+
+# Module the Python primitives are imported from
+RUNTIME_MODULE = 'wizuall_runtime'
 
 class CodeGenerator:
-    def __init__(self, ast, target_language='python'):
+    def __init__(self, ast, target_language='python', fuse=False, reuse=False, release=False,
+                 schedule=None, workers=None, native=None):
         self.ast = ast
         self.symbol_table = SymbolTable()
         self.target_language = target_language
         self.viz_primitives = VisualizationPrimitives(target_language)
         self.code = []
-        self.indentation = 0
+        # C statements are generated in the body of main
+        self.c = CBackend(VIZ_FUNCTIONS) if target_language == 'c' else None
+        self.top_level = 4 if self.c else 0
+        self.indentation = self.top_level
+        # Compound vector expressions are fused into blockwise kernels
+        self.fusion = ElementwiseFusion() if (fuse or reuse) and target_language == 'python' else None
+        # Independent groups of statements run concurrently on a pool of
+        # threads or processes
+        self.scheduler = StatementScheduler(schedule, workers) if schedule and target_language == 'python' else None
+        # Tasks may share vectors, and keep their own variables, so
+        # scheduled code neither updates nor releases them
+        scheduled = self.scheduler is not None
+        # Vector assignments proven to hold the only live reference to
+        # their variable's buffer write their result into it
+        self.buffers = BufferReuse() if reuse and target_language == 'python' and not scheduled else None
+        # Variables are released after their last use in whole programs
+        self.liveness = Liveness() if release and target_language in ('python', 'r') and not scheduled else None
+        # Loops run as C kernels built with the gcc flags native holds
+        self.native = (NativeKernels(VIZ_FUNCTIONS, native)
+                       if native is not None and target_language == 'python' and not scheduled else None)
         
         # Setup standard headers based on target language
         self.headers = {
             'python': [
                 "import numpy as np",
                 "import matplotlib.pyplot as plt",
+                f"import {RUNTIME_MODULE}",
                 ""
             ],
             'c': [
                 "#include <stdio.h>",
                 "#include <stdlib.h>",
                 "#include <math.h>",
-                ""
+                *C_RUNTIME.split('\n'),
+                "int main(void) {"
             ],
             'r': [
                 "# WizuAll generated R code",
@@ -31,18 +72,80 @@ class CodeGenerator:
                 ""
             ]
         }
+        self.footers = {
+            'c': [
+                "    return 0;",
+                "}"
+            ]
+        }
     
     def generate(self):
         """Generate target code from AST"""
         # Add headers
         self.code.extend(self.headers.get(self.target_language, []))
+        if self.buffers:
+            self.buffers.analyze(self.ast)
+        if self.liveness:
+            self.liveness.analyze(self.ast.statements, self.buffers)
+        if self.c:
+            self.c.types = self.c.infer(self.ast.statements)
+        if self.native:
+            self.native.analyze(self.ast.statements)
         
         # Generate code
-        self.visit(self.ast)
+        if self.scheduler:
+            self.visit_scheduled(self.ast.statements)
+        elif self.native:
+            self.visit_native(self.ast.statements)
+        else:
+            self.visit(self.ast)
+        if self.c:
+            for line in self.c.release():
+                self.add_line(line)
+        self.code.extend(self.footers.get(self.target_language, []))
         
         # Return complete code as string
         return '\n'.join(self.code)
     
+    def generate_stream(self, statements, output):
+        """Generate code for statements one at a time, writing each one's
+        code to the output file before the next is generated
+        
+        Writes the same text generate() would return for those statements.
+        """
+        self.code.extend(self.headers.get(self.target_language, []))
+        written = self.write_code(output, False)
+        for statement in statements:
+            if self.buffers:
+                self.buffers.analyze_statement(statement)
+            self.visit_statement(statement)
+            written = self.write_code(output, written)
+        if self.c:
+            for line in self.c.release():
+                self.add_line(line)
+        self.code.extend(self.footers.get(self.target_language, []))
+        self.write_code(output, written)
+    
+    def write_code(self, output, written):
+        """Move the pending lines to output; returns whether any lines have
+        been written so far"""
+        if not self.code:
+            return written
+        if written:
+            output.write('\n')
+        output.write('\n'.join(self.code))
+        self.code.clear()
+        return True
+    
+    def visit_block(self, node):
+        """Visit the body of an if or while; Python blocks cannot be empty"""
+        lines = len(self.code)
+        self.indent()
+        self.visit(node)
+        if self.target_language == 'python' and len(self.code) == lines:
+            self.add_line("pass")
+        self.dedent()
+    
     def indent(self):
         """Increase indentation level"""
         self.indentation += 4
@@ -68,34 +171,135 @@ class CodeGenerator:
     def visit_StatementsNode(self, node):
         """Visit statements node"""
         for statement in node.statements:
-            self.visit(statement)
+            self.visit_statement(statement)
         
         return None
     
+    def visit_statement(self, node):
+        """Visit a statement; a top-level one is preceded by the definitions
+        of the fused kernels, or C variables, first used in it"""
+        top_level = self.indentation == self.top_level
+        if self.c and top_level:
+            for line in self.c.declarations(node):
+                self.add_line(line)
+        start = len(self.code)
+        self.visit(node)
+        if self.fusion and top_level and self.fusion.pending:
+            self.code[start:start] = self.fusion.take_definitions()
+        if self.liveness and top_level:
+            self.release(self.liveness.deleted.get(id(node), ()), self.liveness.cleared.get(id(node), ()))
+    
+    def release(self, deleted, cleared):
+        """Release the values of variables no longer read; cleared ones may
+        never have been assigned"""
+        if self.target_language == 'python':
+            if deleted:
+                self.add_line(f"del {', '.join(deleted)}")
+            for name in cleared:
+                self.add_line(f"{name} = None")
+        elif self.target_language == 'r':
+            if deleted:
+                self.add_line(f"rm({', '.join(deleted)})")
+            for name in cleared:
+                self.add_line(f"{name} <- NULL")
+    
+    def visit_scheduled(self, statements):
+        """Generate each group of statements as a task function, followed
+        by the call running the tasks"""
+        self.code.extend(SCHEDULE_RUNTIME.split('\n'))
+        tasks = []
+        for number, (group, inputs, unbound, outputs, dependencies) in enumerate(self.scheduler.tasks(statements)):
+            name = f"_wizuall_task{number}"
+            start = len(self.code)
+            self.add_line(f"def {name}({', '.join(inputs)}):")
+            self.indent()
+            for input_name in unbound:
+                self.add_line(f"if {input_name} is _wizuall_unbound:")
+                self.add_line(f"    del {input_name}")
+            for statement in group:
+                self.visit(statement)
+            self.add_line(f"return _wizuall_outputs({tuple(outputs)!r}, locals())")
+            self.dedent()
+            if self.fusion and self.fusion.pending:
+                self.code[start:start] = self.fusion.take_definitions()
+            tasks.append((name, inputs, dependencies))
+        self.code.extend(self.scheduler.run_call(tasks))
+    
+    def visit_native(self, statements):
+        """Generate statements, running each run of numeric ones as a C
+        kernel unless its variables' values make it fall back to Python"""
+        for kernel, run in self.native.runs(statements):
+            if not kernel:
+                self.visit_statement(run[0])
+                continue
+            generator = CodeGenerator(None, 'c')
+            generator.c.types = self.native.types
+            # The kernel's parameters are its variables
+            generator.c.declared = identifiers(run)
+            for statement in run:
+                generator.visit_statement(statement)
+            name, vectors, numbers = self.native.kernel(run, generator.code)
+            inputs = sorted(self.native.inputs(run))
+            start = len(self.code)
+            self.add_line(f"if not {RUNTIME_MODULE}.native.run(_wizuall_kernels, {name!r}, globals(), "
+                          f"{tuple(vectors)!r}, {tuple(numbers)!r}, {tuple(inputs)!r}):")
+            self.indent()
+            for statement in run:
+                self.visit(statement)
+            self.dedent()
+            if self.fusion and self.fusion.pending:
+                self.code[start:start] = self.fusion.take_definitions()
+            if self.liveness:
+                # Releases follow the whole run, so variables it assigns
+                # again after their release stay
+                for index, statement in enumerate(run):
+                    later = assigned(run[index + 1:])
+                    self.release([name for name in self.liveness.deleted.get(id(statement), ()) if name not in later],
+                                 [name for name in self.liveness.cleared.get(id(statement), ()) if name not in later])
+        if self.native.functions:
+            # The library is loaded once the modules are imported
+            position = len(self.headers['python']) - 1
+            self.code[position:position] = [
+                f"import {RUNTIME_MODULE}.native",
+                f"_wizuall_kernels = {RUNTIME_MODULE}.native.load(r'''{self.native.source()}''', "
+                f"{self.native.flags!r})"
+            ]
+    
     def visit_StatementNode(self, node):
         """Visit statement node"""
-        return self.visit(node.statement)
+        if self.c and isinstance(node.statement, FunctionCallNode):
+            for line in self.c.call_statement(node.statement):
+                self.add_line(line)
+            return None
+        if self.is_runtime_call(node.statement):
+            results = PRIMITIVE_RESULTS.get(node.statement.identifier)
+            call = self.runtime_call(node.statement)
+            self.add_line(f"{', '.join(results)} = {call}" if results else call)
+            return None
+        code = self.visit(node.statement)
+        # Calls to functions other than the primitives are statements too
+        if code is not None:
+            self.add_line(f"{code};" if self.target_language == 'c' else code)
+        return None
     
     def visit_AssignmentNode(self, node):
         """Visit assignment node"""
         if self.target_language == 'python':
             var_name = node.identifier.name
+            if self.is_runtime_call(node.expr):
+                results = PRIMITIVE_RESULTS.get(node.expr.identifier)
+                targets = f"{var_name} = {', '.join(results)}" if results else var_name
+                self.add_line(f"{targets} = {self.runtime_call(node.expr)}")
+                return None
             expr = self.visit(node.expr)
+            if self.buffers and id(node) in self.buffers.reusable:
+                expr = self.fusion.fuse_into(var_name, node.expr, expr, self.visit)
+            elif self.fusion and self.fusion.fusable(node.expr):
+                expr = self.fusion.fuse(node.expr, expr, self.visit)
             self.add_line(f"{var_name} = {expr}")
         elif self.target_language == 'c':
-            var_name = node.identifier.name
-            expr = self.visit(node.expr)
-            
-            # Check if it's an array or scalar
-            symbol = self.symbol_table.lookup(var_name)
-            if symbol and symbol.type == 'vector':
-                # It's a vector assignment
-                # For simplicity, we just assume the vector is already defined
-                self.add_line(f"// Vector assignment for {var_name}")
-                self.add_line(f"// This needs to be expanded based on vector type")
-            else:
-                # Scalar assignment
-                self.add_line(f"double {var_name} = {expr};")
+            for line in self.c.assignment(node):
+                self.add_line(line)
         elif self.target_language == 'r':
             var_name = node.identifier.name
             expr = self.visit(node.expr)
@@ -105,19 +309,20 @@ class CodeGenerator:
     
     def visit_IfNode(self, node):
         """Visit if node"""
-        condition = self.visit(node.condition)
+        if self.c:
+            setup, condition = self.c.condition(node.condition)
+            for line in setup:
+                self.add_line(line)
+        else:
+            condition = self.visit(node.condition)
         
         if self.target_language == 'python':
             self.add_line(f"if {condition}:")
-            self.indent()
-            self.visit(node.if_body)
-            self.dedent()
+            self.visit_block(node.if_body)
             
             if node.else_body:
                 self.add_line("else:")
-                self.indent()
-                self.visit(node.else_body)
-                self.dedent()
+                self.visit_block(node.else_body)
         elif self.target_language == 'c':
             self.add_line(f"if ({condition}) {{")
             self.indent()
@@ -153,16 +358,25 @@ class CodeGenerator:
     
     def visit_WhileNode(self, node):
         """Visit while node"""
-        condition = self.visit(node.condition)
+        if self.c:
+            setup, condition = self.c.condition(node.condition)
+        else:
+            condition = self.visit(node.condition)
         
         if self.target_language == 'python':
+            # Give the loop its own copy of the vectors it updates in place
+            for name in self.buffers.owned.get(id(node), ()) if self.buffers else ():
+                self.add_line(f"{name} = {name}.copy() if isinstance({name}, np.ndarray) else {name}")
             self.add_line(f"while {condition}:")
-            self.indent()
-            self.visit(node.body)
-            self.dedent()
+            self.visit_block(node.body)
         elif self.target_language == 'c':
-            self.add_line(f"while ({condition}) {{")
+            # A condition needing statements is tested at the top of the body
+            self.add_line(f"while (1) {{" if setup else f"while ({condition}) {{")
             self.indent()
+            for line in setup:
+                self.add_line(line)
+            if setup:
+                self.add_line(f"if (!{condition}) break;")
             self.visit(node.body)
             self.dedent()
             self.add_line("}")
@@ -178,16 +392,24 @@ class CodeGenerator:
     def visit_FunctionCallNode(self, node):
         """Visit function call node"""
         function_name = node.identifier
-        args = [self.visit(arg) for arg in node.args]
         
-        # Check if it's a visualization function
-        viz_functions = [
-            'plot', 'histogram', 'heatmap', 'scatter', 'bar', 'line',
-            'vec_average', 'vec_max', 'vec_min', 'vec_reverse',
-            'vec_product', 'vec_compare', 'clustering', 'classification'
-        ]
+        if self.is_runtime_call(node):
+            call = self.runtime_call(node)
+            results = PRIMITIVE_RESULTS.get(function_name)
+            if not results:
+                return call
+            # Inside an expression the results are assigned with :=, which
+            # cannot unpack: the last name holds the whole value until the
+            # others have been taken from it
+            if len(results) == 1:
+                return f"({results[0]} := {call})"
+            last = results[-1]
+            names = [f"{results[0]} := ({last} := {call})[0]"]
+            names.extend(f"{name} := {last}[{index}]" for index, name in enumerate(results[1:], 1))
+            return f"({', '.join(names)})"
         
-        if function_name in viz_functions:
+        args = [self.visit(arg) for arg in node.args]
+        if function_name in VIZ_FUNCTIONS:
             # Generate visualization code
             viz_code = self.viz_primitives.generate_code(function_name, args)
             # Add the visualization code directly
@@ -205,6 +427,16 @@ class CodeGenerator:
         elif self.target_language == 'r':
             return f"{function_name}({args_str})"
     
+    def is_runtime_call(self, node):
+        """Whether node calls a primitive from wizuall_runtime"""
+        return (self.target_language == 'python' and isinstance(node, FunctionCallNode)
+                and node.identifier in VIZ_FUNCTIONS)
+    
+    def runtime_call(self, node):
+        """Call of a primitive in wizuall_runtime, returning its result"""
+        args = ', '.join(self.visit(arg) for arg in node.args)
+        return f"{RUNTIME_MODULE}.{node.identifier}({args})"
+    
     def visit_BinaryOpNode(self, node):
         """Visit binary operation node"""
         left = self.visit(node.left)
@@ -243,13 +475,15 @@ class CodeGenerator:
     def visit_VectorNode(self, node):
         """Visit vector node"""
         elements = [self.visit(element) for element in node.elements]
-        elements_str = ', '.join(elements)
-        
+        return self.vector_literal(', '.join(elements))
+    
+    def visit_PackedVectorNode(self, node):
+        """Visit packed vector node, formatting straight from its array"""
+        return self.vector_literal(', '.join(map(str, node.values)))
+    
+    def vector_literal(self, elements_str):
+        """Wrap comma-separated elements in the target's vector literal"""
         if self.target_language == 'python':
             return f"np.array([{elements_str}])"
-        elif self.target_language == 'c':
-            # For C, we'd need to handle array allocation properly
-            # This is just a placeholder
-            return f"/* Array: {elements_str} */"
         elif self.target_language == 'r':
             return f"c({elements_str})"
\ No newline at end of file
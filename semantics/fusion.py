@@ -0,0 +1,224 @@
+# semantics/fusion.py
+from parser.parser import *
+from scanner.lexer import TokenType
+
+# Elements per block: a block of each intermediate result fits in cache
+BLOCK_SIZE = 8192
+
+# Expressions with fewer operators allocate no intermediate vectors
+MIN_OPERATORS = 2
+
+UFUNCS = {
+    TokenType.PLUS: 'np.add',
+    TokenType.MINUS: 'np.subtract',
+    TokenType.MULTIPLY: 'np.multiply',
+    TokenType.DIVIDE: 'np.divide'
+}
+
+# Defined once in each generated program using fused kernels
+RUNTIME = f'''import threading
+
+def _wizuall_fusable(*operands):
+    """Whether operands are scalars and equally long float64 vectors worth
+    evaluating block by block"""
+    length = None
+    for operand in operands:
+        if isinstance(operand, np.ndarray):
+            if operand.dtype != np.float64 or operand.ndim != 1 or length not in (None, len(operand)):
+                return False
+            length = len(operand)
+        elif not isinstance(operand, (int, float)):
+            return False
+    return length is not None and length >= {BLOCK_SIZE}
+
+def _wizuall_reusable(out, *operands):
+    """Whether a result computed from operands can be written into out: a
+    writeable float64 vector as long as every vector operand"""
+    if not (isinstance(out, np.ndarray) and out.dtype == np.float64 and out.ndim == 1 and out.flags.writeable):
+        return False
+    vector = False
+    for operand in operands:
+        if isinstance(operand, np.ndarray):
+            if operand.dtype != np.float64 or operand.shape != out.shape:
+                return False
+            vector = True
+        elif not isinstance(operand, (int, float)):
+            return False
+    return vector
+
+# Scratch buffers, shared by the kernels each thread runs
+_wizuall_local = threading.local()
+
+def _wizuall_fused(kernel, scratch, *operands, out=None):
+    """Evaluate kernel one block at a time into out, or into a new vector,
+    keeping its intermediate results in block-sized scratch buffers"""
+    if out is None:
+        out = np.empty(next(len(operand) for operand in operands if isinstance(operand, np.ndarray)))
+    elif not scratch:
+        # A single operator, as in v = v + x, gains nothing from blocks
+        kernel(out, [], *operands)
+        return out
+    buffers = _wizuall_local.__dict__.setdefault('scratch', [])
+    while len(buffers) < scratch:
+        buffers.append(np.empty({BLOCK_SIZE}))
+    length = len(out)
+    for start in range(0, length, {BLOCK_SIZE}):
+        stop = min(start + {BLOCK_SIZE}, length)
+        blocks = [operand[start:stop] if isinstance(operand, np.ndarray) else operand for operand in operands]
+        kernel(out[start:stop], [buffer[:stop - start] for buffer in buffers[:scratch]], *blocks)
+    return out'''
+
+def operator_count(node):
+    """Number of operators in an elementwise expression tree, or None if
+    node is not one: arithmetic on identifiers and numbers only"""
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinaryOpNode) and node.op.token_type in UFUNCS:
+            stack.extend((node.left, node.right))
+        elif isinstance(node, UnaryOpNode) and node.op.token_type == TokenType.MINUS:
+            stack.append(node.expr)
+        elif isinstance(node, (IdentifierNode, NumberNode)):
+            continue
+        else:
+            return None
+        count += 1
+    return count
+
+class ElementwiseFusion:
+    """Fused evaluation of compound vector expressions for the Python backend
+
+    An expression such as ((x + y) * 2.0) - w evaluated by NumPy operator
+    by operator allocates a full-size temporary at every operator. Fused,
+    it becomes a kernel applying the same ufuncs with out= to one block
+    of the result at a time, with the intermediate results of
+    subexpressions in block-sized scratch buffers, so a single full-size
+    vector is allocated. The assignment only takes the fused path at run
+    time when every operand is a scalar or a float64 vector of the same
+    length of at least BLOCK_SIZE elements; otherwise it evaluates the
+    expression as written. Both compute each element with the same
+    operations in the same order, so the results are identical, except
+    that a scalar divided by a scalar zero gives inf, as in NumPy, rather
+    than raising ZeroDivisionError.
+    """
+
+    def __init__(self):
+        # Name of the kernel for each kernel body, shared by all the
+        # expressions of the same form
+        self.kernels = {}
+        # Definitions not yet placed in the generated code
+        self.pending = []
+
+    def fusable(self, node):
+        count = operator_count(node)
+        return count is not None and count >= MIN_OPERATORS
+
+    def fuse(self, node, expression, render):
+        """The Python expression evaluating node through a fused kernel,
+        falling back to expression; render formats numbers"""
+        operands = {}
+        name, scratch = self.kernel(node, operands, render, False)
+        arguments = ', '.join(operands)
+        return f"_wizuall_fused({name}, {scratch}, {arguments}) if _wizuall_fusable({arguments}) else {expression}"
+
+    def fuse_into(self, target, node, expression, render):
+        """The Python expression evaluating node into the vector target
+        already holds, falling back to expression
+
+        node may read target, or a variable holding the same vector: its
+        kernel computes the operands of its last operator into scratch
+        buffers, so only that operator writes to target, after every
+        element it depends on has been read.
+        """
+        operands = {}
+        name, scratch = self.kernel(node, operands, render, True)
+        arguments = ', '.join(operands)
+        return (f"_wizuall_fused({name}, {scratch}, {arguments}, out={target}) "
+                f"if _wizuall_reusable({target}, {arguments}) else {expression}")
+
+    def kernel(self, node, operands, render, in_place):
+        """Name and number of scratch buffers of the kernel computing node,
+        defining it if no expression of the same form did"""
+        body, scratch = self.kernel_body(node, operands, render, in_place)
+        name = self.kernels.get(body)
+        if name is None:
+            if not self.kernels:
+                self.pending.extend(RUNTIME.split('\n'))
+            name = self.kernels[body] = f"_wizuall_kernel{len(self.kernels)}"
+            parameters = ', '.join(['out', 'tmp', *operands.values()])
+            self.pending.append(f"def {name}({parameters}):")
+            self.pending.extend(f"    {line}" for line in body)
+        return name, scratch
+
+    def take_definitions(self):
+        """Return and forget the definitions the expressions fused so far need"""
+        pending, self.pending = self.pending, []
+        return pending
+
+    def kernel_body(self, node, operands, render, in_place=False):
+        """Lines of the kernel computing node into out, and the number of
+        scratch buffers they use
+
+        operands maps each variable read to its kernel parameter. In
+        place, only the last operator writes to out.
+        """
+        lines = []
+        scratch = 0
+
+        def leaf(node):
+            if isinstance(node, IdentifierNode):
+                return operands.setdefault(node.name, f"v{len(operands)}")
+            return render(node)
+
+        def compound(node):
+            return isinstance(node, (BinaryOpNode, UnaryOpNode))
+
+        def emit(node, target, depth):
+            """Compute node into target, using scratch buffers from depth"""
+            nonlocal scratch
+            if isinstance(node, UnaryOpNode):
+                if compound(node.expr):
+                    emit(node.expr, target, depth)
+                    expr = target
+                else:
+                    expr = leaf(node.expr)
+                lines.append(f"np.negative({expr}, out={target})")
+                return
+            if compound(node.left):
+                emit(node.left, target, depth)
+                left = target
+                if compound(node.right):
+                    right = f"tmp[{depth}]"
+                    scratch = max(scratch, depth + 1)
+                    emit(node.right, right, depth + 1)
+                else:
+                    right = leaf(node.right)
+            else:
+                left = leaf(node.left)
+                if compound(node.right):
+                    emit(node.right, target, depth)
+                    right = target
+                else:
+                    right = leaf(node.right)
+            lines.append(f"{UFUNCS[node.op.token_type]}({left}, {right}, out={target})")
+
+        def operand(node, depth):
+            """Compute node into a scratch buffer of its own if needed"""
+            nonlocal scratch
+            if not compound(node):
+                return leaf(node)
+            target = f"tmp[{depth}]"
+            scratch = max(scratch, depth + 1)
+            emit(node, target, depth + 1)
+            return target
+
+        if not in_place:
+            emit(node, 'out', 0)
+        elif isinstance(node, UnaryOpNode):
+            lines.append(f"np.negative({operand(node.expr, 0)}, out=out)")
+        else:
+            left = operand(node.left, 0)
+            right = operand(node.right, 1 if compound(node.left) else 0)
+            lines.append(f"{UFUNCS[node.op.token_type]}({left}, {right}, out=out)")
+        return tuple(lines), scratch
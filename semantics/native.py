@@ -0,0 +1,159 @@
+# semantics/native.py
+from parser.parser import *
+from scanner.lexer import TokenType
+from optimizer.dataflow import walk, reads, assigned, identifiers
+from semantics.c_backend import CBackend, VECTOR, NUMBER, c_name
+from semantics.c_runtime import RUNTIME
+
+# Nodes statements made only of arithmetic, ifs and loops consist of
+NUMERIC_NODES = (
+    StatementNode, StatementsNode, AssignmentNode, IfNode, WhileNode,
+    BinaryOpNode, UnaryOpNode, NumberNode, IdentifierNode, VectorNode, PackedVectorNode
+)
+
+ARITHMETIC = {TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY, TokenType.DIVIDE}
+COMPARISONS = {TokenType.GREATER, TokenType.LESS}
+
+class NativeKernels:
+    """Loops of a Python program compiled to C functions, for the native
+    mode of CodeGenerator
+
+    Each maximal run of top-level statements made only of arithmetic on
+    numbers and one-dimensional vectors, ifs and loops, with at least one
+    loop among them, becomes a kernel: a C function of the variables the
+    run uses, generated by the C backend, which reads NumPy arrays in
+    place and returns the vectors it assigns in buffers NumPy adopts.
+    Comparisons may only be the conditions of ifs and loops, whose
+    conditions must be numbers, so that no value depends on Python's
+    booleans. Calls, strings and printing stay in Python.
+
+    The generated Python runs a kernel through wizuall_runtime.native,
+    falling back to the run's Python code when a variable holds a value
+    the kernel cannot take. Kernels differ from Python in two ways:
+    dividing a number by zero gives an infinity rather than raising, and
+    a variable first assigned in a branch or loop that did not run is
+    left 0 or empty rather than undefined.
+    """
+
+    def __init__(self, primitives, flags):
+        self.flags = list(flags)
+        # Types are inferred as for the C target, over the whole program
+        self.backend = CBackend(primitives)
+        self.functions = []
+
+    @property
+    def types(self):
+        return self.backend.types
+
+    def analyze(self, statements):
+        self.backend.types = self.backend.infer(statements)
+
+    # Runs
+
+    def runs(self, statements):
+        """Split top-level statements into runs, each with whether it
+        becomes a kernel"""
+        run = []
+        for statement in statements:
+            if self.numeric(statement):
+                run.append(statement)
+                continue
+            yield from self.flush(run)
+            run = []
+            yield False, [statement]
+        yield from self.flush(run)
+
+    def flush(self, run):
+        if any(isinstance(node, WhileNode) for node in walk(run)):
+            yield True, run
+        else:
+            for statement in run:
+                yield False, [statement]
+
+    def numeric(self, statement):
+        """Whether a statement can be part of a kernel"""
+        if isinstance(statement, StatementNode) and not isinstance(statement.statement, (IfNode, WhileNode)):
+            return False
+        conditions = set()
+        for node in walk(statement):
+            if not isinstance(node, NUMERIC_NODES):
+                return False
+            if isinstance(node, (IfNode, WhileNode)):
+                if self.backend.type_of(node.condition) != NUMBER:
+                    return False
+                conditions.add(id(node.condition))
+            elif isinstance(node, BinaryOpNode):
+                if node.op.token_type in COMPARISONS:
+                    if id(node) not in conditions:
+                        return False
+                elif node.op.token_type not in ARITHMETIC:
+                    return False
+            elif isinstance(node, VectorNode):
+                if any(self.backend.type_of(element) != NUMBER for element in node.elements):
+                    return False
+        return True
+
+    def inputs(self, statements, defined=frozenset()):
+        """Variables statements may read before assigning them"""
+        inputs = set()
+        self.exposed(statements, set(defined), inputs)
+        return inputs
+
+    def exposed(self, statements, defined, inputs):
+        """Add the variables statements may read before they are in
+        defined to inputs; returns those defined on every path through
+        them"""
+        for statement in statements:
+            if isinstance(statement, StatementNode):
+                statement = statement.statement
+            if isinstance(statement, AssignmentNode):
+                inputs.update(reads(statement.expr) - defined)
+                defined.add(statement.identifier.name)
+            elif isinstance(statement, IfNode):
+                inputs.update(reads(statement.condition) - defined)
+                taken = self.exposed(statement.if_body.statements, set(defined), inputs)
+                if statement.else_body is not None:
+                    defined = taken & self.exposed(statement.else_body.statements, set(defined), inputs)
+            elif isinstance(statement, WhileNode):
+                inputs.update(reads(statement.condition) - defined)
+                # The body may run any number of times, none included
+                self.exposed(statement.body.statements, set(defined), inputs)
+        return defined
+
+    # Kernels
+
+    def kernel(self, statements, body):
+        """Add the C function running statements, whose C is body; returns
+        its name and the vector and number variables it takes, in order"""
+        name = f"wz_kernel{len(self.functions)}"
+        names = sorted(identifiers(statements))
+        vectors = [variable for variable in names if self.types.get(variable) == VECTOR]
+        numbers = [variable for variable in names if self.types.get(variable) != VECTOR]
+        outputs = assigned(statements)
+        lines = [f"int {name}(wz_vec *wz_vectors, double *wz_numbers)", "{"]
+        for index, variable in enumerate(vectors):
+            lines.append(f"    wz_vec {c_name(variable)} = wz_vectors[{index}];")
+        for index, variable in enumerate(numbers):
+            lines.append(f"    double {c_name(variable)} = wz_numbers[{index}];")
+        lines.extend(["    if (setjmp(wz_error))", "        return 1;"])
+        lines.extend(body)
+        for index, variable in enumerate(vectors):
+            if variable in outputs:
+                lines.append(f"    wz_vectors[{index}] = {c_name(variable)};")
+        for index, variable in enumerate(numbers):
+            if variable in outputs:
+                lines.append(f"    wz_numbers[{index}] = {c_name(variable)};")
+        lines.extend(["    return 0;", "}"])
+        self.functions.append('\n'.join(lines))
+        return name, vectors, numbers
+
+    def source(self):
+        """C source of the library of all the kernels"""
+        return '\n'.join([
+            "#define WZ_KERNEL",
+            "#include <stdio.h>",
+            "#include <stdlib.h>",
+            "#include <math.h>",
+            RUNTIME,
+            *self.functions
+        ])
@@ -0,0 +1,182 @@
+# semantics/parallel_compiler.py
+import re
+from bisect import bisect_left
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser, StatementsNode
+from semantics.semantic_analyzer import SemanticAnalyzer
+from semantics.code_generator import CodeGenerator
+from optimizer.optimizer import Optimizer
+
+# Just enough of the lexer to find top-level statement starts: strings and
+# comments are skipped whole, brackets tracked, and words checked for being
+# assigned to. Everything else is skipped in runs.
+BOUNDARY_PATTERN = re.compile(r"""
+    "[^"]*"
+  | \#[^\n]*
+  | (?P<OPEN>[(\[{])
+  | (?P<CLOSE>[)\]}])
+  | (?P<WORD>[A-Za-z_][A-Za-z0-9_]*)(?P<ASSIGN>\s*=)?
+  | [^"\#()\[\]{}A-Za-z_]+
+""", re.VERBOSE | re.ASCII)
+
+# Work items per worker, so that uneven chunks balance out
+CHUNKS_PER_JOB = 4
+
+def statement_boundaries(source_code):
+    """Return the offsets of some top-level statement starts
+
+    Outside any brackets, a word followed by '=' can only start an
+    assignment and if or while a conditional or loop, so those are safe
+    places to cut the source. Returns None if the source has a '}' with no
+    matching '{', after which the parser ignores the rest of the input.
+    """
+    boundaries = []
+    depth = 0
+    ascii = source_code.isascii()
+    for m in BOUNDARY_PATTERN.finditer(source_code):
+        kind = m.lastgroup
+        if kind is None:
+            continue
+        if kind == 'OPEN':
+            depth += 1
+        elif kind == 'CLOSE':
+            depth -= 1
+            if depth < 0:
+                return None
+        elif depth == 0 and (kind == 'ASSIGN' or m.group(kind) in ('if', 'while')):
+            start = m.start()
+            if ascii or not continues_word(source_code, start):
+                boundaries.append(start)
+    return boundaries
+
+def continues_word(source_code, start):
+    """Whether the word at start is the tail of a longer identifier
+
+    The lexer accepts non-ASCII letters in identifiers, and after one
+    takes digits as part of the identifier too.
+    """
+    index = start - 1
+    while index >= 0 and (source_code[index].isalnum() or source_code[index] == '_'):
+        if source_code[index] >= '\x80':
+            return True
+        index -= 1
+    return False
+
+def compile_chunk(source_code, target, line, column, generate=True):
+    """Parse and generate code for a run of top-level statements
+
+    The chunk starts at line:column of the whole source; padding it to
+    there keeps node positions the same as when compiling it all at once.
+    Returns the statements and their generated lines, which are left empty
+    unless generate is set.
+    """
+    padding = '\n' * (line - 1) + ' ' * (column - 1)
+    tokens = TokenBuffer.from_source(padding + source_code, pack_vectors=True)
+    ast = Parser(tokens).parse()
+    code_generator = CodeGenerator(ast, target)
+    if generate:
+        code_generator.visit(ast)
+    return ast.statements, code_generator.code
+
+class ParallelCompiler:
+    """Compile top-level statements on a pool of worker processes
+
+    The source is split at top-level statement boundaries into chunks,
+    which workers lex, parse and generate code for. Semantic analysis,
+    which depends on statement order through the symbol table, then runs
+    in order over the merged statements. Results are merged in source
+    order, so the output is the same as compiling serially whatever the
+    number of jobs. Sources that fail to compile in chunks are compiled
+    serially, so errors are reported exactly as without jobs.
+
+    Optimizing, scheduling and native kernels need the whole program, as
+    does the C target, so with an optimization level above 0, a schedule,
+    native kernels or C workers only parse, and code is generated from the optimized merged
+    statements.
+    """
+
+    def __init__(self, target_language='python', jobs=2, analyzer_class=SemanticAnalyzer,
+                 optimization_level=0, schedule=None, workers=None, native=None):
+        self.target_language = target_language
+        self.jobs = jobs
+        self.analyzer_class = analyzer_class
+        self.optimization_level = optimization_level
+        self.schedule = schedule
+        self.workers = workers
+        self.native = native
+        self.optimizer = None
+        self.chunks = 0
+
+    def compile(self, source_code):
+        """Return the AST, the SemanticAnalyzer that analyzed it and the
+        generated code"""
+        chunks = self.split(source_code)
+        self.chunks = len(chunks) if chunks else 0
+        if not chunks or self.jobs <= 1:
+            return self.compile_serial(source_code)
+
+        statements = []
+        code = list(CodeGenerator(None, self.target_language).headers.get(self.target_language, []))
+        texts, lines, columns = zip(*chunks)
+        # C declares each variable once, with the type the whole program
+        # gives it, so its code cannot be generated a chunk at a time
+        generate = (self.optimization_level <= 0 and not self.schedule and self.native is None
+                    and self.target_language != 'c')
+        try:
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                results = executor.map(compile_chunk, texts, repeat(self.target_language),
+                                       lines, columns, repeat(generate))
+                for chunk_statements, chunk_code in results:
+                    statements.extend(chunk_statements)
+                    code.extend(chunk_code)
+        except Exception:
+            return self.compile_serial(source_code)
+
+        ast = StatementsNode(statements)
+        semantic_analyzer = self.analyzer_class(ast)
+        semantic_analyzer.analyze()
+        if not generate:
+            return ast, semantic_analyzer, self.generate(ast)
+        return ast, semantic_analyzer, '\n'.join(code)
+
+    def compile_serial(self, source_code):
+        ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+        semantic_analyzer = self.analyzer_class(ast)
+        semantic_analyzer.analyze()
+        return ast, semantic_analyzer, self.generate(ast)
+
+    def generate(self, ast):
+        """Optimize the analyzed AST if asked to, then generate its code"""
+        if self.optimization_level > 0:
+            self.optimizer = Optimizer(self.optimization_level)
+            ast = self.optimizer.optimize(ast)
+        return CodeGenerator(ast, self.target_language, fuse=self.optimization_level > 0,
+                             reuse=self.optimization_level >= 2,
+                             release=self.optimization_level >= 2, schedule=self.schedule,
+                             workers=self.workers, native=self.native).generate()
+
+    def split(self, source_code):
+        """Split the source into (text, line, column) chunks of whole
+        top-level statements, or return None if it cannot be split"""
+        starts = statement_boundaries(source_code)
+        if not starts:
+            return None
+
+        # Cut at the boundaries closest to equal shares of the source
+        count = min(self.jobs * CHUNKS_PER_JOB, len(starts))
+        cuts = [0]
+        for share in range(1, count):
+            index = bisect_left(starts, len(source_code) * share // count)
+            if index < len(starts) and starts[index] > cuts[-1]:
+                cuts.append(starts[index])
+
+        chunks = []
+        for index, cut in enumerate(cuts):
+            end = cuts[index + 1] if index + 1 < len(cuts) else len(source_code)
+            line = source_code.count('\n', 0, cut) + 1
+            column = cut - (source_code.rfind('\n', 0, cut) + 1) + 1
+            chunks.append((source_code[cut:end], line, column))
+        return chunks
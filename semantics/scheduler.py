@@ -0,0 +1,146 @@
+# semantics/scheduler.py
+from optimizer.dependencies import DependencyGraph
+from optimizer.dataflow import kills
+
+# Pools scheduled code can run its tasks on
+SCHEDULES = ('thread', 'process')
+
+# Defined once in each scheduled program
+RUNTIME = '''import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+class _wizuall_unbound:
+    """Passed for the inputs of a task not assigned yet"""
+
+class _WizuallOutput:
+    """Standard output sending the writes of each thread to the buffer it set"""
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        return getattr(self.local, 'buffer', self.stream).write(text)
+
+    def flush(self):
+        getattr(self.local, 'buffer', self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def _wizuall_outputs(names, variables):
+    return {name: variables[name] for name in names if name in variables}
+
+def _wizuall_call(task, arguments):
+    """Run a task, returning what it printed, the variables it assigned
+    and the error it raised"""
+    if not isinstance(sys.stdout, _WizuallOutput):
+        sys.stdout = _WizuallOutput(sys.stdout)
+    output = sys.stdout.local.buffer = io.StringIO()
+    try:
+        variables = task(*arguments)
+        return output.getvalue(), variables, None
+    except Exception as error:
+        return output.getvalue(), None, error
+    finally:
+        del sys.stdout.local.buffer
+
+def _wizuall_schedule(tasks, mode, workers=None):
+    """Run each task (function, inputs, dependencies) on a pool of threads
+    or processes once the tasks it depends on have finished, printing the
+    output of the tasks and raising their errors in program order"""
+    namespace = globals()
+    main = sys.modules.get('__main__')
+    if mode == 'process' and main is not None and vars(main) is namespace:
+        executor = ProcessPoolExecutor(workers)
+    else:
+        # Processes find the tasks by name in the main module
+        executor = ThreadPoolExecutor(workers)
+    remaining = [len(dependencies) for _, _, dependencies in tasks]
+    dependents = [[] for _ in tasks]
+    for index, (_, _, dependencies) in enumerate(tasks):
+        for dependency in dependencies:
+            dependents[dependency].append(index)
+    ready = [index for index, count in enumerate(remaining) if count == 0]
+    results = [None] * len(tasks)
+    running = {}
+    printed = 0
+    stdout = sys.stdout
+    sys.stdout = _WizuallOutput(stdout)
+    try:
+        while printed < len(tasks):
+            for index in ready:
+                function, inputs, _ = tasks[index]
+                arguments = [namespace.get(name, _wizuall_unbound) for name in inputs]
+                running[executor.submit(_wizuall_call, function, arguments)] = index
+            ready = []
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                results[index] = future.result()
+                if results[index][2] is None:
+                    namespace.update(results[index][1])
+                    for dependent in dependents[index]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0:
+                            ready.append(dependent)
+            while printed < len(tasks) and results[printed] is not None:
+                output, _, error = results[printed]
+                stdout.write(output)
+                if error is not None:
+                    raise error
+                printed += 1
+    finally:
+        sys.stdout = stdout
+        executor.shutdown(cancel_futures=True)'''
+
+class StatementScheduler:
+    """Tasks of a program run by scheduled code
+
+    Groups of top-level statements from a DependencyGraph become task
+    functions, taking the variables the group reads as arguments and
+    returning those it assigns. _wizuall_schedule starts each task as soon
+    as the tasks it depends on have finished, so independent statements,
+    such as clustering and classification calls on different data, run
+    concurrently. Each task's output is captured and printed in program
+    order, so scheduled code prints what sequential code would.
+
+    Threads share pyplot's global state, so with a thread pool the
+    statements drawing with it also depend on one another. Processes are
+    only used when the program runs as the main module; otherwise the
+    tasks run on threads.
+    """
+
+    def __init__(self, mode='thread', workers=None):
+        if mode not in SCHEDULES:
+            raise ValueError(f"Unsupported schedule: {mode}")
+        self.mode = mode
+        self.workers = workers
+
+    def tasks(self, statements):
+        """(statements, inputs, unbound inputs, outputs, dependencies) of
+        each task, in program order
+
+        Unbound inputs are the inputs that may not have been assigned when
+        the task starts.
+        """
+        graph = DependencyGraph(statements, shared_plots=self.mode == 'thread')
+        groups = graph.groups()
+        tasks = []
+        bound = set()
+        for (start, stop), dependencies in zip(groups, graph.group_dependencies(groups)):
+            inputs = sorted(graph.inputs(start, stop))
+            tasks.append((statements[start:stop], inputs, [name for name in inputs if name not in bound],
+                          sorted(graph.outputs(start, stop)), dependencies))
+            for statement in statements[start:stop]:
+                bound |= kills(statement)
+        return tasks
+
+    def run_call(self, tasks):
+        """Lines starting the tasks named by tasks"""
+        lines = ["if __name__ == '__main__':", "    _wizuall_schedule(["]
+        for name, inputs, dependencies in tasks:
+            lines.append(f"        ({name}, {tuple(inputs)!r}, {dependencies!r}),")
+        lines.append(f"    ], {self.mode!r}, {self.workers!r})")
+        return lines
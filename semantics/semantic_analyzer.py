@@ -1,8 +1,17 @@
 # semantics/semantic_analyzer.py
+import operator
+
+import numpy as np
+
 from parser.parser import *
 from scanner.lexer import TokenType
 from semantics.symbol_table import SymbolTable
 
+# Vector values are NumPy arrays: float64 for numeric vectors, which
+# arithmetic evaluates with vectorized broadcasting, and object arrays for
+# vectors holding anything else
+NUMBER_TYPES = (int, float, np.number)
+
 class SemanticAnalyzer:
     def __init__(self, ast):
         self.ast = ast
@@ -16,6 +25,16 @@ class SemanticAnalyzer:
         # Return True even if there are errors - we're being lenient in WizuAll
         return True, self.errors  # Changed from: return len(self.errors) == 0, self.errors
     
+    def analyze_stream(self, statements):
+        """Analyze statements one at a time, yielding each once analyzed
+        
+        The symbol table carries over from one statement to the next, so
+        the results match analyzing the whole program at once.
+        """
+        for statement in statements:
+            self.visit(statement)
+            yield statement
+    
     def visit(self, node):
         """Visit a node in the AST"""
         method_name = f"visit_{type(node).__name__}"
@@ -45,7 +64,7 @@ class SemanticAnalyzer:
         if name in self.symbol_table.symbols:
             self.symbol_table.update(name, value)
         else:
-            value_type = 'vector' if isinstance(value, list) else 'scalar'
+            value_type = 'vector' if isinstance(value, np.ndarray) else 'scalar'
             self.symbol_table.define(name, value_type, value)
     
     def visit_IfNode(self, node):
@@ -92,8 +111,9 @@ class SemanticAnalyzer:
         
         if node.op.token_type == TokenType.MINUS:
             # Implement unary minus
-            if isinstance(value, list):  # Vector
-                return [-v for v in value]
+            if isinstance(value, np.ndarray):  # Vector
+                with np.errstate(all='ignore'):
+                    return -value
             else:  # Scalar
                 return -value
     
@@ -113,62 +133,57 @@ class SemanticAnalyzer:
     
     def visit_VectorNode(self, node):
         """Visit vector node"""
-        return [self.visit(element) for element in node.elements]
+        elements = node.elements
+        # Number literals are their own values, without a visit each
+        if all(type(element) is NumberNode for element in elements):
+            return np.array([element.value for element in elements], dtype=np.float64)
+        return self.vector_value([self.visit(element) for element in elements])
+    
+    def visit_PackedVectorNode(self, node):
+        """Visit packed vector node: its array('d') is viewed as a float64
+        array, without copying"""
+        return np.frombuffer(node.values, dtype=np.float64)
+    
+    def vector_value(self, values):
+        """Build a vector value: float64 when every element is a number,
+        otherwise an object array holding the elements as they are"""
+        if all(isinstance(value, NUMBER_TYPES) for value in values):
+            return np.array(values, dtype=np.float64)
+        vector = np.empty(len(values), dtype=object)
+        for index, value in enumerate(values):
+            vector[index] = value
+        return vector
+    
+    def elementwise(self, op, left, right, operation):
+        """Apply op with NumPy broadcasting after checking that vector
+        operands have the same dimension"""
+        if isinstance(left, np.ndarray) and isinstance(right, np.ndarray):
+            if len(left) != len(right):
+                self.errors.append(f"Vector dimensions don't match for {operation}")
+                return left  # Default to left operand on error
+        elif not isinstance(left, np.ndarray) and not isinstance(right, np.ndarray):
+            return op(left, right)
+        with np.errstate(all='ignore'):
+            return op(left, right)
+    
+    def contains_zero(self, vector):
+        """Whether any element of vector is the number zero"""
+        if vector.dtype != object:
+            return bool((vector == 0).any())
+        return any(isinstance(value, NUMBER_TYPES) and value == 0 for value in vector)
     
     # Helper methods for operations
     def add(self, left, right):
         """Addition operation handling both scalars and vectors"""
-        if isinstance(left, list) and isinstance(right, list):
-            # Vector + Vector
-            if len(left) != len(right):
-                self.errors.append("Vector dimensions don't match for addition")
-                return left  # Default to left operand on error
-            return [a + b for a, b in zip(left, right)]
-        elif isinstance(left, list):
-            # Vector + Scalar
-            return [a + right for a in left]
-        elif isinstance(right, list):
-            # Scalar + Vector
-            return [left + b for b in right]
-        else:
-            # Scalar + Scalar
-            return left + right
+        return self.elementwise(operator.add, left, right, 'addition')
     
     def subtract(self, left, right):
         """Subtraction operation handling both scalars and vectors"""
-        if isinstance(left, list) and isinstance(right, list):
-            # Vector - Vector
-            if len(left) != len(right):
-                self.errors.append("Vector dimensions don't match for subtraction")
-                return left  # Default to left operand on error
-            return [a - b for a, b in zip(left, right)]
-        elif isinstance(left, list):
-            # Vector - Scalar
-            return [a - right for a in left]
-        elif isinstance(right, list):
-            # Scalar - Vector
-            return [left - b for b in right]
-        else:
-            # Scalar - Scalar
-            return left - right
+        return self.elementwise(operator.sub, left, right, 'subtraction')
     
     def multiply(self, left, right):
         """Multiplication operation handling both scalars and vectors"""
-        if isinstance(left, list) and isinstance(right, list):
-            # Vector * Vector (element-wise)
-            if len(left) != len(right):
-                self.errors.append("Vector dimensions don't match for multiplication")
-                return left  # Default to left operand on error
-            return [a * b for a, b in zip(left, right)]
-        elif isinstance(left, list):
-            # Vector * Scalar
-            return [a * right for a in left]
-        elif isinstance(right, list):
-            # Scalar * Vector
-            return [left * b for b in right]
-        else:
-            # Scalar * Scalar
-            return left * right
+        return self.elementwise(operator.mul, left, right, 'multiplication')
     
     def divide(self, left, right):
         """Division operation handling both scalars and vectors"""
@@ -177,22 +192,8 @@ class SemanticAnalyzer:
             self.errors.append("Division by zero")
             return left  # Default to left operand on error
         
-        if isinstance(right, list) and 0 in right:
+        if isinstance(right, np.ndarray) and self.contains_zero(right):
             self.errors.append("Division by zero in vector")
             return left  # Default to left operand on error
         
-        if isinstance(left, list) and isinstance(right, list):
-            # Vector / Vector
-            if len(left) != len(right):
-                self.errors.append("Vector dimensions don't match for division")
-                return left  # Default to left operand on error
-            return [a / b for a, b in zip(left, right)]
-        elif isinstance(left, list):
-            # Vector / Scalar
-            return [a / right for a in left]
-        elif isinstance(right, list):
-            # Scalar / Vector
-            return [left / b for b in right]
-        else:
-            # Scalar / Scalar
-            return left / right
\ No newline at end of file
+        return self.elementwise(operator.truediv, left, right, 'division')
@@ -0,0 +1,236 @@
+# semantics/shape_analyzer.py
+import operator
+
+from parser.parser import *
+from scanner.lexer import TokenType
+from semantics.semantic_analyzer import SemanticAnalyzer
+
+SCALAR = 'scalar'
+VECTOR = 'vector'
+
+class Shape:
+    """What is known about a value, without the value itself
+
+    kind is 'scalar' or 'vector', or None when nothing is known. Scalars
+    keep their value while it is a known constant. Vectors keep their
+    dtype ('float64' or 'object', as SemanticAnalyzer would store them),
+    their length (None if unknown) and whether they definitely contain a
+    zero element. Shapes form a lattice: join() gives the least shape
+    covering both, forgetting whatever the two disagree on.
+    """
+    __slots__ = ('kind', 'dtype', 'length', 'value', 'zero')
+
+    def __init__(self, kind=None, dtype=None, length=None, value=None, zero=False):
+        self.kind = kind
+        self.dtype = dtype
+        self.length = length
+        self.value = value
+        self.zero = zero
+
+    @classmethod
+    def scalar(cls, value=None):
+        return cls(SCALAR, value=value)
+
+    @classmethod
+    def vector(cls, length=None, dtype='float64', zero=False):
+        return cls(VECTOR, dtype, length, zero=zero)
+
+    @property
+    def is_zero(self):
+        """Whether this is definitely the scalar zero"""
+        return self.kind == SCALAR and self.value is not None and self.value == 0
+
+    def join(self, other):
+        if self == other:
+            return self
+        if self.kind != other.kind:
+            return UNKNOWN
+        if self.kind == SCALAR:
+            return Shape.scalar(self.value if self.value == other.value else None)
+        return Shape(self.kind,
+                     self.dtype if self.dtype == other.dtype else 'object',
+                     self.length if self.length == other.length else None,
+                     zero=self.zero and other.zero)
+
+    def __eq__(self, other):
+        return (isinstance(other, Shape) and self.kind == other.kind and
+                self.dtype == other.dtype and self.length == other.length and
+                self.value == other.value and self.zero == other.zero)
+
+    def __repr__(self):
+        if self.kind == SCALAR:
+            return f"Shape(scalar, value={self.value})"
+        if self.kind == VECTOR:
+            return f"Shape(vector, {self.dtype}, length={self.length}, zero={self.zero})"
+        return "Shape(unknown)"
+
+UNKNOWN = Shape()
+
+# The value of a variable never assigned to
+UNDEFINED = Shape.scalar(0)
+
+class ShapeAnalyzer(SemanticAnalyzer):
+    """Semantic analysis over shapes instead of values
+
+    Reports the same dimension mismatches and divisions by zero as
+    SemanticAnalyzer wherever they are certain, while the symbol table
+    holds one Shape per variable rather than its contents. Both branches
+    of an if are analyzed from the same state and joined, and while loops
+    are iterated to a fixed point, so the state after a loop covers any
+    number of iterations.
+    """
+
+    def generic_visit(self, node):
+        """Nodes without a visitor, such as strings, have unknown shapes"""
+        return UNKNOWN
+
+    def visit_AssignmentNode(self, node):
+        """Visit assignment node"""
+        shape = self.shape(self.visit(node.expr))
+        self.symbol_table.define(node.identifier.name, shape.kind, shape)
+
+    def visit_IfNode(self, node):
+        """Visit if node: join the states after either branch"""
+        self.visit(node.condition)
+        before = self.snapshot()
+        self.visit(node.if_body)
+        after_if = self.snapshot()
+        self.restore(before)
+        if node.else_body:
+            self.visit(node.else_body)
+        self.restore(self.join_states(after_if, self.snapshot()))
+
+    def visit_WhileNode(self, node):
+        """Visit while node: iterate the body until the state at the loop
+        head stops changing, then analyze it once more from there to
+        report its errors"""
+        state = self.snapshot()
+        errors = self.errors
+        # Errors found on the way to the fixed point may not hold for it
+        self.errors = []
+        try:
+            while True:
+                self.visit(node.condition)
+                self.visit(node.body)
+                joined = self.join_states(state, self.snapshot())
+                if joined == state:
+                    break
+                state = joined
+                self.restore(state)
+        finally:
+            self.errors = errors
+        self.restore(state)
+        self.visit(node.condition)
+        self.visit(node.body)
+        self.restore(state)
+
+    def visit_FunctionCallNode(self, node):
+        """Visit function call node"""
+        super().visit_FunctionCallNode(node)
+        return UNKNOWN
+
+    def visit_BinaryOpNode(self, node):
+        """Visit binary operation node"""
+        return self.shape(super().visit_BinaryOpNode(node))
+
+    def visit_UnaryOpNode(self, node):
+        """Visit unary operation node"""
+        shape = self.visit(node.expr)
+        if node.op.token_type != TokenType.MINUS:
+            return UNKNOWN
+        if shape.kind == SCALAR and shape.value is not None:
+            return Shape.scalar(-shape.value)
+        return shape
+
+    def visit_NumberNode(self, node):
+        """Visit number node"""
+        return Shape.scalar(node.value)
+
+    def visit_IdentifierNode(self, node):
+        """Visit identifier node"""
+        symbol = self.symbol_table.lookup(node.name)
+        if symbol:
+            return symbol.value
+        # In WizuAll, undefined variables get default value of 0
+        self.symbol_table.define(node.name, SCALAR, UNDEFINED)
+        return UNDEFINED
+
+    def visit_VectorNode(self, node):
+        """Visit vector node"""
+        elements = node.elements
+        if all(type(element) is NumberNode for element in elements):
+            return Shape.vector(len(elements), zero=any(element.value == 0 for element in elements))
+        shapes = [self.visit(element) for element in elements]
+        numeric = all(shape.kind == SCALAR for shape in shapes)
+        return Shape.vector(len(shapes), 'float64' if numeric else 'object',
+                            any(shape.is_zero for shape in shapes))
+
+    def visit_PackedVectorNode(self, node):
+        """Visit packed vector node"""
+        return Shape.vector(len(node.values), zero=0 in node.values)
+
+    def shape(self, value):
+        """Treat a missing result, such as a comparison's, as unknown"""
+        return value if isinstance(value, Shape) else UNKNOWN
+
+    def snapshot(self):
+        """Return the shape of every variable"""
+        return {name: symbol.value for name, symbol in self.symbol_table.symbols.items()}
+
+    def restore(self, state):
+        self.symbol_table.symbols.clear()
+        for name, shape in state.items():
+            self.symbol_table.define(name, shape.kind, shape)
+
+    def join_states(self, first, second):
+        """Join two states variable by variable; a variable missing from
+        one of them reads as the default 0 there"""
+        return {name: first.get(name, UNDEFINED).join(second.get(name, UNDEFINED))
+                for name in {**first, **second}}
+
+    def elementwise(self, op, left, right, operation):
+        """Shape of applying op elementwise, reporting certain dimension
+        mismatches"""
+        if left.kind == VECTOR and right.kind == VECTOR:
+            if left.length is not None and right.length is not None and left.length != right.length:
+                self.errors.append(f"Vector dimensions don't match for {operation}")
+                return left  # Default to left operand on error
+            dtype = 'float64' if left.dtype == right.dtype == 'float64' else 'object'
+            return Shape.vector(left.length if left.length == right.length else None, dtype)
+        if left.kind == SCALAR and right.kind == SCALAR:
+            if left.value is None or right.value is None:
+                return Shape.scalar()
+            try:
+                return Shape.scalar(op(left.value, right.value))
+            except ArithmeticError:
+                return Shape.scalar()
+        if left.kind is None or right.kind is None:
+            return UNKNOWN
+
+        # Vector and scalar: zero elements stay zero if op maps 0 to 0
+        if left.kind == VECTOR:
+            vector, zero = left, (0.0, right.value)
+        else:
+            vector, zero = right, (left.value, 0.0)
+        return Shape.vector(vector.length, vector.dtype,
+                            vector.zero and self.maps_to_zero(op, *zero))
+
+    def maps_to_zero(self, op, left, right):
+        if left is None or right is None:
+            return False
+        try:
+            return op(left, right) == 0
+        except ArithmeticError:
+            return False
+
+    def divide(self, left, right):
+        """Division operation, reporting divisors that are certainly zero"""
+        if right.is_zero:
+            self.errors.append("Division by zero")
+            return left  # Default to left operand on error
+
+        if right.kind == VECTOR and right.zero:
+            self.errors.append("Division by zero in vector")
+            return left  # Default to left operand on error
+
+        return self.elementwise(operator.truediv, left, right, 'division')
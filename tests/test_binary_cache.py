@@ -0,0 +1,69 @@
+# tests/test_binary_cache.py
+import unittest
+import sys
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from semantics.code_generator import CodeGenerator
+from cache.binary_cache import BinaryCache
+from runtime.executor import RuntimeExecutor
+
+class TestBinaryCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = BinaryCache(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def store(self, key, size):
+        path = os.path.join(self.temp_dir.name, 'binary')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * size)
+        return self.cache.put(key, path)
+
+    def test_key(self):
+        key = self.cache.key("int main(void) {}", ['-O2'])
+        self.assertEqual(key, self.cache.key("int main(void) {}", ['-O2']))
+        self.assertNotEqual(key, self.cache.key("int main(void) { }", ['-O2']))
+        self.assertNotEqual(key, self.cache.key("int main(void) {}", ['-O3']))
+
+    def test_eviction(self):
+        keys = [self.cache.key(str(i), []) for i in range(3)]
+        for i, key in enumerate(keys):
+            stored = self.store(key, 1000)
+            self.assertTrue(os.access(stored, os.X_OK))
+            past = time.time() - 100 + i
+            os.utime(stored, (past, past))
+        # Running the oldest binary makes it the most recently used
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.cache.max_size = 2500
+        self.cache.evict()
+        self.assertEqual([self.cache.get(key) is not None for key in keys], [True, False, True])
+
+    @unittest.skipUnless(shutil.which('gcc'), "gcc is not installed")
+    def test_executor_skips_gcc(self):
+        code = CodeGenerator(Parser(TokenBuffer.from_source("x = [1, 2]\nprint(x * 2)")).parse(), 'c').generate()
+        self.assertEqual(RuntimeExecutor(code, 'c', binary_cache=self.cache).execute(), "[2. 4.]\n")
+        run = mock.Mock(wraps=subprocess.run)
+        with mock.patch('subprocess.run', run):
+            output = RuntimeExecutor(code, 'c', binary_cache=self.cache).execute()
+        self.assertEqual(output, "[2. 4.]\n")
+        # Only the binary ran
+        self.assertEqual(len(run.call_args_list), 1)
+        self.assertNotEqual(run.call_args_list[0].args[0][0], 'gcc')
+        # Another profile is another binary
+        RuntimeExecutor(code, 'c', profile='native', binary_cache=self.cache).execute()
+        self.assertEqual(self.cache.stats['stores'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# tests/test_buffers.py
+import unittest
+import sys
+import os
+import io
+import contextlib
+import tracemalloc
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from optimizer.optimizer import Optimizer
+from optimizer.buffers import BufferReuse
+from optimizer.dataflow import walk
+from semantics.code_generator import CodeGenerator
+
+def parse(source_code):
+    return Parser(TokenBuffer.from_source(source_code)).parse()
+
+def generate(source_code, reuse=True):
+    ast = Optimizer(2).optimize(parse(source_code))
+    return CodeGenerator(ast, 'python', fuse=True, reuse=reuse).generate()
+
+def reusable(source_code):
+    """Targets of the reusable assignments, in program order"""
+    ast = parse(source_code)
+    analysis = BufferReuse().analyze(ast)
+    return [node.identifier.name for node in walk(ast) if id(node) in analysis.reusable]
+
+def run(code, **variables):
+    namespace = dict(variables)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exec(code, namespace)
+    return namespace, output.getvalue()
+
+class TestBufferReuse(unittest.TestCase):
+    def test_self_updates(self):
+        self.assertEqual(reusable("""
+        acc = [0, 0, 0]
+        x = [1, 2, 3]
+        i = 0
+        while (i < 3) { acc = acc + x * 2  i = i + 1 }
+        print(acc)
+        """), ['acc'])
+
+    def test_live_alias(self):
+        # w still holds the vector acc held
+        self.assertEqual(reusable("acc = [1, 2]\nw = acc\nacc = acc + 1\nprint(w)\nprint(acc)"), [])
+        # Unless it is no longer read
+        self.assertEqual(reusable("acc = [1, 2]\nw = acc\nprint(w)\nacc = acc + 1\nprint(acc)"), ['acc'])
+        # Aliases made in one branch of an if count too
+        self.assertEqual(reusable("""
+        acc = [1, 2]
+        if (k > 0) { w = acc } else { w = [3, 4] }
+        acc = acc * 2
+        print(w)
+        """), [])
+
+    def test_calls(self):
+        # Arguments of calls that may keep them are shared from then on
+        self.assertEqual(reusable("v = [1, 2]\nplot(v)\nv = v + 1\nprint(v)"), [])
+        self.assertEqual(reusable("v = [1, 2]\nvec_max(v)\nv = v + 1\nprint(v)"), ['v'])
+        # Results of calls may be shared
+        self.assertEqual(reusable("v = vec_reverse(x)\nv = v + 1\nprint(v)"), [])
+
+    def test_loop_copy(self):
+        code = generate("""
+        signal = [1, 2, 3, 4]
+        s = signal
+        i = 0
+        while (i < 5) { s = (s + signal) / 2  i = i + 1 }
+        print(s)
+        print(signal)
+        """)
+        lines = code.split('\n')
+        copy = lines.index("s = s.copy() if isinstance(s, np.ndarray) else s")
+        self.assertEqual(lines[copy + 1], "while (i < 5.0):")
+        self.assertIn("    s = _wizuall_fused(_wizuall_kernel0, 1, s, signal, out=s) "
+                      "if _wizuall_reusable(s, s, signal) else ((s + signal) / 2.0)", lines)
+        # Numbers are left alone
+        self.assertIn("    i = (i + 1.0)", lines)
+
+    def test_same_output(self):
+        source_code = """
+        x = [1, 2, 3, 4, 5, 6]
+        acc = x * 0
+        prev = acc
+        s = x
+        i = 0
+        while (i < 6) {
+            prev = acc
+            acc = (acc + x * i) / 2 - -x
+            if (i > 2) { s = s - acc / 3 } else { t = s  s = s * 2 }
+            j = 0
+            while (j < 2) { acc = acc - prev  j = j + 1 }
+            print(prev)
+            i = i + 1
+        }
+        print(acc)
+        print(s)
+        print(t)
+        print(x)
+        """
+        self.assertEqual(run(generate(source_code))[1], run(generate(source_code, reuse=False))[1])
+
+    def test_fallback(self):
+        code = generate("v = v + x\nv = v * 2\nprint(v)")
+        # The result's vector is new when the operands do not fit it
+        for v, x in ((np.ones(3), np.ones(4)), (np.ones(3, dtype=np.int64), 1), (2.0, 3.0)):
+            with self.subTest(v=v, x=x):
+                try:
+                    expected = (v + x) * 2
+                except ValueError:
+                    self.assertRaises(ValueError, run, code, v=v, x=x)
+                    continue
+                self.assertTrue(np.array_equal(run(code, v=v, x=x)[0]['v'], expected))
+
+    def test_no_allocations(self):
+        code = generate("""
+        acc = x * 0
+        i = 0
+        while (i < n) { acc = (acc + x * 0.5) - acc / 8  i = i + 1 }
+        """)
+        length = 1 << 16
+        x = np.ones(length)
+        run(code, n=2.0, x=x)
+        tracemalloc.start()
+        try:
+            run(code, n=50.0, x=x)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # acc and the hoisted x * 0.5 are the only vectors allocated
+        self.assertLess(peak, length * 8 * 3)
+
+    def test_stream(self):
+        source_code = "v = [1, 2]\ni = 0\nwhile (i < 2) { v = v * 2 + 1  i = i + 1 }\nprint(v)"
+        optimizer = Optimizer(2)
+        output = io.StringIO()
+        generator = CodeGenerator(None, 'python', fuse=True, reuse=True)
+        generator.generate_stream(optimizer.optimize_stream(parse(source_code).statements), output)
+        self.assertIn("_wizuall_reusable(v, v)", output.getvalue())
+        self.assertEqual(run(output.getvalue())[1], run(generate(source_code, reuse=False))[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# tests/test_c_backend.py
+import unittest
+import sys
+import os
+import io
+import shutil
+import subprocess
+import tempfile
+import contextlib
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from semantics.code_generator import CodeGenerator
+from runtime.executor import RuntimeExecutor
+
+PROGRAM = """
+x = [1, 2, 3, 4]
+y = x * 2 + 1
+print(y, -y / 3)
+m = vec_max(y)
+print(m, "max", vec_min(x), vec_average(x))
+z = vec_reverse(x)
+a = vec_average(y, 2)
+d = vec_product(x, y)
+e = vec_product(x, y, "element")
+c = vec_product([1, 0, 0], [0, 1, 0], "cross")
+print(z, a, d, e, c)
+n = 0
+big = [0]
+while (n < 11) {
+    big = big + big + 1
+    n = n + 1
+}
+i = 0
+while (i < 3) {
+    i = i + 1
+    x = x + i
+}
+if (vec_min(x) > 3) { print("big", big) } else { print("small") }
+w = vec_max(big, 100) * 0.001
+print(x, i, w, result)
+int = 3
+print(int + 1)
+"""
+
+def generate(source_code, target='c'):
+    return CodeGenerator(Parser(TokenBuffer.from_source(source_code)).parse(), target).generate()
+
+def run_python(code):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exec(code, {'__name__': '__main__'})
+    return output.getvalue()
+
+class TestCBackend(unittest.TestCase):
+    @unittest.skipUnless(shutil.which('gcc'), "gcc is not installed")
+    def test_same_output_as_python(self):
+        code = generate(PROGRAM)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, 'program.c')
+            with open(source, 'w') as f:
+                f.write(code)
+            for flags in (['-O2', '-Wall', '-Werror'], ['-O3', '-fopenmp']):
+                with self.subTest(flags=flags):
+                    binary = os.path.join(tmpdir, 'program')
+                    subprocess.run(['gcc', *flags, source, '-o', binary, '-lm'], check=True)
+                    output = subprocess.run([binary], capture_output=True, text=True, check=True).stdout
+                    self.assertEqual(output, run_python(generate(PROGRAM, 'python')))
+
+    @unittest.skipUnless(shutil.which('gcc'), "gcc is not installed")
+    def test_executor(self):
+        output = RuntimeExecutor(generate("x = [1, 2]\nprint(x * 1.5)"), 'c').execute()
+        self.assertEqual(output, "[1.5 3. ]\n")
+        with self.assertRaises(Exception):
+            # Like NumPy, vectors of other lengths than 1 do not broadcast
+            RuntimeExecutor(generate("x = [1, 2] + [1, 2, 3]"), 'c').execute()
+
+    def test_declarations(self):
+        code = generate("x = [1, 2]\nt = 2\nx = x * t\ny = vec_max(x)\nint = t")
+        # Variables are declared where first used, with their type
+        self.assertIn("    wz_vec x = WZ_EMPTY;", code)
+        self.assertIn("    double t = 2.0;", code)
+        self.assertIn("    wz_vec result = WZ_EMPTY;", code)
+        # C keywords are renamed
+        self.assertIn("    double int_ = t;", code)
+        # A vector is updated in its own buffer by a single loop
+        self.assertIn("double *wz_out = wz_output(&x, wz_n, x.dims);", code)
+        self.assertIn("wz_out[wz_i] = (wz_a0[wz_i] * t);", code)
+        self.assertTrue(code.endswith("    return 0;\n}"))
+
+    def test_variable_types(self):
+        # Assigned a number and a vector, a variable is a vector
+        code = generate("a = 1\nif (a > 0) { a = [1, 2] }")
+        self.assertIn("wz_assign(&a, wz_number(1.0));", code)
+        # Compiling a statement at a time, its type cannot change
+        parser = Parser(TokenBuffer.from_source("a = 1\na = [1, 2]"))
+        with self.assertRaises(ValueError):
+            CodeGenerator(None, 'c').generate_stream(parser.iter_statements(), io.StringIO())
+
+    def test_unsupported(self):
+        for source_code in ("histogram([1, 2], 2)", "x = [[1, 2], [3, 4]]", "x = vec_compare([1], [2])"):
+            with self.subTest(source_code=source_code):
+                with self.assertRaises(ValueError):
+                    generate(source_code)
+
+if __name__ == '__main__':
+    unittest.main()
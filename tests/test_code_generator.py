@@ -6,7 +6,11 @@ import os
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import io
+
 from scanner.lexer import Lexer
+from scanner.stream_lexer import StreamingLexer
+from scanner.token_buffer import TokenBuffer
 from parser.parser import Parser
 from semantics.code_generator import CodeGenerator
 
@@ -91,6 +95,18 @@ class TestCodeGenerator(unittest.TestCase):
         # Check that generated code creates a numpy array
         self.assertIn("v = np.array([1.0, 2.0, 3.0])", generated_code)
     
+    def test_packed_vector_generation(self):
+        source_code = """
+        v = [1, 2.5, 3]
+        w = v * [2, 2, 2]
+        """
+        ast = Parser(TokenBuffer.from_source(source_code, pack_vectors=True)).parse()
+        packed_code = CodeGenerator(ast, 'python').generate()
+        
+        ast = Parser(Lexer(source_code).tokenize()).parse()
+        self.assertEqual(packed_code, CodeGenerator(ast, 'python').generate())
+        self.assertIn("v = np.array([1.0, 2.5, 3.0])", packed_code)
+    
     def test_visualization_function_generation(self):
         source_code = """
         x = [1.0, 2.0, 3.0, 4.0, 5.0]
@@ -105,11 +121,11 @@ class TestCodeGenerator(unittest.TestCase):
         code_generator = CodeGenerator(ast, 'python')
         generated_code = code_generator.generate()
         
-        # Check that generated code includes visualization code
+        # Check that generated code calls the runtime's visualization code
         self.assertIn("x = np.array([1.0, 2.0, 3.0, 4.0, 5.0])", generated_code)
         self.assertIn("y = np.array([10.0, 20.0, 30.0, 40.0, 50.0])", generated_code)
-        self.assertIn("plt.plot", generated_code)
-        self.assertIn("plt.show", generated_code)
+        self.assertIn("import wizuall_runtime", generated_code)
+        self.assertIn("wizuall_runtime.plot(x, y)", generated_code)
     
     def test_c_code_generation(self):
         source_code = """
@@ -151,5 +167,39 @@ class TestCodeGenerator(unittest.TestCase):
         self.assertIn("y <- 20.0", generated_code)
         self.assertIn("z <- (x + y)", generated_code)
 
+    def test_streamed_generation(self):
+        source_code = """
+        x = [1, 2, 3]
+        if (x > 1) { y = x * 2 } else { y = 0 }
+        plot(x, y)
+        z = -y
+        """
+        for target in ('python', 'c', 'r'):
+            with self.subTest(target=target):
+                ast = Parser(Lexer(source_code).tokenize()).parse()
+                expected = CodeGenerator(ast, target).generate()
+                
+                # Statements are parsed and generated one by one
+                parser = Parser(StreamingLexer(io.StringIO(source_code), chunk_size=8).tokens())
+                output = io.StringIO()
+                CodeGenerator(None, target).generate_stream(parser.iter_statements(), output)
+                self.assertEqual(output.getvalue(), expected)
+    
+    def test_streamed_generation_is_incremental(self):
+        written = []
+        
+        class Output:
+            def write(self, text):
+                written.append(text)
+        
+        def statements():
+            for statement in Parser(Lexer("a = 1\nb = 2").tokenize()).iter_statements():
+                yield statement
+                # Its code is written out before the next statement is read
+                self.assertIn(f"{statement.identifier.name} = ", ''.join(written))
+        
+        CodeGenerator(None, 'python').generate_stream(statements(), Output())
+        self.assertTrue(''.join(written).endswith("a = 1.0\nb = 2.0"))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
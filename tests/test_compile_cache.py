@@ -0,0 +1,104 @@
+# tests/test_compile_cache.py
+import unittest
+import sys
+import os
+import time
+import tempfile
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.lexer import Lexer
+from parser.parser import Parser
+from semantics.semantic_analyzer import SemanticAnalyzer
+from semantics.code_generator import CodeGenerator
+from cache.compile_cache import CompileCache, CacheEntry, compiler_version
+
+def compile_entry(source_code, target='python'):
+    ast = Parser(Lexer(source_code).tokenize()).parse()
+    analyzer = SemanticAnalyzer(ast)
+    _, errors = analyzer.analyze()
+    target_code = CodeGenerator(ast, target).generate()
+    return CacheEntry(ast, analyzer.symbol_table.symbols, errors, target_code)
+
+class TestCompileCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = CompileCache(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_hit_and_miss(self):
+        source_code = "x = [1, 2, 3]\ny = x * 2 - -1\nplot(x, y)"
+        key = self.cache.key(source_code, 'python')
+        self.assertIsNone(self.cache.get(key))
+
+        entry = compile_entry(source_code)
+        self.assertTrue(self.cache.put(key, entry))
+        cached = self.cache.get(key)
+
+        self.assertEqual(cached.target_code, entry.target_code)
+        self.assertEqual(str(cached.ast), str(entry.ast))
+        self.assertEqual(cached.symbols['y'].value.tolist(), [3, 5, 7])
+        self.assertEqual(self.cache.stats['hits'], 1)
+        self.assertEqual(self.cache.stats['misses'], 1)
+
+        # Totals persist across cache instances
+        totals = CompileCache(self.temp_dir.name).total_stats()
+        self.assertEqual((totals['hits'], totals['misses'], totals['stores']), (1, 1, 1))
+
+    def test_key(self):
+        key = self.cache.key("x = 1", 'python')
+        self.assertEqual(key, self.cache.key("x = 1", 'python'))
+        self.assertNotEqual(key, self.cache.key("x = 2", 'python'))
+        self.assertNotEqual(key, self.cache.key("x = 1", 'c'))
+        self.assertNotEqual(key, self.cache.key("x = 1", 'python', 'O2'))
+
+    def test_compiler_version(self):
+        # Templates and the runtime are part of the compiler's output
+        compiler_version.cache_clear()
+        opened = mock.Mock(wraps=open)
+        try:
+            with mock.patch('builtins.open', opened):
+                compiler_version()
+        finally:
+            compiler_version.cache_clear()
+        paths = [os.path.relpath(call.args[0], os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                 for call in opened.call_args_list]
+        self.assertIn(os.path.join('visual_primitives', 'viz_functions.py'), paths)
+        self.assertIn(os.path.join('wizuall_runtime', 'primitives.py'), paths)
+
+    def test_lru_eviction(self):
+        entries = {}
+        for i in range(3):
+            source_code = f"x = [{', '.join(['1'] * 50)}]\ny = {i}"
+            key = self.cache.key(source_code, 'python')
+            self.cache.put(key, compile_entry(source_code))
+            entries[i] = key
+            # Give each entry a distinct access time
+            past = time.time() - 100 + i
+            os.utime(self.cache.path(key), (past, past))
+
+        # Using the oldest entry makes it the most recently used
+        self.assertIsNotNone(self.cache.get(entries[0]))
+
+        self.cache.max_size = self.cache.size() - 1
+        self.cache.evict()
+        self.assertEqual(self.cache.stats['evictions'], 1)
+        self.assertFalse(os.path.exists(self.cache.path(entries[1])))
+        self.assertTrue(os.path.exists(self.cache.path(entries[0])))
+        self.assertTrue(os.path.exists(self.cache.path(entries[2])))
+
+    def test_corrupt_entry_is_a_miss(self):
+        key = self.cache.key("x = 1", 'python')
+        self.cache.put(key, compile_entry("x = 1"))
+        with open(self.cache.path(key), 'wb') as f:
+            f.write(b'not a pickle')
+
+        self.assertIsNone(self.cache.get(key))
+        self.assertFalse(os.path.exists(self.cache.path(key)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# tests/test_fast_lexer.py
+import unittest
+import sys
+import os
+import io
+import mmap
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from array import array
+
+from scanner.lexer import Lexer, TokenType
+from scanner.fast_lexer import FastLexer
+from scanner.stream_lexer import StreamingLexer
+
+def token_tuples(tokens):
+    return [(t.token_type, t.value, t.line, t.column) for t in tokens]
+
+class TestFastLexer(unittest.TestCase):
+    def assertSameTokens(self, source_code):
+        expected = token_tuples(Lexer(source_code).tokenize())
+        actual = token_tuples(FastLexer(source_code).tokenize())
+        self.assertEqual(actual, expected)
+
+    def test_matches_reference_lexer(self):
+        sources = [
+            "",
+            "x",
+            "x\n",
+            "  \n\n",
+            "x = 10 + 20",
+            "v = [1, 2.5, .5, 3.]",
+            "if (x > 10) { y = 20 } else { y = 30 }",
+            "while (i < 10) {\n\tj = i * 2\n\ti = i - 1 / 2\n}\n",
+            "# comment only",
+            "a = 1 # trailing\nb = 2\n#c",
+            'print("hello\nworld")',
+            "1.2.3",
+            "plot(x, y)\r\nscatter(x, z)",
+        ]
+        for source_code in sources:
+            with self.subTest(source_code=source_code):
+                self.assertSameTokens(source_code)
+
+    def test_sample_program(self):
+        sample = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample.wzl')
+        with open(sample, 'r') as f:
+            self.assertSameTokens(f.read())
+
+    def test_non_ascii_falls_back(self):
+        for source_code in ["café = 1", "été = x2²", "x = ٣ + 1"]:
+            with self.subTest(source_code=source_code):
+                self.assertSameTokens(source_code)
+
+    def test_errors_match(self):
+        for source_code in ["x = 1 $ 2", 'x = "open', "x = 1\ny = @"]:
+            with self.subTest(source_code=source_code):
+                with self.assertRaises(Exception) as expected:
+                    Lexer(source_code).tokenize()
+                with self.assertRaises(Exception) as actual:
+                    FastLexer(source_code).tokenize()
+                self.assertEqual(str(actual.exception), str(expected.exception))
+    def test_packed_vectors(self):
+        source_code = "x = [1, -2.5,\n .5 ] + [a, 1]\ny = [3]"
+        tokens = FastLexer(source_code, pack_vectors=True).tokenize()
+        types = [t.token_type for t in tokens]
+        self.assertEqual(types.count(TokenType.VECTOR), 2)
+        self.assertEqual(types.count(TokenType.NUMBER), 1)
+        self.assertEqual(tokens[2].value, array('d', [1.0, -2.5, 0.5]))
+        self.assertEqual((tokens[2].line, tokens[2].column), (1, 5))
+        self.assertEqual((tokens[3].line, tokens[3].column), (2, 7))
+
+class TestStreamingLexer(unittest.TestCase):
+    source_code = (
+        "# header comment\n"
+        "x = [1.25, 22.5, 333, .5]\n"
+        "café = x * 2\n"
+        'print("multi\nline string")\n'
+        "while (i < 10) { i = i + 1 }\n"
+    )
+
+    def test_every_chunk_boundary(self):
+        expected = token_tuples(Lexer(self.source_code).tokenize())
+        for chunk_size in range(1, len(self.source_code) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                lexer = StreamingLexer(io.StringIO(self.source_code), chunk_size)
+                self.assertEqual(token_tuples(lexer.tokenize()), expected)
+
+    def test_binary_and_mmap_sources(self):
+        expected = token_tuples(Lexer(self.source_code).tokenize())
+        data = self.source_code.encode('utf-8')
+
+        # Chunk size 3 splits the two-byte 'é' across reads
+        lexer = StreamingLexer(io.BytesIO(data), 3)
+        self.assertEqual(token_tuples(lexer.tokenize()), expected)
+
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                lexer = StreamingLexer(mapped, 7)
+                self.assertEqual(token_tuples(lexer.tokenize()), expected)
+
+    def test_tokens_are_lazy(self):
+        # An error near the end of the source is only raised once reached
+        tokens = StreamingLexer(io.StringIO("x = 1\n" * 100 + "$"), 16).tokens()
+        first = next(tokens)
+        self.assertEqual((first.value, first.line, first.column), ('x', 1, 1))
+        with self.assertRaises(Exception) as context:
+            list(tokens)
+        self.assertIn("Invalid character '$' at 101:1", str(context.exception))
+
+    def test_packed_vector_across_chunks(self):
+        source_code = "v = [" + ", ".join(str(i) for i in range(200)) + "]\nw = v\n"
+        expected = token_tuples(FastLexer(source_code, pack_vectors=True).tokenize())
+        for chunk_size in (1, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                lexer = StreamingLexer(io.StringIO(source_code), chunk_size, pack_vectors=True)
+                self.assertEqual(token_tuples(lexer.tokenize()), expected)
+        self.assertEqual(len(expected), 7)
+
+if __name__ == '__main__':
+    unittest.main()
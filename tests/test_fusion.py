@@ -0,0 +1,94 @@
+# tests/test_fusion.py
+import unittest
+import sys
+import os
+import io
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from semantics.code_generator import CodeGenerator
+from semantics.fusion import BLOCK_SIZE
+
+def generate(source_code, fuse=True):
+    ast = Parser(TokenBuffer.from_source(source_code)).parse()
+    return CodeGenerator(ast, 'python', fuse).generate()
+
+def run(code, **variables):
+    namespace = dict(variables)
+    exec(code, namespace)
+    return namespace
+
+class TestElementwiseFusion(unittest.TestCase):
+    def test_kernels(self):
+        code = generate("""
+        a = x + y
+        while (i < 3) { z = ((x + y) * 2) - w  i = i + 1 }
+        q = -(x * y) / (w - x + 1)
+        r = ((u + v) * 2) - t
+        """)
+        lines = code.split('\n')
+        # Single operators are left alone
+        self.assertIn("a = (x + y)", lines)
+        self.assertIn("    z = _wizuall_fused(_wizuall_kernel0, 0, x, y, w) if _wizuall_fusable(x, y, w) "
+                      "else (((x + y) * 2.0) - w)", lines)
+        # Definitions come before the top-level statement using them
+        self.assertLess(lines.index("def _wizuall_kernel0(out, tmp, v0, v1, v2):"),
+                        lines.index("while (i < 3.0):"))
+        start = lines.index("def _wizuall_kernel1(out, tmp, v0, v1, v2):")
+        self.assertEqual(lines[start + 1:start + 6], [
+            "    np.multiply(v0, v1, out=out)",
+            "    np.negative(out, out=out)",
+            "    np.subtract(v2, v0, out=tmp[0])",
+            "    np.add(tmp[0], 1.0, out=tmp[0])",
+            "    np.divide(out, tmp[0], out=out)",
+        ])
+        # Expressions of the same form share a kernel
+        self.assertIn("r = _wizuall_fused(_wizuall_kernel0, 0, u, v, t) if _wizuall_fusable(u, v, t) "
+                      "else (((u + v) * 2.0) - t)", lines)
+        self.assertEqual(code.count("def _wizuall_fused("), 1)
+
+    def test_not_fused(self):
+        code = generate('a = (x + [1, 2]) * 2\nb = (x + "s") * 2\nc = (x + y) * 2', fuse=False)
+        self.assertNotIn("_wizuall", code)
+        code = generate('a = (x + [1, 2]) * 2\nb = (x + "s") * 2')
+        self.assertNotIn("_wizuall", code)
+
+    def test_same_results(self):
+        source_code = """
+        r = ((x + y) * 2) - w / (y + 1)
+        s = -(x - k * 3) * (y + w) / 7
+        t = (k + 1) * x - -y
+        """
+        fused, unfused = generate(source_code), generate(source_code, fuse=False)
+        rng = np.random.default_rng(0)
+        for length in (BLOCK_SIZE * 3 + 17, 100):
+            x, y, w = (rng.normal(size=length) for _ in range(3))
+            results = run(fused, x=x, y=y, w=w, k=2.5)
+            expected = run(unfused, x=x, y=y, w=w, k=2.5)
+            for name in ('r', 's', 't'):
+                self.assertTrue(np.array_equal(results[name], expected[name]))
+
+    def test_fallback(self):
+        code = generate("r = (x + y) * 2")
+        # Object vectors and scalars are evaluated as written
+        namespace = run(code, x=np.ones(BLOCK_SIZE, dtype=object), y=2.0)
+        self.assertEqual(namespace['r'].dtype, object)
+        self.assertEqual(namespace['r'][0], 6.0)
+        self.assertEqual(run(code, x=1.0, y=2.0)['r'], 6.0)
+        with self.assertRaises(ValueError):
+            run(code, x=np.zeros(BLOCK_SIZE), y=np.zeros(BLOCK_SIZE + 1))
+
+    def test_stream(self):
+        source_code = "a = (x + y) * 2\nwhile (i < 2) { b = (a - x) / 3 - y  i = i + 1 }\nc = (a + y) * 2"
+        ast = Parser(TokenBuffer.from_source(source_code)).parse()
+        output = io.StringIO()
+        CodeGenerator(None, 'python', fuse=True).generate_stream(ast.statements, output)
+        self.assertEqual(output.getvalue(), generate(source_code))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# tests/test_incremental.py
+import unittest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser.incremental import IncrementalParser, TextEdit
+from parser.parser import ASTNode
+
+SOURCE = """x = 1
+y = x + 2 * 3
+v = [1, 2, 3]
+if (x > 1) { z = 2 } else { z = 3 }
+while (x < 3) { x = x + 1 }
+s = "text" # comment
+plot(v, y)
+"""
+
+def apply_edits(source_code, edits):
+    for edit in sorted(edits, key=lambda edit: edit.start, reverse=True):
+        source_code = source_code[:edit.start] + edit.text + source_code[edit.end:]
+    return source_code
+
+def positions(node):
+    """Types and positions of the nodes of a tree, in order"""
+    if isinstance(node, list):
+        return [position for child in node for position in positions(child)]
+    if not isinstance(node, ASTNode):
+        return []
+    slots = type(node).__slots__
+    found = [(type(node).__name__, node.line, node.column)] if 'line' in slots else []
+    for slot in slots:
+        if slot not in ('line', 'column'):
+            found.extend(positions(getattr(node, slot)))
+    return found
+
+def token_tuples(tokens):
+    return [(t.token_type, t.value, t.line, t.column) for t in tokens]
+
+class TestIncrementalParser(unittest.TestCase):
+    def assertSameAsFullParse(self, source_code, edits, pack_vectors=False):
+        incremental = IncrementalParser(pack_vectors)
+        result = incremental.reparse(incremental.parse(source_code), edits)
+        full = IncrementalParser(pack_vectors).parse(apply_edits(source_code, edits))
+        self.assertEqual(result.source_code, full.source_code)
+        self.assertEqual(str(result.ast), str(full.ast))
+        self.assertEqual(positions(result.ast), positions(full.ast))
+        self.assertEqual(token_tuples(result.tokens), token_tuples(full.tokens))
+        self.assertEqual(result.spans, full.spans)
+        return incremental
+
+    def edit(self, old, new, occurrence=0):
+        start = -1
+        for _ in range(occurrence + 1):
+            start = SOURCE.index(old, start + 1)
+        return TextEdit(start, start + len(old), new)
+
+    def test_identical_to_full_parse(self):
+        edits = [
+            [self.edit("2 * 3", "(2 - 4) / 5")],
+            [self.edit("y = x + 2 * 3\n", "")],
+            [self.edit("", "w = 0\n")],
+            [TextEdit(len(SOURCE), len(SOURCE), "q = v * 2\n")],
+            [self.edit("z = 2", "z = 2\nt = 4")],
+            [self.edit("1", "10"), self.edit("plot", "histogram")],
+            [self.edit('"text"', '"a # b"')],
+            [self.edit("# comment", "")],
+            [self.edit("[1, 2, 3]", "[1, x, 3]")],
+            [self.edit(" else { z = 3 }", "")],
+        ]
+        for pack_vectors in (False, True):
+            for edit_list in edits:
+                with self.subTest(edits=[(e.start, e.end, e.text) for e in edit_list],
+                                  pack_vectors=pack_vectors):
+                    self.assertSameAsFullParse(SOURCE, edit_list, pack_vectors)
+
+    def test_reuses_untouched_statements(self):
+        incremental = IncrementalParser()
+        previous = incremental.parse(SOURCE)
+        result = incremental.reparse(previous, [self.edit("2 * 3", "4")])
+        self.assertEqual(incremental.reparsed_statements, 1)
+        self.assertEqual(incremental.relexed_tokens, 1)
+        old, new = previous.ast.statements, result.ast.statements
+        self.assertIs(new[0], old[0])
+        self.assertIsNot(new[1], old[1])
+        for index in range(2, len(old)):
+            self.assertIs(new[index], old[index])
+
+    def test_moved_positions(self):
+        # Statements after the edit, on its line or later ones, are reused
+        # at their new positions
+        source_code = "a = 1 b = a + 2\nc = [b, 3] d = -c\n"
+        for old, new in (("1", "100"), ("1", "1\n\n"), ("a = 1 ", ""), ("2\nc", "2 c")):
+            start = source_code.index(old)
+            with self.subTest(old=old, new=new):
+                incremental = self.assertSameAsFullParse(source_code, [TextEdit(start, start + len(old), new)])
+        self.assertLess(incremental.reparsed_statements, 4)
+
+    def test_edit_merging_statements(self):
+        # Removing a newline makes two statements one
+        incremental = self.assertSameAsFullParse(SOURCE, [self.edit("1\ny =", "1 +")])
+        self.assertEqual(incremental.reparsed_statements, 1)
+
+    def test_edit_inside_block(self):
+        self.assertSameAsFullParse(SOURCE, [self.edit("x + 1", "x + 2")])
+        self.assertSameAsFullParse(SOURCE, [self.edit("{ z = 2 }", "{ z = 2 w = 4 }")])
+
+    def test_errors_match_full_parse(self):
+        cases = [
+            [self.edit('"text"', '"text')],
+            [self.edit("x = 1", "x = @")],
+            [self.edit("plot(v, y)", "plot(v, y")],
+        ]
+        for edit_list in cases:
+            with self.subTest(edits=[(e.start, e.end, e.text) for e in edit_list]):
+                with self.assertRaises(Exception) as full:
+                    IncrementalParser().parse(apply_edits(SOURCE, edit_list))
+                incremental = IncrementalParser()
+                previous = incremental.parse(SOURCE)
+                with self.assertRaises(Exception) as partial:
+                    incremental.reparse(previous, edit_list)
+                self.assertEqual(str(partial.exception), str(full.exception))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# tests/test_liveness.py
+import unittest
+import sys
+import os
+import io
+import contextlib
+import tracemalloc
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from optimizer.liveness import Liveness
+from semantics.code_generator import CodeGenerator
+from semantics.semantic_analyzer import SemanticAnalyzer
+from optimizer.optimizer import Optimizer
+
+def parse(source_code):
+    return Parser(TokenBuffer.from_source(source_code)).parse()
+
+def releases(source_code):
+    """Variables deleted and cleared after each top-level statement"""
+    ast = parse(source_code)
+    liveness = Liveness().analyze(ast.statements)
+    return [(liveness.deleted.get(id(statement), []), liveness.cleared.get(id(statement), []))
+            for statement in ast.statements]
+
+def generate(source_code, release=True, target='python'):
+    return CodeGenerator(parse(source_code), target, release=release).generate()
+
+def run(code):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exec(code, {})
+    return output.getvalue()
+
+class TestLiveness(unittest.TestCase):
+    def test_last_uses(self):
+        self.assertEqual(releases("""
+        a = [1, 2]
+        b = a * 2
+        c = b + 1
+        print(b)
+        print(c)
+        """), [([], []), (['a'], []), ([], []), (['b'], []), ([], [])])
+
+    def test_reassigned(self):
+        # a is dead between its last read and its next assignment
+        self.assertEqual(releases("""
+        a = [1, 2]
+        print(a)
+        a = [3, 4]
+        print(a)
+        b = 1
+        """), [([], []), (['a'], []), ([], []), (['a'], []), ([], [])])
+        # but not when it is only assigned on one branch
+        self.assertEqual(releases("""
+        a = [1, 2]
+        if (k > 0) { a = [3, 4] }
+        print(a)
+        b = 1
+        """), [([], []), ([], []), (['a'], []), ([], [])])
+
+    def test_loops(self):
+        # Variables the loop uses are kept until it ends; t may never
+        # have been assigned
+        self.assertEqual(releases("""
+        v = [1, 2]
+        i = 0
+        while (i < 3) { t = v * i  i = i + 1 }
+        print(v)
+        b = 1
+        """), [([], []), ([], []), (['i'], ['t']), (['v'], []), ([], [])])
+
+    def test_templates(self):
+        # The results primitives assign are released too
+        self.assertEqual(releases("""
+        v = [3, 1, 2]
+        vec_reverse(v)
+        plot(result)
+        b = 1
+        """), [([], []), (['v'], []), (['result'], []), ([], [])])
+
+    def test_generated(self):
+        source_code = """
+        a = [1, 2, 3]
+        b = a * 2
+        i = 0
+        while (i < 2) { t = b + i  i = i + 1 }
+        print(t)
+        c = b / 2
+        print(c)
+        """
+        lines = generate(source_code).split('\n')
+        self.assertEqual(lines[lines.index("b = (a * 2.0)") + 1], "del a")
+        self.assertEqual(lines[lines.index("print(t)") + 1], "t = None")
+        self.assertEqual(lines[-2:], ["del b", "print(c)"])
+        self.assertEqual(run('\n'.join(lines)), run(generate(source_code, release=False)))
+        lines = generate(source_code, target='r').split('\n')
+        self.assertIn("rm(a)", lines)
+        self.assertIn("t <- NULL", lines)
+        self.assertNotIn("del", generate(source_code, target='c'))
+
+    def test_peak_memory(self):
+        # Each vector only depends on the previous one
+        vector = ', '.join(str(i) for i in range(20000))
+        source_code = '\n'.join([f"v0 = [{vector}]"] +
+                                [f"v{i} = v{i - 1} * 2 + 1" for i in range(1, 20)] +
+                                ["print(v19)"])
+        peaks = []
+        for release in (False, True):
+            program = compile(generate(source_code, release), '<liveness>', 'exec')
+            tracemalloc.start()
+            try:
+                run(program)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        self.assertLess(peaks[1] * 4, peaks[0])
+
+    def test_optimization_levels(self):
+        programs = [
+            # Released after print(c), then updated in place
+            """
+            a = [1, 2, 3, 4]
+            c = [5, 1, 6, 6]
+            k = 0
+            while (k < 1) { a = a + 1  k = k + 1 }
+            print(c)
+            c = (a - 3) * 2
+            print(c)
+            """,
+            """
+            signal = [1, 2, 3]
+            s = signal
+            i = 0
+            while (i < 3) { s = s * 0.5 + signal  i = i + 1 }
+            print(s)
+            signal = (s - 1) * 2
+            print(signal)
+            """
+        ]
+        for source_code in programs:
+            outputs = []
+            for level in (0, 2):
+                ast = parse(source_code)
+                SemanticAnalyzer(ast).analyze()
+                code = CodeGenerator(Optimizer(level).optimize(ast), 'python', fuse=level > 0,
+                                     reuse=level >= 2, release=level >= 2).generate()
+                outputs.append(run(code))
+            with self.subTest(source_code=source_code):
+                self.assertEqual(outputs[0], outputs[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# tests/test_native.py
+import unittest
+import sys
+import os
+import gc
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from semantics.code_generator import CodeGenerator
+from semantics.semantic_analyzer import SemanticAnalyzer
+from optimizer.optimizer import Optimizer
+from runtime.executor import RuntimeExecutor
+
+PROGRAM = """
+signal = [1, 2, 3, 4, 5, 6, 7, 8]
+s = signal
+i = 0
+while (i < 40) {
+    s = s * 0.5 + signal * 0.25
+    if (i > 30) { peak = vec } else { peak = i * 2 }
+    i = i + 1
+}
+print(s, i, peak)
+m = vec_max(s)
+k = 0
+while (k < 3) { k = k + m }
+print(k, result)
+"""
+
+def generate(source_code, native=('-O2',)):
+    native = list(native) if native is not None else None
+    return CodeGenerator(Parser(TokenBuffer.from_source(source_code)).parse(), 'python', native=native).generate()
+
+@unittest.skipUnless(shutil.which('gcc'), "gcc is not installed")
+class TestNative(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {'WIZUALL_CACHE_DIR': self.temp_dir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_same_output_as_python(self):
+        source_code = "vec = [3, 1, 2]\n" + PROGRAM
+        code = generate(source_code)
+        self.assertEqual(code.count("native.run("), 2)
+        self.assertEqual(RuntimeExecutor(code).execute(), RuntimeExecutor(generate(source_code, None)).execute())
+
+    def test_update_borrowed(self):
+        # The kernel updates a NumPy array it reads in place, which it must
+        # neither write nor free
+        source_code = ("a = [1, 2, 3, 4]\nb = a\nprint(a)\ni = 0\n"
+                       "while (i < 3) { a = (-(a / 2) / 2) i = i + 1 }\nprint(a, b)")
+        code = generate(source_code)
+        self.assertEqual(code.count("native.run("), 1)
+        for _ in range(3):
+            self.assertEqual(RuntimeExecutor(code, in_process=True).execute(),
+                             RuntimeExecutor(generate(source_code, None), in_process=True).execute())
+
+    def test_optimized(self):
+        # d is released inside the kernel's run and assigned again in it
+        source_code = "i = 0\nwhile (i < 3) { i = i + 1 }\nd = [i, 1]\ne = d * 2\nd = [i, 2]\nprint(d, e)"
+        outputs = []
+        for level, native in ((0, None), (2, ['-O2'])):
+            ast = Parser(TokenBuffer.from_source(source_code)).parse()
+            SemanticAnalyzer(ast).analyze()
+            code = CodeGenerator(Optimizer(level).optimize(ast), 'python', fuse=level > 0, reuse=level >= 2,
+                                 release=level >= 2, native=native).generate()
+            outputs.append(RuntimeExecutor(code, in_process=True).execute())
+        self.assertIn("native.run(", code)
+        self.assertEqual(outputs[1], outputs[0])
+
+    def test_fallback(self):
+        # An integer array is no float64 one, so the loop runs in Python
+        code = generate("i = 0\nwhile (i < 3) { x = x * 2 i = i + 1 }\nprint(x)")
+        code = code.replace("\nif not", "\nx = np.array([1, 2])\nif not", 1)
+        self.assertEqual(RuntimeExecutor(code, in_process=True).execute(), "[ 8. 16.]\n")
+
+    def test_error(self):
+        code = generate("a = [1, 2, 3]\nb = [1, 2]\ni = 0\nwhile (i < 2) { a = a + b i = i + 1 }")
+        with self.assertRaises(Exception) as error:
+            RuntimeExecutor(code, in_process=True).execute()
+        self.assertIn("could not be broadcast", str(error.exception))
+
+    def test_arrays(self):
+        import wizuall_runtime.native as native
+        code = generate("x = [0, 1]\nprint(x)\ni = 0\nwhile (i < 2) { y = x * 2 i = i + 1 }\nprint(y)")
+        source = code.split("r'''", 1)[1].split("'''", 1)[0]
+        library = native.load(source, ['-O2'])
+        x = np.arange(4.0)
+        namespace = {'x': x}
+        self.assertTrue(native.run(library, 'wz_kernel0', namespace, ('x', 'y'), ('i',), ('x',)))
+        # Inputs are read in place and kept, results adopted by NumPy
+        self.assertIs(namespace['x'], x)
+        np.testing.assert_array_equal(namespace['y'], x * 2)
+        self.assertEqual(namespace['i'], 2.0)
+        # The buffer is freed with the last array using it
+        with mock.patch.object(library, 'wz_free_data') as free:
+            native.run(library, 'wz_kernel0', namespace, ('x', 'y'), ('i',), ('x',))
+            view = namespace.pop('y')[1:]
+            gc.collect()
+            free.assert_not_called()
+            del view
+            gc.collect()
+            free.assert_called_once()
+        # Missing inputs and matrices are left to Python
+        self.assertFalse(native.run(library, 'wz_kernel0', {}, ('x', 'y'), ('i',), ('x',)))
+        self.assertFalse(native.run(library, 'wz_kernel0', {'x': np.ones((2, 2))}, ('x', 'y'), ('i',), ('x',)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+# tests/test_optimizer.py
+import unittest
+import sys
+import os
+import io
+import contextlib
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from semantics.code_generator import CodeGenerator
+from optimizer.optimizer import Optimizer
+
+def optimize(source_code, level=1, pack_vectors=True):
+    ast = Parser(TokenBuffer.from_source(source_code, pack_vectors)).parse()
+    optimizer = Optimizer(level)
+    return optimizer, CodeGenerator(optimizer.optimize(ast), 'python').generate()
+
+def body(code):
+    """Generated code without the headers"""
+    return code.split('\n\n', 1)[1]
+
+def run(code):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exec(code, {})
+    return output.getvalue()
+
+class TestOptimizer(unittest.TestCase):
+    def test_level_zero_is_unchanged(self):
+        source_code = "x = 2 * 3\ny = x + 1"
+        _, code = optimize(source_code, 0)
+        self.assertIn("x = (2.0 * 3.0)", code)
+        self.assertIn("y = (x + 1.0)", code)
+
+    def test_fold_and_propagate(self):
+        optimizer, code = optimize("""
+        x = 2 * 3 - -1
+        v = [1, 2, 3]
+        w = v * x / 2
+        u = -w + [1, 1, 1]
+        big = [1, 2] / 0
+        s = y + x
+        """)
+        self.assertEqual(body(code).split('\n'), [
+            "x = 7.0",
+            "v = np.array([1.0, 2.0, 3.0])",
+            "w = np.array([3.5, 7.0, 10.5])",
+            "u = np.array([-2.5, -6.0, -9.5])",
+            # Division by zero is left to fail at run time
+            "big = (np.array([1.0, 2.0]) / 0.0)",
+            "s = (y + 7.0)",
+        ])
+        self.assertEqual(optimizer.stats['propagated'], 2)
+
+    def test_same_code_unpacked(self):
+        source_code = "v = [1, 2, 3]\nw = v * 2 + v"
+        self.assertEqual(optimize(source_code, pack_vectors=False)[1], optimize(source_code)[1])
+
+    def test_identifier_arguments_kept(self):
+        # The R templates use identifier arguments as parameter names
+        ast = Parser(TokenBuffer.from_source("v = [1, 2]\nplot(v)")).parse()
+        code = CodeGenerator(Optimizer(1).optimize(ast), 'r').generate()
+        self.assertIn("plot_data <- function(v) {", code)
+        _, code = optimize("n = 5\nv = [1, 2]\nhistogram(v, n)\nhistogram(v, n + 1)")
+        self.assertIn("wizuall_runtime.histogram(v, n)", code)
+        self.assertIn("wizuall_runtime.histogram(v, 6.0)", code)
+
+    def test_control_flow(self):
+        _, code = optimize("""
+        i = 0
+        k = 3
+        while (i < 10) { j = i * 2  i = i + 1  m = k * 2 }
+        if (c > 0) { a = 1  b = 2 } else { a = 1  b = 3 }
+        r = i + k + a + b
+        """)
+        lines = body(code).split('\n')
+        self.assertIn("while (i < 10.0):", lines)
+        self.assertIn("    j = (i * 2.0)", lines)
+        self.assertIn("    m = 6.0", lines)
+        # i changes in the loop and b differs between branches
+        self.assertIn("r = (((i + 3.0) + 1.0) + b)", lines)
+        _, code = optimize("if (c > 0) { v = [1, 2] } else { v = [1, 2] }\nw = v * 2")
+        self.assertIn("w = np.array([2.0, 4.0])", code)
+
+    def test_template_globals_are_killed(self):
+        _, code = optimize("result = 1\nv = [1, 2]\nvec_max(v)\nr = result + 1")
+        self.assertIn("r = (result + 1.0)", code)
+
+    def test_dead_code(self):
+        optimizer, code = optimize("""
+        a = 1
+        b = a + 1
+        v = [1, 2, 3]
+        t = 0
+        while (t < 3) { u = t  t = t + 1 }
+        if (2 > 1) { c = b } else { c = 0 }
+        while (1 < 0) { d = 1 }
+        histogram(v, c)
+        """, 2)
+        self.assertEqual(body(code).split('\n')[:5], [
+            "v = np.array([1.0, 2.0, 3.0])",
+            "t = 0.0",
+            "while (t < 3.0):",
+            "    t = (t + 1.0)",
+            "c = 2.0",
+        ])
+        self.assertEqual(optimizer.stats['eliminated'], 5)
+
+    def test_dead_code_errors(self):
+        # Dead assignments that may raise are kept for their errors
+        for source_code, error in (("t = 0 / 0\nt = 1\nprint(t)", ZeroDivisionError),
+                                   ("t = 1 / s\nt = 1\nprint(t)", NameError),
+                                   ("a = [1, 2]\nb = [1, 2, 3]\nc = a + b\nc = 1\nprint(c)", ValueError)):
+            with self.subTest(source_code=source_code):
+                for level in (0, 2):
+                    with self.assertRaises(error):
+                        run(optimize(source_code, level)[1])
+        optimizer, _ = optimize("t = s / 2 - 1\nt = 1\nprint(t)", 2)
+        self.assertEqual(optimizer.stats['eliminated'], 1)
+
+    def test_empty_blocks(self):
+        _, code = optimize("t = 0\nwhile (t < 3) { u = t }\nif (t > 1) { u = 1 }", 2)
+        # t is never assigned in the loop, so its condition folds too
+        self.assertIn("while (0.0 < 3.0):\n    pass", code)
+        self.assertNotIn("if", code)
+
+    def test_primitives_output_unchanged(self):
+        source_code = """
+        x = [1, 2, 3, 4, 5, 6]
+        y = x * 2 - 1
+        avg = vec_average(x)
+        vec_max(y)
+        m = vec_min(y, 2)
+        r = vec_reverse(x)
+        z = vec_average(y, 3)
+        print(result)
+        """
+        _, unoptimized = optimize(source_code, 0)
+        optimizer, optimized = optimize(source_code, 2)
+        self.assertEqual(optimizer.stats['evaluated'], 5)
+        self.assertNotIn("wizuall_runtime.vec_", optimized)
+        self.assertEqual(run(optimized), run(unoptimized))
+
+    def test_stream(self):
+        source_code = "x = 2\ny = x * [1, 2]\nvec_reverse(y)"
+        ast = Parser(TokenBuffer.from_source(source_code)).parse()
+        statements = list(Optimizer(2).optimize_stream(ast.statements))
+        self.assertEqual([str(statement) for statement in statements],
+                         ["x = 2.0", "y = [2.0, 4.0]", "result = [4.0, 2.0]", "print(result)"])
+
+class TestLoopOptimizer(unittest.TestCase):
+    def test_hoist_invariants(self):
+        optimizer, code = optimize("""
+        s = [1, 2]
+        i = 0
+        while (i < n) {
+            base = a * 2 + b
+            c = base * 3
+            s = s * 0.5 + a / 4 + [1, 1]
+            i = i + 1
+        }
+        print(s)
+        print(c)
+        """, 2)
+        self.assertEqual(body(code).split('\n')[2:10], [
+            "if (i < n):",
+            "    base = ((a * 2.0) + b)",
+            "    _t0 = (a / 4.0)",
+            "    _t1 = np.array([1.0, 1.0])",
+            "    c = (base * 3.0)",
+            "    while (i < n):",
+            "        s = (((s * 0.5) + _t0) + _t1)",
+            "        i = (i + 1.0)",
+        ])
+        self.assertEqual(optimizer.stats['hoisted'], 4)
+
+    def test_no_hoisting(self):
+        _, code = optimize("""
+        while (i < 3) { y = x  x = a * 2  i = i + 1 }
+        while (x < 3) { x = a * 2 }
+        while (j < 3) { z = a * 2  z = z + 1  j = j + 1 }
+        print(y)
+        print(z)
+        """, 2)
+        # Each variable is read before its assignment, or assigned twice:
+        # only the computation moves
+        lines = body(code).split('\n')
+        self.assertIn("        x = _t0", lines)
+        self.assertIn("        x = _t1", lines)
+        self.assertIn("        z = _t2", lines)
+
+    def test_common_subexpressions(self):
+        optimizer, code = optimize("""
+        if (c > 0) {
+            d = (s - t) * (s - t)
+            e = s - t
+            f = (a * b) + c
+            g = (a * b) + c
+            a = a + 1
+            h = a * b
+            k = (s - t) + e
+        }
+        print(k)
+        print(d)
+        plot(f, g)
+        print(h)
+        """, 2)
+        self.assertEqual(body(code).split('\n')[:10], [
+            "if (c > 0.0):",
+            "    _t0 = (s - t)",
+            "    d = (_t0 * _t0)",
+            "    e = _t0",
+            "    f = ((a * b) + c)",
+            "    g = f",
+            "    a = (a + 1.0)",
+            "    h = (a * b)",
+            "    k = (_t0 + e)",
+            "print(k)",
+        ])
+        self.assertEqual(optimizer.stats['reused'], 4)
+
+    def test_hoist_vector_literals(self):
+        # Literals of variables, or of constants propagated into them, are
+        # vector nodes without a position
+        for assignment in ("s = 2", "s = vec_max([2, 1])"):
+            source_code = f"{assignment}\na = [0, 0]\ni = 0\nwhile (i < 3) {{ a = a + [s, 1]  i = i + 1 }}\nprint(a)"
+            optimizer, optimized = optimize(source_code, 2)
+            self.assertEqual(optimizer.stats['hoisted'], 1)
+            self.assertEqual(run(optimized), run(optimize(source_code, 0)[1]))
+
+    def test_temporaries_avoid_names(self):
+        _, code = optimize("_t0 = 1\nwhile (i < 3) { x = (a + b) * (a + b)  i = i + _t0 }\nprint(x)", 2)
+        self.assertIn("_t1 = (a + b)", code)
+
+    def test_loops_output_unchanged(self):
+        source_code = """
+        signal = [3, 1, 4, 1, 5, 9, 2, 6]
+        s = signal
+        i = 0
+        acc = 0
+        while (i < 20) {
+            w = signal * 0.5
+            s = (s * 0.5 + w * 0.5) + (s * 0.5 + w * 0.5) / 10
+            if (i > 10) { t = s * 2  u = s * 2 } else { t = s  u = s }
+            j = 0
+            while (j < 3) { v = signal * i  acc = acc + v * 2 + v * 2  j = j + 1 }
+            i = i + 1
+        }
+        print(acc)
+        print(s)
+        print(t)
+        print(u)
+        """
+        _, unoptimized = optimize(source_code, 0)
+        optimizer, optimized = optimize(source_code, 2)
+        self.assertGreater(optimizer.stats['hoisted'], 0)
+        self.assertGreater(optimizer.stats['reused'], 0)
+        self.assertEqual(run(optimized), run(unoptimized))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# tests/test_parallel_compiler.py
+import unittest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantics.parallel_compiler import ParallelCompiler, statement_boundaries, compile_chunk
+
+SOURCE = """x = [1, 2, 3]
+y = x * 2 - -1
+# a comment with z = 1 and if inside
+s = "if = while"
+if (y > 1) { z = 2 } else { z = 3 }
+while (z < 3) { z = z + 1 }
+w = vec_average(x)
+plot(x, y)
+"""
+
+class TestStatementBoundaries(unittest.TestCase):
+    def test_top_level_statements(self):
+        starts = statement_boundaries(SOURCE)
+        words = [SOURCE[start:].split(None, 1)[0] for start in starts]
+        self.assertEqual(words, ['x', 'y', 's', 'if', 'while', 'w'])
+
+    def test_stray_close_brace(self):
+        self.assertIsNone(statement_boundaries("x = 1\n}\ny = 2"))
+
+    def test_non_ascii_identifier(self):
+        # 'z' is the tail of the identifier 'éz', not a statement start
+        self.assertEqual(statement_boundaries("x = 1\néz = 2"), [0])
+
+class TestParallelCompiler(unittest.TestCase):
+    def assertSameAsSerial(self, source_code, jobs=2):
+        compiler = ParallelCompiler('python', jobs)
+        ast, analyzer, code = compiler.compile(source_code)
+        serial_ast, serial_analyzer, serial_code = compiler.compile_serial(source_code)
+        self.assertEqual(code, serial_code)
+        self.assertEqual(str(ast), str(serial_ast))
+        self.assertEqual(analyzer.errors, serial_analyzer.errors)
+        return compiler
+
+    def test_same_as_serial(self):
+        compiler = self.assertSameAsSerial(SOURCE * 20)
+        self.assertGreater(compiler.chunks, 1)
+
+    def test_single_job_is_serial(self):
+        compiler = ParallelCompiler('python', 1)
+        _, _, code = compiler.compile(SOURCE)
+        self.assertEqual(code, compiler.compile_serial(SOURCE)[2])
+
+    def test_semantic_errors_in_order(self):
+        # An error spanning chunks: w is used before any chunk defines it
+        self.assertSameAsSerial("a = w + 1\n" + SOURCE * 10 + "w = 1\n")
+
+    def test_syntax_error_reported_as_serial(self):
+        source_code = SOURCE * 10 + "q = (1 + \n" + SOURCE
+        with self.assertRaises(Exception) as serial:
+            ParallelCompiler('python', 2).compile_serial(source_code)
+        with self.assertRaises(Exception) as parallel:
+            ParallelCompiler('python', 2).compile(source_code)
+        self.assertEqual(str(parallel.exception), str(serial.exception))
+
+    def test_chunk_positions(self):
+        statements, _ = compile_chunk("y = 2 + x", 'python', 3, 5)
+        expr = statements[0].expr
+        self.assertEqual((expr.line, expr.column), (3, 11))
+        self.assertEqual((expr.right.line, expr.right.column), (3, 13))
+
+if __name__ == '__main__':
+    unittest.main()
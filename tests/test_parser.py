@@ -6,8 +6,13 @@ import os
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from scanner.lexer import Lexer
-from parser.parser import Parser, NumberNode, IdentifierNode, BinaryOpNode, AssignmentNode
+from scanner.lexer import Lexer, TokenType
+from scanner.token_buffer import TokenBuffer
+from scanner.fast_lexer import FastLexer
+from parser.parser import (
+    Parser, NumberNode, IdentifierNode, BinaryOpNode, UnaryOpNode, AssignmentNode,
+    PackedVectorNode, VectorNode
+)
 
 class TestParser(unittest.TestCase):
     def test_basic_expression(self):
@@ -88,5 +93,114 @@ class TestParser(unittest.TestCase):
         self.assertEqual(z_assign.expr.left.name, "x")
         self.assertEqual(z_assign.expr.right.name, "y")
 
+    def test_parse_from_token_iterator(self):
+        source_code = """
+        x = [1, 2, 3]
+        y = vec_max(x)
+        plot(x, y)
+        """
+        expected = str(Parser(Lexer(source_code).tokenize()).parse())
+        
+        # The parser accepts a lazy token stream as well as a list
+        parser = Parser(iter(Lexer(source_code).tokenize()))
+        ast = parser.parse()
+        
+        self.assertEqual(str(ast), expected)
+        self.assertEqual(len(ast.statements), 3)
+
+    def test_packed_vector(self):
+        source_code = "x = [1, 2, 3] * [4, y]"
+        tokens = FastLexer(source_code, pack_vectors=True).tokenize()
+        ast = Parser(tokens).assignment_statement()
+        
+        # Only the all-constant literal is packed
+        self.assertIsInstance(ast.expr.left, PackedVectorNode)
+        self.assertIsInstance(ast.expr.right, VectorNode)
+        self.assertEqual(list(ast.expr.left.values), [1.0, 2.0, 3.0])
+        self.assertEqual(str(ast), str(Parser(Lexer(source_code).tokenize()).assignment_statement()))
+
+    def test_packed_vector_arguments(self):
+        # Packing vectors changes no grammar: a vector argument is the
+        # whole argument either way
+        for source_code in ("f([1, 2] + x)", "y = f([1, 2] + x)", "print(x, [1, 2] * 2)"):
+            with self.subTest(source_code=source_code):
+                messages = []
+                for pack_vectors in (False, True):
+                    with self.assertRaises(Exception) as context:
+                        Parser(TokenBuffer.from_source(source_code, pack_vectors)).parse()
+                    messages.append(str(context.exception))
+                self.assertEqual(messages[1], messages[0])
+        source_code = "y = f(([1, 2]) + x, [3], -[4])"
+        self.assertEqual(str(Parser(TokenBuffer.from_source(source_code, True)).parse()),
+                         str(Parser(TokenBuffer.from_source(source_code, False)).parse()))
+
+    def test_expression_trees(self):
+        cases = {
+            "1 - 2 - 3": "((1.0 - 2.0) - 3.0)",
+            "1 - 2 * 3 / 4 + 5": "((1.0 - ((2.0 * 3.0) / 4.0)) + 5.0)",
+            "-a * -(b + c)": "((-a) * (-(b + c)))",
+            "- - a": "(-(-a))",
+            "f(a + 1, [b, -c], g())": "f((a + 1.0), [b, (-c)], g())",
+            "[1 + 2, [3]] * x": "([(1.0 + 2.0), [3.0]] * x)",
+            '"s" + (((x)))': '("s" + x)',
+        }
+        for source_code, expected in cases.items():
+            with self.subTest(source_code=source_code):
+                self.assertEqual(str(Parser(Lexer(source_code).tokenize()).expression()), expected)
+
+    def test_expression_errors(self):
+        cases = {
+            "(1 + 2": "Expected RPAREN, but got EOF",
+            "1 + )": "Expected factor, but got RPAREN",
+            "f(1, 2": "Expected RPAREN, but got EOF",
+            "[1, 2": "Expected RBRACKET, but got EOF",
+            # A vector argument is the whole argument
+            "f([1] + 2)": "Expected RPAREN, but got PLUS",
+        }
+        for source_code, message in cases.items():
+            with self.subTest(source_code=source_code):
+                with self.assertRaises(Exception) as context:
+                    Parser(Lexer(source_code).tokenize()).expression()
+                self.assertIn(message, str(context.exception))
+
+    def test_long_and_deep_expressions(self):
+        # Neither is limited by the recursion limit
+        terms = 20000
+        source_code = "x = " + " + ".join(["a * 2"] * terms)
+        ast = Parser(FastLexer(source_code).tokenize()).assignment_statement()
+        node = ast.expr
+        for _ in range(terms - 1):
+            self.assertIsInstance(node, BinaryOpNode)
+            self.assertEqual(node.right.op.value, "*")
+            node = node.left
+        self.assertEqual(node.op.value, "*")
+
+        depth = 5 * sys.getrecursionlimit()
+        source_code = "x = " + "-(" * depth + "1" + ")" * depth
+        node = Parser(FastLexer(source_code).tokenize()).assignment_statement().expr
+        for _ in range(depth):
+            self.assertIsInstance(node, UnaryOpNode)
+            node = node.expr
+        self.assertEqual(node.value, 1.0)
+
+    def test_compact_nodes(self):
+        source_code = "x = 1\ny = -x * [2, x]"
+        for tokens in (Lexer(source_code).tokenize(), TokenBuffer.from_source(source_code)):
+            ast = Parser(tokens).parse()
+            expr = ast.statements[1].expr
+            
+            # Nodes hold positions rather than tokens, and no __dict__
+            self.assertFalse(hasattr(expr, '__dict__'))
+            self.assertFalse(hasattr(expr.left.expr, 'token'))
+            self.assertEqual((expr.line, expr.column), (2, 8))
+            self.assertEqual((expr.left.expr.line, expr.left.expr.column), (2, 6))
+            self.assertEqual(expr.op.token_type, TokenType.MULTIPLY)
+            self.assertEqual(expr.op.value, '*')
+            self.assertIs(expr.right.elements[1].name, ast.statements[0].identifier.name)
+        
+        # Operators are shared between nodes
+        ast = Parser(Lexer("a = 1 + 2 + 3").tokenize()).parse()
+        self.assertIs(ast.statements[0].expr.op, ast.statements[0].expr.left.op)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
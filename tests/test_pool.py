@@ -0,0 +1,52 @@
+# tests/test_pool.py
+import unittest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from semantics.code_generator import CodeGenerator
+from runtime.pool import WorkerPool
+
+PID = "import os\nprint(os.getpid())"
+
+class TestWorkerPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = WorkerPool(1, max_jobs=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_execute(self):
+        code = CodeGenerator(Parser(TokenBuffer.from_source("x = [1, 5, 2]\nvec_max(x)")).parse(), 'python').generate()
+        self.assertEqual(self.pool.execute(code), "5.0\n")
+        # Programs do not see each other's variables
+        with self.assertRaises(Exception) as error:
+            self.pool.execute("print(x)")
+        self.assertIn("NameError", str(error.exception))
+
+    def test_recycling(self):
+        pids = self.pool.map([PID] * 6)
+        # Each worker runs at most max_jobs programs
+        self.assertLessEqual(max(pids.count(pid) for pid in pids), 3)
+        self.assertGreater(len(set(pids)), 1)
+
+    def test_timeout(self):
+        with self.assertRaises(TimeoutError):
+            self.pool.execute("while True: pass", timeout=0.5)
+        # The stuck worker is replaced
+        self.assertEqual(self.pool.execute("print(1)"), "1\n")
+
+    def test_worker_exit(self):
+        with self.assertRaises(Exception) as error:
+            self.pool.execute("import os\nos._exit(3)")
+        self.assertIn("code 3", str(error.exception))
+        self.assertEqual(self.pool.execute("print(2)"), "2\n")
+
+if __name__ == '__main__':
+    unittest.main()
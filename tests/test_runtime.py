@@ -0,0 +1,156 @@
+# tests/test_runtime.py
+import unittest
+import sys
+import os
+import io
+import time
+import shutil
+import contextlib
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wizuall_runtime
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from semantics.code_generator import CodeGenerator
+from runtime.executor import RuntimeExecutor
+
+def generate(source_code):
+    return CodeGenerator(Parser(TokenBuffer.from_source(source_code)).parse(), 'python').generate()
+
+def run(code):
+    """Output of code and the variables it assigned"""
+    output = io.StringIO()
+    namespace = {}
+    with contextlib.redirect_stdout(output):
+        exec(code, namespace)
+    return output.getvalue(), namespace
+
+class TestRuntime(unittest.TestCase):
+    def test_primitives(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(wizuall_runtime.vec_max(np.array([1.0, 3.0, 2.0])), 3.0)
+            moving = wizuall_runtime.vec_average(np.array([1.0, 3.0, 5.0]), 2)
+            self.assertEqual(wizuall_runtime.vec_product(np.array([1.0, 2.0]), np.array([3.0, 4.0])), 11.0)
+        np.testing.assert_array_equal(moving, [1.0, 2.0, 4.0])
+        # Like the templates, they print their result
+        self.assertEqual(output.getvalue(), "3.0\n[1. 2. 4.]\n11.0\n")
+        with self.assertRaises(ValueError):
+            wizuall_runtime.vec_compare(np.array([1.0]), np.array([2.0]), 'between')
+
+    def test_calls(self):
+        code = generate("""
+        x = [1, 2, 3]
+        m = vec_max(x)
+        vec_reverse(x)
+        print(vec_min(x, 2))
+        histogram(x)
+        """)
+        self.assertIn("import wizuall_runtime", code)
+        self.assertIn("m = result = wizuall_runtime.vec_max(x)", code)
+        self.assertIn("result = wizuall_runtime.vec_reverse(x)", code)
+        self.assertIn("print((result := wizuall_runtime.vec_min(x, 2.0)))", code)
+        self.assertIn("wizuall_runtime.histogram(x)", code)
+        self.assertNotIn("def ", code)
+
+    def test_return_values(self):
+        output, namespace = run(generate("""
+        x = [4, 2, 6]
+        m = vec_max(x)
+        r = vec_reverse(x)
+        print(result)
+        """))
+        self.assertEqual(output, "6.0\n[6. 2. 4.]\n[6. 2. 4.]\n")
+        # The variable the call is assigned to gets its result
+        self.assertEqual(namespace['m'], 6.0)
+        np.testing.assert_array_equal(namespace['r'], [6.0, 2.0, 4.0])
+
+    def test_tuple_results(self):
+        code = generate("x = [1, 2, 10, 11]\nc = clustering(x, 2)\nprint(clustering(x, 2))")
+        self.assertIn("c = labels, centers = wizuall_runtime.clustering(x, 2.0)", code)
+        _, namespace = run(code)
+        # KMeans numbers the clusters at random, so each call's labels
+        # are checked against its own centers
+        for labels, centers in (namespace['c'], (namespace['labels'], namespace['centers'])):
+            np.testing.assert_array_equal(centers[labels].ravel(), [1.5, 1.5, 10.5, 10.5])
+
+    def test_executor(self):
+        # The program runs in a temporary directory, importing the runtime
+        # from the compiler's
+        output = RuntimeExecutor(generate("x = [1, 5, 2]\nvec_max(x)\nprint(result * 2)")).execute()
+        self.assertEqual(output, "5.0\n10.0\n")
+
+    def test_in_process(self):
+        code = generate("x = [1, 5, 2]\nvec_max(x)\nprint(result * 2)")
+        stdout = sys.stdout
+        output = RuntimeExecutor(code, in_process=True).execute()
+        self.assertEqual(output, RuntimeExecutor(code).execute())
+        self.assertIs(sys.stdout, stdout)
+        # Each run starts from a fresh namespace
+        with self.assertRaises(Exception) as error:
+            RuntimeExecutor(generate("print(result)"), in_process=True).execute()
+        self.assertTrue(str(error.exception).startswith("Execution error:\n"))
+        self.assertIn("NameError: name 'result' is not defined", str(error.exception))
+        self.assertIn('File "<wizuall>", line 5, in <module>', str(error.exception))
+        self.assertEqual(RuntimeExecutor("import sys\nprint(1)\nsys.exit(0)", in_process=True).execute(), "1\n")
+        with self.assertRaises(Exception):
+            RuntimeExecutor("import sys\nsys.exit(2)", in_process=True).execute()
+
+    def test_stream(self):
+        executor = RuntimeExecutor("import time\nprint('first')\ntime.sleep(30)\nprint('second')")
+        lines = executor.stream(timeout=20)
+        # The first line arrives while the program is still running
+        start = time.perf_counter()
+        self.assertEqual(next(lines), "first\n")
+        self.assertLess(time.perf_counter() - start, 10)
+        # Closing the stream kills the program
+        lines.close()
+        self.assertLess(executor.metrics.wall_time, 10)
+        self.assertNotEqual(executor.metrics.returncode, 0)
+
+        executor = RuntimeExecutor(generate("x = [1, 5, 2]\nvec_max(x)"))
+        self.assertEqual(list(executor.stream()), ["5.0\n"])
+        metrics = executor.metrics.as_dict()
+        self.assertEqual(metrics['returncode'], 0)
+        self.assertGreater(metrics['cpu_time'], 0)
+        # NumPy alone takes a few MiB
+        self.assertGreater(metrics['peak_rss'], 2**20)
+        self.assertGreater(metrics['wall_time'], 0)
+
+        with self.assertRaises(Exception) as error:
+            list(RuntimeExecutor("print(1)\nraise ValueError('boom')").stream())
+        self.assertIn("ValueError: boom", str(error.exception))
+
+    def test_stream_limits(self):
+        with self.assertRaises(TimeoutError):
+            list(RuntimeExecutor("while True: pass").stream(timeout=0.5))
+        # Touching every page makes the memory resident
+        code = "import time\nx = bytearray(300 * 2**20)\nx[::4096] = b'1' * len(x[::4096])\ntime.sleep(30)"
+        executor = RuntimeExecutor(code)
+        with self.assertRaises(MemoryError):
+            list(executor.stream(timeout=20, max_memory=100 * 2**20))
+        self.assertLess(executor.metrics.wall_time, 10)
+
+    def test_stream_peak_rss(self):
+        # The program starts out counting this process's memory, which is
+        # not its own
+        parent = bytearray(400 * 2**20)
+        parent[::4096] = b'1' * len(parent[::4096])
+        executor = RuntimeExecutor("import time\nx = bytearray(50 * 2**20)\n"
+                                   "x[::4096] = b'1' * len(x[::4096])\ntime.sleep(0.5)\nprint('hi')")
+        self.assertEqual(list(executor.stream()), ["hi\n"])
+        self.assertGreater(executor.metrics.peak_rss, 50 * 2**20)
+        self.assertLess(executor.metrics.peak_rss, 200 * 2**20)
+        if shutil.which('gcc'):
+            executor = RuntimeExecutor('#include <stdio.h>\nint main(void) { printf("hi\\n"); return 0; }', 'c')
+            self.assertEqual(list(executor.stream()), ["hi\n"])
+            # Exited too soon to be sampled, or sampled on its own
+            self.assertTrue(executor.metrics.peak_rss is None or executor.metrics.peak_rss < 50 * 2**20)
+        del parent
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# tests/test_scheduler.py
+import unittest
+import sys
+import os
+import io
+import contextlib
+import subprocess
+import tempfile
+
+# Add parent directory to path for imports
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+from optimizer.optimizer import Optimizer
+from optimizer.dependencies import DependencyGraph, PYPLOT
+from semantics.code_generator import CodeGenerator
+from semantics.scheduler import StatementScheduler
+
+PROGRAM = """
+a = [1, 2, 3, 4, 5, 6]
+b = [6, 5, 4, 3, 2, 1]
+vec_max(a)
+c = (a + b) * 2
+print(c)
+vec_min(b)
+d = b - 1
+k = 2
+while (k > 0) { d = d * 2  k = k - 1 }
+print(d)
+print(result)
+"""
+
+def parse(source_code):
+    return Parser(TokenBuffer.from_source(source_code)).parse()
+
+def generate(source_code, schedule='thread', level=0):
+    ast = Optimizer(level).optimize(parse(source_code)) if level else parse(source_code)
+    return CodeGenerator(ast, 'python', fuse=level > 0, schedule=schedule).generate()
+
+def run(code):
+    """Output of code and the error it raised, run as the main module"""
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(code, {'__name__': '__main__'})
+    except Exception as error:
+        return output.getvalue(), type(error)
+    return output.getvalue(), None
+
+class TestDependencyGraph(unittest.TestCase):
+    def test_dependencies(self):
+        graph = DependencyGraph(parse("""
+        a = [1, 2]
+        b = [3, 4]
+        c = a + b
+        print(a)
+        a = [5, 6]
+        histogram(b)
+        plot(c)
+        """).statements)
+        self.assertEqual(graph.dependencies, [set(), set(), {0, 1}, {0}, {0, 2, 3}, {1}, {2}])
+        # Each statement starts a group unless it depends on the current one
+        groups = graph.groups()
+        self.assertEqual(groups, [(0, 1), (1, 3), (3, 5), (5, 6), (6, 7)])
+        self.assertEqual(graph.group_dependencies(groups), [[], [0], [0, 1], [1], [1]])
+        self.assertEqual(graph.inputs(1, 3), {'a'})
+        self.assertEqual(graph.outputs(1, 3), {'b', 'c'})
+
+    def test_shared_plots(self):
+        statements = parse("histogram(a)\nb = a * 2\nscatter(b, a)\nclassification(a, b, a)").statements
+        self.assertEqual(DependencyGraph(statements).dependencies, [set(), set(), {1}, {1}])
+        # classification does not draw
+        graph = DependencyGraph(statements, shared_plots=True)
+        self.assertEqual(graph.dependencies, [set(), set(), {0, 1}, {1}])
+        self.assertNotIn(PYPLOT, graph.inputs(0, 4))
+
+class TestStatementScheduler(unittest.TestCase):
+    def test_tasks(self):
+        tasks = StatementScheduler().tasks(parse("""
+        a = [1, 2]
+        if (a > 0) { e = a }
+        print(e)
+        """).statements)
+        # e may be read before the if assigns it
+        self.assertEqual([(len(group), inputs, unbound, outputs, dependencies)
+                          for group, inputs, unbound, outputs, dependencies in tasks],
+                         [(3, ['e'], ['e'], ['a', 'e'], [])])
+        tasks = StatementScheduler().tasks(parse("if (k > 0) { e = 1 }\nf = [1]\nprint(f)\nprint(e)").statements)
+        self.assertEqual([task[1:] for task in tasks],
+                         [(['k'], ['k'], ['e'], []), ([], [], ['f'], []), (['e'], ['e'], [], [0])])
+        with self.assertRaises(ValueError):
+            StatementScheduler('gpu')
+
+    def test_generated(self):
+        code = generate(PROGRAM)
+        self.assertIn("def _wizuall_task0():", code)
+        self.assertIn("    _wizuall_schedule([", code)
+        self.assertIn("    ], 'thread', None)", code)
+        # Nothing runs unless the program is the main module
+        namespace = {}
+        exec(code, namespace)
+        self.assertNotIn('c', namespace)
+
+    def test_same_output(self):
+        expected = run(CodeGenerator(parse(PROGRAM), 'python').generate())
+        self.assertIsNone(expected[1])
+        for level in (0, 2):
+            with self.subTest(level=level):
+                for _ in range(5):
+                    self.assertEqual(run(generate(PROGRAM, level=level)), expected)
+
+    def test_errors(self):
+        # Output before the failing statement is printed, none after it
+        source_code = "a = [1, 2]\nprint(a)\nb = a + [1, 2, 3]\nprint(b)\nprint(7)"
+        expected = run(CodeGenerator(parse(source_code), 'python').generate())
+        self.assertEqual(expected, ('[1. 2.]\n', ValueError))
+        self.assertEqual(run(generate(source_code)), expected)
+        # Reading a variable no statement has assigned yet
+        output, error = run(generate("k = 0\nif (k > 0) { e = 1 }\nprint(e)\nprint(k)"))
+        self.assertEqual(output, '')
+        self.assertTrue(issubclass(error, NameError))
+
+    def test_processes(self):
+        expected = run(CodeGenerator(parse(PROGRAM), 'python').generate())[0]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'program.py')
+            with open(path, 'w') as f:
+                f.write(generate(PROGRAM, 'process'))
+            result = subprocess.run([sys.executable, path], capture_output=True, text=True,
+                                    env={**os.environ, 'MPLBACKEND': 'Agg', 'PYTHONPATH': ROOT})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, expected)
+
+if __name__ == '__main__':
+    unittest.main()
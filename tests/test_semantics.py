@@ -6,7 +6,10 @@ import os
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import numpy as np
+
 from scanner.lexer import Lexer
+from scanner.fast_lexer import FastLexer
 from parser.parser import Parser
 from semantics.semantic_analyzer import SemanticAnalyzer
 
@@ -66,7 +69,7 @@ class TestSemanticAnalyzer(unittest.TestCase):
         # Check that v3 contains the sum of v1 and v2
         self.assertIn('v3', analyzer.symbol_table.symbols)
         expected = [1 + 4, 2 + 5, 3 + 6]  # [5, 7, 9]
-        self.assertEqual(analyzer.symbol_table.symbols['v3'].value, expected)
+        self.assertEqual(analyzer.symbol_table.symbols['v3'].value.tolist(), expected)
     
     def test_vector_scalar_operations(self):
         source_code = """
@@ -88,7 +91,7 @@ class TestSemanticAnalyzer(unittest.TestCase):
         # Check that result contains v * s
         self.assertIn('result', analyzer.symbol_table.symbols)
         expected = [1 * 2, 2 * 2, 3 * 2]  # [2, 4, 6]
-        self.assertEqual(analyzer.symbol_table.symbols['result'].value, expected)
+        self.assertEqual(analyzer.symbol_table.symbols['result'].value.tolist(), expected)
     
     def test_vector_dimension_mismatch(self):
         source_code = """
@@ -128,5 +131,90 @@ class TestSemanticAnalyzer(unittest.TestCase):
         # Check the error message
         self.assertIn("division by zero", errors[0].lower())
 
+    def test_packed_vector_operations(self):
+        source_code = """
+        v1 = [1, 2, 3]
+        v2 = [4, 5, 6]
+        v3 = v1 + v2 * 2
+        v4 = v1 / [1, 0, 1]
+        """
+        tokens = FastLexer(source_code, pack_vectors=True).tokenize()
+        ast = Parser(tokens).parse()
+        
+        analyzer = SemanticAnalyzer(ast)
+        valid, errors = analyzer.analyze()
+        
+        # Packed literals are viewed as arrays without copying
+        self.assertEqual(analyzer.symbol_table.symbols['v1'].type, 'vector')
+        self.assertTrue(np.shares_memory(analyzer.symbol_table.symbols['v1'].value, ast.statements[0].expr.values))
+        self.assertEqual(analyzer.symbol_table.symbols['v3'].value.tolist(), [9, 12, 15])
+        self.assertEqual(errors, ["Division by zero in vector"])
+
+    def test_error_messages(self):
+        source_code = """
+        v = [1, 2, 3]
+        a = v + [1, 2]
+        b = v - [1, 2]
+        c = v * [1, 2]
+        d = v / [1, 2]
+        e = v / 0
+        f = v / [1, 0, 2]
+        g = 1 / [-0.0, 1]
+        """
+        for pack_vectors in (False, True):
+            ast = Parser(FastLexer(source_code, pack_vectors=pack_vectors).tokenize()).parse()
+            analyzer = SemanticAnalyzer(ast)
+            _, errors = analyzer.analyze()
+            self.assertEqual(errors, [
+                "Vector dimensions don't match for addition",
+                "Vector dimensions don't match for subtraction",
+                "Vector dimensions don't match for multiplication",
+                "Vector dimensions don't match for division",
+                "Division by zero",
+                "Division by zero in vector",
+                "Division by zero in vector",
+            ])
+            # The left operand stands in for a failed operation
+            self.assertEqual(analyzer.symbol_table.symbols['a'].value.tolist(), [1, 2, 3])
+            self.assertEqual(analyzer.symbol_table.symbols['g'].value, 1)
+
+    def test_mixed_vector_elements(self):
+        source_code = """
+        v = [1, 2]
+        w = [v, 3]
+        x = w * 2
+        y = [1, 0 * v] / [2, v]
+        """
+        ast = Parser(Lexer(source_code).tokenize()).parse()
+        analyzer = SemanticAnalyzer(ast)
+        _, errors = analyzer.analyze()
+
+        # Vectors of vectors are evaluated element by element
+        x = analyzer.symbol_table.symbols['x'].value
+        self.assertEqual(analyzer.symbol_table.symbols['x'].type, 'vector')
+        self.assertEqual(x[0].tolist(), [2, 4])
+        self.assertEqual(x[1], 6)
+        # Only number elements count as zero divisors
+        self.assertEqual(errors, [])
+        self.assertEqual(analyzer.symbol_table.symbols['y'].value[0], 0.5)
+
+    def test_analyze_stream(self):
+        source_code = """
+        v = [1, 2, 3]
+        w = v * 2
+        v = w / [1, 0, 1]
+        """
+        ast = Parser(Lexer(source_code).tokenize()).parse()
+        analyzer = SemanticAnalyzer(ast)
+        analyzer.analyze()
+        
+        # The symbol table carries over from statement to statement
+        streaming = SemanticAnalyzer(None)
+        statements = list(streaming.analyze_stream(Parser(Lexer(source_code).tokenize()).iter_statements()))
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(streaming.symbol_table.symbols['v'].value.tolist(), analyzer.symbol_table.symbols['v'].value.tolist())
+        self.assertEqual(streaming.symbol_table.symbols['v'].value.tolist(), [2, 4, 6])
+        self.assertEqual(streaming.errors, analyzer.errors)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,110 @@
+# tests/test_shape_analyzer.py
+import unittest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.lexer import Lexer
+from scanner.fast_lexer import FastLexer
+from parser.parser import Parser
+from semantics.semantic_analyzer import SemanticAnalyzer
+from semantics.shape_analyzer import Shape, ShapeAnalyzer, UNKNOWN
+
+def analyze(analyzer_class, source_code, pack_vectors=False):
+    ast = Parser(FastLexer(source_code, pack_vectors=pack_vectors).tokenize()).parse()
+    analyzer = analyzer_class(ast)
+    analyzer.analyze()
+    return analyzer
+
+class TestShapeAnalyzer(unittest.TestCase):
+    def shape(self, analyzer, name):
+        return analyzer.symbol_table.symbols[name].value
+
+    def test_same_errors_as_values(self):
+        source_code = """
+        v = [1, 2, 3]
+        a = v + [1, 2]
+        b = v - [1, 2]
+        c = v * [1, 2]
+        d = v / [1, 2]
+        e = v / 0
+        f = v / [1, 0, 2]
+        g = 1 / [-0.0, 1]
+        h = v / (v * 2 - v * 2)
+        z = [1, 0] * 3
+        k = v / (x - 1 + 1)
+        m = [1, 2] / z
+        """
+        for pack_vectors in (False, True):
+            values = analyze(SemanticAnalyzer, source_code, pack_vectors)
+            shapes = analyze(ShapeAnalyzer, source_code, pack_vectors)
+            # Zeros computed by vector arithmetic are not tracked
+            self.assertEqual(shapes.errors, values.errors[:7] + values.errors[8:])
+            self.assertEqual(len(values.errors), 10)
+
+    def test_shapes(self):
+        analyzer = analyze(ShapeAnalyzer, """
+        v = [1, 2, 3]
+        w = -v * 2
+        n = [v, "s"]
+        s = (1 + 2) * 4
+        r = vec_average(v)
+        """)
+        self.assertEqual(self.shape(analyzer, 'w'), Shape.vector(3))
+        self.assertEqual(self.shape(analyzer, 'n'), Shape.vector(2, 'object'))
+        self.assertEqual(self.shape(analyzer, 's'), Shape.scalar(12))
+        self.assertEqual(self.shape(analyzer, 'r'), UNKNOWN)
+        self.assertEqual(analyzer.symbol_table.symbols['v'].type, 'vector')
+
+    def test_if_joins_branches(self):
+        analyzer = analyze(ShapeAnalyzer, """
+        if (c > 0) { v = [1, 2]  s = 1 } else { v = [1, 2, 3]  s = 1 }
+        if (c > 0) { u = [1, 2] }
+        w = v + [1, 2]
+        """)
+        self.assertEqual(self.shape(analyzer, 'v'), Shape.vector(None))
+        self.assertEqual(self.shape(analyzer, 's'), Shape.scalar(1))
+        # u may never have been assigned
+        self.assertEqual(self.shape(analyzer, 'u'), UNKNOWN)
+        self.assertEqual(analyzer.errors, [])
+
+    def test_while_reaches_fixed_point(self):
+        analyzer = analyze(ShapeAnalyzer, """
+        v = [1, 2]
+        i = 0
+        while (i < 3) {
+            w = v + [1, 2]
+            v = [1, 2, 3]
+            i = i + 1
+            bad = [1, 2] * [1, 2, 3]
+        }
+        """)
+        # The first iteration's dimensions do not hold for later ones
+        self.assertEqual(self.shape(analyzer, 'v'), Shape.vector(None))
+        self.assertEqual(self.shape(analyzer, 'i'), Shape.scalar())
+        # Certain errors in the body are reported once
+        self.assertEqual(analyzer.errors, ["Vector dimensions don't match for multiplication"])
+
+    def test_nested_loops(self):
+        analyzer = analyze(ShapeAnalyzer, """
+        v = 0
+        while (i < 3) {
+            while (j < 3) { v = [1] / 0  j = j + 1 }
+            i = i + 1
+        }
+        """)
+        self.assertEqual(analyzer.errors, ["Division by zero"])
+        self.assertEqual(self.shape(analyzer, 'j'), Shape.scalar())
+
+    def test_analyze_stream(self):
+        source_code = "v = [1, 2]\nwhile (i < 2) { v = v * 2 }\nw = v / [0, 1]"
+        analyzer = ShapeAnalyzer(None)
+        statements = list(analyzer.analyze_stream(Parser(Lexer(source_code).tokenize()).iter_statements()))
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(self.shape(analyzer, 'v'), Shape.vector(2))
+        self.assertEqual(analyzer.errors, ["Division by zero in vector"])
+
+if __name__ == '__main__':
+    unittest.main()
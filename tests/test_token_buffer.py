@@ -0,0 +1,71 @@
+# tests/test_token_buffer.py
+import unittest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner.lexer import Lexer, TokenType
+from scanner.token_buffer import TokenBuffer
+from parser.parser import Parser
+
+def token_tuples(tokens):
+    return [(t.token_type, t.value, t.line, t.column) for t in tokens]
+
+class TestTokenBuffer(unittest.TestCase):
+    def test_matches_reference_lexer(self):
+        sources = [
+            "",
+            "x\n",
+            "x = [1, 2.5, .5, 3.]\ny = x * 2 # double\n",
+            "if (x > 10) { y = 20 } else { y = 30 }",
+            'print("multi\nline")\nz = 1',
+            "café = ٣ + 1",
+        ]
+        for source_code in sources:
+            with self.subTest(source_code=source_code):
+                self.assertEqual(token_tuples(TokenBuffer.from_source(source_code)),
+                                 token_tuples(Lexer(source_code).tokenize()))
+
+    def test_columns_are_compact(self):
+        tokens = TokenBuffer.from_source("v = [1, 2, 3]")
+        self.assertEqual(len(tokens), 10)
+        self.assertEqual(tokens.types.itemsize, 1)
+        self.assertEqual(list(tokens.offsets), [0, 2, 4, 5, 6, 8, 9, 11, 12, 12])
+        self.assertEqual(tokens.text(0), "v")
+        self.assertEqual(tokens[-1].token_type, TokenType.EOF)
+        with self.assertRaises(IndexError):
+            tokens[10]
+
+    def test_errors_match(self):
+        for source_code in ["x = 1 $ 2", 'x = "open', "x = .\n"]:
+            with self.subTest(source_code=source_code):
+                with self.assertRaises(Exception) as expected:
+                    Lexer(source_code).tokenize()
+                with self.assertRaises(Exception) as actual:
+                    TokenBuffer.from_source(source_code)
+                self.assertEqual(str(actual.exception), str(expected.exception))
+
+    def test_packed_vector_entry(self):
+        tokens = TokenBuffer.from_source("v = [1, 2, 3]", pack_vectors=True)
+        self.assertEqual(len(tokens), 4)
+        self.assertEqual(tokens[2].token_type, TokenType.VECTOR)
+        self.assertEqual(list(tokens[2].value), [1.0, 2.0, 3.0])
+    
+    def test_parser_accepts_buffer(self):
+        source_code = """
+        x = [1, 2, 3]
+        if (x > 1) { y = -x / 2 } else { y = vec_max(x) }
+        plot(x, y)
+        """
+        expected = str(Parser(Lexer(source_code).tokenize()).parse())
+        self.assertEqual(str(Parser(TokenBuffer.from_source(source_code)).parse()), expected)
+
+    def test_parser_errors_use_view_positions(self):
+        with self.assertRaises(Exception) as context:
+            Parser(TokenBuffer.from_source("x = 1\ny = )")).parse()
+        self.assertIn("Syntax error at 2:5", str(context.exception))
+
+if __name__ == '__main__':
+    unittest.main()
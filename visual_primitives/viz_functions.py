@@ -21,9 +21,8 @@ class VisualizationPrimitives:
                 'classification': self._python_classification_template
             },
             'c': {
-                # Templates for C target language
-                'plot': self._c_plot_template,
-                # Add other C templates here
+                # The C runtime in semantics/c_runtime.py implements the
+                # primitives C supports
             },
             'r': {
                 # Templates for R target language
@@ -373,47 +372,6 @@ y_pred, clf = classification({x_train}, {y_train}, {x_test}, cls_type='{cls_type
 print("Predictions:", y_pred)
 """
 
-    # C template functions
-    def _c_plot_template(self, args):
-        """Generate C code for basic plotting using GNUPlot"""
-        data_arg = args[0] if args else "data"
-        return f"""
-#include <stdio.h>
-#include <stdlib.h>
-
-void save_data_to_file(double *{data_arg}, int size) {{
-    FILE *fp = fopen("data.txt", "w");
-    if (fp == NULL) {{
-        fprintf(stderr, "Error opening file\\n");
-        return;
-    }}
-    
-    for (int i = 0; i < size; i++) {{
-        fprintf(fp, "%d %f\\n", i, {data_arg}[i]);
-    }}
-    
-    fclose(fp);
-}}
-
-void plot_data(double *{data_arg}, int size) {{
-    save_data_to_file({data_arg}, size);
-    
-    FILE *gnuplot = popen("gnuplot -persistent", "w");
-    if (gnuplot == NULL) {{
-        fprintf(stderr, "Error opening GNUPlot\\n");
-        return;
-    }}
-    
-    fprintf(gnuplot, "set title 'WizuAll Plot'\\n");
-    fprintf(gnuplot, "set xlabel 'X'\\n");
-    fprintf(gnuplot, "set ylabel 'Y'\\n");
-    fprintf(gnuplot, "set grid\\n");
-    fprintf(gnuplot, "plot 'data.txt' with lines title 'Data'\\n");
-    
-    pclose(gnuplot);
-}}
-"""
-    
     # R template functions
     def _r_plot_template(self, args):
         """Generate R code for basic plotting"""
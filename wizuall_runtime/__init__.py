@@ -0,0 +1,6 @@
+# wizuall_runtime/__init__.py
+from .primitives import (plot, histogram, heatmap, scatter, bar, line, vec_average, vec_max, vec_min,
+                         vec_reverse, vec_product, vec_compare, clustering, classification)
+
+__all__ = ['plot', 'histogram', 'heatmap', 'scatter', 'bar', 'line', 'vec_average', 'vec_max', 'vec_min',
+           'vec_reverse', 'vec_product', 'vec_compare', 'clustering', 'classification']
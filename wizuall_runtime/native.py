@@ -0,0 +1,114 @@
+# wizuall_runtime/native.py
+import os
+import ctypes
+import weakref
+import tempfile
+import subprocess
+
+import numpy as np
+
+from cache.binary_cache import BinaryCache
+
+# gcc flags of every kernel library besides the optimization profile's
+SHARED_FLAGS = ['-shared', '-fPIC']
+
+class Vector(ctypes.Structure):
+    """wz_vec of the C runtime"""
+    _fields_ = [
+        ('data', ctypes.POINTER(ctypes.c_double)),
+        ('length', ctypes.c_size_t),
+        ('dims', ctypes.c_int),
+        ('borrowed', ctypes.c_int)
+    ]
+
+def load(source, flags):
+    """Load the library of a program's kernels, building it from their C
+    source unless the binary cache has it already"""
+    flags = [*flags, *SHARED_FLAGS]
+    cache = BinaryCache()
+    key = cache.key(source, flags)
+    path = cache.get(key)
+    if path is not None:
+        return open_library(path)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source_path = os.path.join(temp_dir, 'kernels.c')
+        library_path = os.path.join(temp_dir, 'kernels.so')
+        with open(source_path, 'w') as f:
+            f.write(source)
+        result = subprocess.run(['gcc', source_path, '-o', library_path, '-lm', *flags],
+                                stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"Compilation error:\n{result.stderr.decode('utf-8')}")
+        # A library stays loaded once its file is gone
+        return open_library(cache.put(key, library_path) or library_path)
+
+def open_library(path):
+    library = ctypes.CDLL(path)
+    library.wz_kernel_error.restype = ctypes.c_char_p
+    library.wz_free_data.argtypes = [ctypes.c_void_p]
+    return library
+
+def run(library, kernel, namespace, vectors, numbers, inputs):
+    """Run a kernel on the variables of namespace, storing the values it
+    assigns back into it
+
+    Vectors are passed as pointers to the arrays' own elements, and the
+    vectors the kernel assigns are returned as arrays of the buffers it
+    allocated, freed with them. Returns False, having run nothing, when a
+    variable is missing among inputs or holds a value the kernel cannot
+    take: anything but a float, or a one-dimensional float64 array for
+    vector variables. Raises ValueError with the kernel's error message.
+    """
+    present = {}
+    for name in (*vectors, *numbers):
+        value = namespace.get(name)
+        if value is None:
+            if name in inputs:
+                return False
+            continue
+        if name in vectors and isinstance(value, np.ndarray):
+            if value.dtype != np.float64 or value.ndim > 1:
+                return False
+        elif not isinstance(value, float):
+            return False
+        present[name] = value
+
+    vector_args = (Vector * max(len(vectors), 1))()
+    number_args = (ctypes.c_double * max(len(numbers), 1))()
+    arrays = {}
+    for index, name in enumerate(vectors):
+        if name not in present:
+            vector_args[index].dims = 1
+            continue
+        value = present[name]
+        dims = np.ndim(value)
+        # Arrays are read in place where they are contiguous already
+        array = arrays[name] = np.ascontiguousarray(value, dtype=np.float64)
+        vector_args[index] = Vector(array.ctypes.data_as(ctypes.POINTER(ctypes.c_double)), array.size, dims, 1)
+    for index, name in enumerate(numbers):
+        number_args[index] = present.get(name, 0.0)
+
+    if getattr(library, kernel)(vector_args, number_args):
+        raise ValueError(library.wz_kernel_error().decode('utf-8'))
+
+    for index, name in enumerate(vectors):
+        vector = vector_args[index]
+        if vector.borrowed:
+            # Left as it was
+            continue
+        namespace[name] = adopt(library, vector)
+    for index, name in enumerate(numbers):
+        namespace[name] = number_args[index]
+    return True
+
+def adopt(library, vector):
+    """Value of a vector a kernel allocated, taking ownership of its buffer"""
+    address = ctypes.cast(vector.data, ctypes.c_void_p).value
+    if vector.dims == 0 or not vector.length:
+        value = vector.data[0] if vector.dims == 0 else np.empty(0)
+        library.wz_free_data(address)
+        return value
+    buffer = (ctypes.c_double * vector.length).from_address(address)
+    # Views of the array keep the buffer alive
+    weakref.finalize(buffer, library.wz_free_data, address)
+    return np.frombuffer(buffer, dtype=np.float64)
@@ -0,0 +1,176 @@
+# wizuall_runtime/primitives.py
+import numpy as np
+import matplotlib.pyplot as plt
+from numpy.lib.stride_tricks import sliding_window_view
+
+def plot(*data):
+    """Basic plot"""
+    plt.figure(figsize=(10, 6))
+    plt.plot(*data)
+    plt.grid(True)
+    plt.xlabel('X')
+    plt.ylabel('Y')
+    plt.title('WizuAll Plot')
+    plt.savefig('wizuall_plot.png')
+    plt.show()
+
+def histogram(data, bins=10):
+    """Histogram"""
+    plt.figure(figsize=(10, 6))
+    plt.hist(data, bins=int(bins), alpha=0.7, color='steelblue', edgecolor='black')
+    plt.grid(True, alpha=0.3)
+    plt.xlabel('Value')
+    plt.ylabel('Frequency')
+    plt.title('WizuAll Histogram')
+    plt.savefig('wizuall_histogram.png')
+    plt.show()
+
+def heatmap(data):
+    """Heatmap"""
+    import seaborn as sns
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(data, annot=True, cmap='viridis')
+    plt.title('WizuAll Heatmap')
+    plt.savefig('wizuall_heatmap.png')
+    plt.show()
+
+def scatter(x_data, y_data):
+    """Scatter plot"""
+    plt.figure(figsize=(10, 6))
+    plt.scatter(x_data, y_data, alpha=0.7, s=50)
+    plt.grid(True, alpha=0.3)
+    plt.xlabel('X')
+    plt.ylabel('Y')
+    plt.title('WizuAll Scatter Plot')
+    plt.savefig('wizuall_scatter.png')
+    plt.show()
+
+def bar(categories, values):
+    """Bar chart"""
+    plt.figure(figsize=(12, 6))
+    plt.bar(categories, values, alpha=0.8, color='steelblue', edgecolor='black')
+    plt.grid(True, axis='y', alpha=0.3)
+    plt.xlabel('Categories')
+    plt.ylabel('Values')
+    plt.title('WizuAll Bar Chart')
+    plt.savefig('wizuall_bar.png')
+    plt.show()
+
+def line(x_data, y_data):
+    """Line chart"""
+    plt.figure(figsize=(10, 6))
+    plt.plot(x_data, y_data, marker='o', linestyle='-', linewidth=2, markersize=6)
+    plt.grid(True, alpha=0.3)
+    plt.xlabel('X')
+    plt.ylabel('Y')
+    plt.title('WizuAll Line Chart')
+    plt.savefig('wizuall_line.png')
+    plt.show()
+
+def windowed(reduce, data, window):
+    """Reduce the whole vector, or a moving window over it"""
+    if window and window != 'None':
+        window = int(window)
+        windows = sliding_window_view(np.pad(data, (window - 1, 0), 'edge'), window)
+        return reduce(windows, axis=1)
+    return reduce(data)
+
+def vec_average(data, window=None):
+    """Average, or moving average; prints and returns it"""
+    result = windowed(np.mean, data, window)
+    print(result)
+    return result
+
+def vec_max(data, window=None):
+    """Maximum, or moving maximum; prints and returns it"""
+    result = windowed(np.max, data, window)
+    print(result)
+    return result
+
+def vec_min(data, window=None):
+    """Minimum, or moving minimum; prints and returns it"""
+    result = windowed(np.min, data, window)
+    print(result)
+    return result
+
+def vec_reverse(data):
+    """The vector reversed; prints and returns it"""
+    result = np.flip(data)
+    print(result)
+    return result
+
+def vec_product(x_data, y_data, product_type='dot'):
+    """Dot, cross or elementwise product; prints and returns it"""
+    if product_type == 'dot':
+        result = np.dot(x_data, y_data)
+    elif product_type == 'cross':
+        result = np.cross(x_data, y_data)
+    elif product_type == 'element':
+        result = x_data * y_data
+    else:
+        raise ValueError(f"Unsupported product type: {product_type}")
+    print(result)
+    return result
+
+def vec_compare(x_data, y_data, comp_type='greater'):
+    """Elementwise comparison, or whether either vector Pareto dominates
+    the other; prints and returns it"""
+    if comp_type == 'greater':
+        result = x_data > y_data
+    elif comp_type == 'less':
+        result = x_data < y_data
+    elif comp_type == 'equal':
+        result = x_data == y_data
+    elif comp_type == 'pareto':
+        dominates = np.all(x_data >= y_data) and np.any(x_data > y_data)
+        dominated_by = np.all(y_data >= x_data) and np.any(y_data > x_data)
+        result = dominates, dominated_by
+    else:
+        raise ValueError(f"Unsupported comparison type: {comp_type}")
+    print(result)
+    return result
+
+def clustering(data, n_clusters=3):
+    """KMeans clustering, plotted for 2-D data; prints and returns the
+    labels and the cluster centers"""
+    from sklearn.cluster import KMeans
+    data_reshaped = np.array(data)
+    if len(data_reshaped.shape) == 1:
+        data_reshaped = data_reshaped.reshape(-1, 1)
+
+    kmeans = KMeans(n_clusters=int(n_clusters))
+    labels = kmeans.fit_predict(data_reshaped)
+    centers = kmeans.cluster_centers_
+
+    if data_reshaped.shape[1] == 2:
+        plt.figure(figsize=(10, 6))
+        plt.scatter(data_reshaped[:, 0], data_reshaped[:, 1], c=labels, cmap='viridis', s=50, alpha=0.8)
+        plt.scatter(centers[:, 0], centers[:, 1], c='red', marker='X', s=100)
+        plt.title('WizuAll Clustering')
+        plt.grid(True, alpha=0.3)
+        plt.savefig('wizuall_clustering.png')
+        plt.show()
+
+    print("Cluster Labels:", labels)
+    print("Cluster Centers:", centers)
+    return labels, centers
+
+def classification(x_train, y_train, x_test, cls_type='random_forest'):
+    """Train a classifier and predict x_test; prints the predictions and
+    returns them with the classifier"""
+    if cls_type == 'random_forest':
+        from sklearn.ensemble import RandomForestClassifier
+        clf = RandomForestClassifier(n_estimators=100, random_state=42)
+    elif cls_type == 'svm':
+        from sklearn.svm import SVC
+        clf = SVC(kernel='rbf', probability=True, random_state=42)
+    elif cls_type == 'knn':
+        from sklearn.neighbors import KNeighborsClassifier
+        clf = KNeighborsClassifier(n_neighbors=5)
+    else:
+        raise ValueError(f"Unsupported classifier type: {cls_type}")
+
+    clf.fit(x_train, y_train)
+    y_pred = clf.predict(x_test)
+    print("Predictions:", y_pred)
+    return y_pred, clf